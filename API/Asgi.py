@@ -0,0 +1,94 @@
+"""
+Modo de servicio async (ASGI).
+
+    uvicorn Asgi:app --port 3000 --workers 2          # desde la carpeta API
+    hypercorn Asgi:app --bind 0.0.0.0:3000
+
+Las rutas más concurridas (/users, /user, /login) corren como corrutinas sobre AsyncMongoClient
+(BackEnd.AsyncFunctions). Todas las demás, incluida la inferencia de /analyze, siguen siendo las rutas
+Flask de Directions.py y se ejecutan en un pool de hilos: el trabajo bloqueante o de CPU nunca corre en
+el event loop. Directions.py con app.run() sigue funcionando igual que antes.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from quart import Quart
+import BackEnd.AsyncFunctions as AsyncMethod
+import BackEnd.GlobalInfo.Keys as Colabskey
+import BackEnd.Metrics as Metrics
+import Directions
+
+quart_app = Quart(__name__)
+if Colabskey.METRICS_ENABLED:
+    Metrics.instrumentar_quart(quart_app)
+
+
+@quart_app.after_request
+async def cors(response):
+    # Las preflight (OPTIONS) las sigue respondiendo flask_cors en la app WSGI
+    response.headers.setdefault("Access-Control-Allow-Origin", "*")
+    return response
+
+
+@quart_app.route('/users', methods=['GET'])
+async def get_users():
+    return await AsyncMethod.getAllUsers()
+
+
+@quart_app.route('/user', methods=['POST'])
+async def create_user():
+    return await AsyncMethod.addUser()
+
+
+@quart_app.route('/login', methods=['POST'])
+async def login():
+    return await AsyncMethod.loginUser()
+
+
+@quart_app.before_serving
+async def iniciar():
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=Colabskey.ASGI_WSGI_THREADS,
+                                                 thread_name_prefix="wsgi"))
+    if Colabskey.PRELOAD_MODEL or Colabskey.INFERENCE_WORKERS > 0:
+        from BackEnd import Analysis
+        await loop.run_in_executor(None, Analysis.precargar)
+
+
+@quart_app.after_serving
+async def detener():
+    if Colabskey.async_dbconn is not None:
+        await Colabskey.async_dbconn.client.close()
+        Colabskey.async_dbconn = None
+
+
+# ==================== RUTAS FLASK EN HILOS ====================
+# WsgiToAsgi de asgiref ejecuta todas las peticiones en un único hilo (thread_sensitive=True), lo que
+# serializaría las rutas Flask. Aquí cada petición va al executor del loop (ASGI_WSGI_THREADS hilos).
+
+class _InstanciaWsgi(WsgiToAsgiInstance):
+    run_wsgi_app = sync_to_async(WsgiToAsgiInstance.__dict__["run_wsgi_app"].func, thread_sensitive=False)
+
+
+class _WsgiEnHilos(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await _InstanciaWsgi(self.wsgi_application)(scope, receive, send)
+
+
+flask_asgi = _WsgiEnHilos(Directions.app)
+
+RUTAS_ASYNC = {
+    ("GET", "/users"),
+    ("POST", "/user"),
+    ("POST", "/login"),
+}
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await quart_app(scope, receive, send)
+    elif scope["type"] == "http" and (scope["method"], scope["path"]) in RUTAS_ASYNC:
+        await quart_app(scope, receive, send)
+    else:
+        await flask_asgi(scope, receive, send)
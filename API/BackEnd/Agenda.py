@@ -0,0 +1,241 @@
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+from pymongo import UpdateOne
+import BackEnd.GlobalInfo.Keys as Colabskey
+from BackEnd import Logs
+
+log = Logs.obtener(__name__)
+
+
+# ==================== AGENDA DE LOS DOCTORES ====================
+# Además de fecha/hora/fechaHoraIso tal como llegan del front, cada cita guarda su intervalo normalizado:
+# inicio y fin (datetime en la hora local de la clínica, sin zona) y `bloques`, los tramos de
+# BLOQUE_MINUTOS que ocupa. El índice único parcial (medicoId, bloques) de Indexes.py solo cubre las
+# citas con activa=True: si dos citas activas del mismo doctor se traslapan, el insert de la segunda
+# falla con DuplicateKeyError (409) en la misma operación, sin leer antes la agenda y sin carreras entre
+# peticiones simultáneas. Cancelar o rechazar una cita pone activa=False y libera sus bloques.
+#
+# Las citas anteriores a estos campos no bloquean a nadie hasta correr python -m Tools.agenda.
+
+# Resolución de los bloques: una cita de 10:17 a 10:47 ocupa de 10:15 a 10:45. Cambiarlo obliga
+# a recalcular las citas existentes (python -m Tools.agenda --recompute)
+BLOQUE_MINUTOS = 5
+# Estados que dejan libre el horario (en minúsculas); el resto (pendiente, Confirmada, Completada) lo ocupa
+ESTADOS_LIBRES = {"cancelada", "rechazada"}
+
+
+class FechaInvalida(ValueError):
+    """Fecha, hora, duración o rango de la agenda inválidos; el endpoint responde 400"""
+
+
+_aviso_zona = []
+
+
+def _zona():
+    if Colabskey.APPOINTMENT_TIMEZONE:
+        return ZoneInfo(Colabskey.APPOINTMENT_TIMEZONE)
+    if not _aviso_zona:
+        _aviso_zona.append(True)
+        log.warning("⚠️ [AGENDA] APPOINTMENT_TIMEZONE no está configurada; se usa la zona del servidor")
+    return datetime.now().astimezone().tzinfo
+
+
+def ahora_local():
+    return datetime.now(_zona()).replace(tzinfo=None)
+
+
+def ocupa_agenda(estado):
+    return str(estado or "").strip().lower() not in ESTADOS_LIBRES
+
+
+def _hora(texto):
+    return time.fromisoformat(texto)
+
+
+def leer_inicio(fecha=None, hora=None, fecha_hora_iso=None):
+    """Inicio de la cita en hora local de la clínica, al minuto. fechaHoraIso (el valor del ion-datetime)
+    tiene prioridad: sin zona ya es hora local, con zona se convierte a APPOINTMENT_TIMEZONE.
+    fecha (YYYY-MM-DD) + hora (HH:MM[:SS]) solo se usan si falta: versiones anteriores del front
+    calculaban fecha en UTC y hora en local, así que pueden no coincidir cerca de la medianoche"""
+    if not fecha_hora_iso and not (fecha and hora):
+        raise FechaInvalida("Falta la fecha y hora de la cita")
+    try:
+        if fecha_hora_iso:
+            inicio = datetime.fromisoformat(str(fecha_hora_iso))
+            if inicio.tzinfo is not None:
+                inicio = inicio.astimezone(_zona()).replace(tzinfo=None)
+        else:
+            inicio = datetime.combine(date.fromisoformat(str(fecha)), _hora(str(hora)))
+    except ValueError:
+        raise FechaInvalida("Fecha u hora de la cita inválida")
+    return inicio.replace(second=0, microsecond=0)
+
+
+def leer_duracion(valor):
+    if valor in (None, ""):
+        return Colabskey.APPOINTMENT_SLOT_MINUTES
+    try:
+        duracion = int(valor)
+    except (TypeError, ValueError):
+        raise FechaInvalida("Duración de la cita inválida")
+    if not 0 < duracion <= Colabskey.APPOINTMENT_MAX_MINUTES:
+        raise FechaInvalida(f"La duración debe estar entre 1 y {Colabskey.APPOINTMENT_MAX_MINUTES} minutos")
+    return duracion
+
+
+def _bloque(momento):
+    return momento.replace(minute=momento.minute - momento.minute % BLOQUE_MINUTOS, second=0, microsecond=0)
+
+
+def bloques(inicio, fin):
+    """Bloques de BLOQUE_MINUTOS del intervalo [inicio, fin) con ambos extremos redondeados hacia abajo:
+    dos citas seguidas (10:17-10:47 y 10:47-11:17) no comparten bloque; un traslape de menos de
+    BLOQUE_MINUTOS fuera de la cuadrícula puede no detectarse. Siempre al menos un bloque"""
+    bloque, ultimo = _bloque(inicio), _bloque(fin)
+    paso = timedelta(minutes=BLOQUE_MINUTOS)
+    resultado = [bloque]
+    while bloque + paso < ultimo:
+        bloque += paso
+        resultado.append(bloque)
+    return resultado
+
+
+def campos_agenda(inicio, duracion, estado):
+    """Campos normalizados que se guardan en la cita junto a fecha/hora/fechaHoraIso"""
+    fin = inicio + timedelta(minutes=duracion)
+    return {"inicio": inicio, "fin": fin, "duracionMin": duracion,
+            "bloques": bloques(inicio, fin), "activa": ocupa_agenda(estado)}
+
+
+def campos_de_cita(cita):
+    """Los mismos campos calculados a partir de una cita ya guardada (backfill); None si su fecha no sirve"""
+    try:
+        inicio = leer_inicio(cita.get("fecha"), cita.get("hora"), cita.get("fechaHoraIso"))
+        duracion = leer_duracion(cita.get("duracionMin"))
+    except FechaInvalida:
+        return None
+    return campos_agenda(inicio, duracion, cita.get("estado"))
+
+
+# ==================== HORARIOS DISPONIBLES ====================
+
+def leer_rango(args):
+    """?desde=YYYY-MM-DD&hasta=YYYY-MM-DD (ambos incluidos); por defecto los próximos 7 días"""
+    try:
+        desde = date.fromisoformat(args['desde']) if args.get('desde') else ahora_local().date()
+        hasta = date.fromisoformat(args['hasta']) if args.get('hasta') else desde + timedelta(days=6)
+    except ValueError:
+        raise FechaInvalida("Las fechas deben tener el formato YYYY-MM-DD")
+    if hasta < desde:
+        raise FechaInvalida("'hasta' no puede ser anterior a 'desde'")
+    if (hasta - desde).days >= Colabskey.APPOINTMENT_MAX_RANGE_DAYS:
+        raise FechaInvalida(f"El rango no puede pasar de {Colabskey.APPOINTMENT_MAX_RANGE_DAYS} días")
+    return desde, hasta
+
+
+def filtro_inicio(args):
+    """Condición sobre `inicio` para ?desde=&hasta= opcionales (días completos, ambos incluidos); {} sin
+    ninguno. `fecha` no sirve para filtrar: puede faltar y en citas antiguas es la fecha en UTC"""
+    rango = {}
+    try:
+        if args.get('desde'):
+            rango["$gte"] = datetime.combine(date.fromisoformat(args['desde']), time())
+        if args.get('hasta'):
+            rango["$lt"] = datetime.combine(date.fromisoformat(args['hasta']) + timedelta(days=1), time())
+    except ValueError:
+        raise FechaInvalida("Las fechas deben tener el formato YYYY-MM-DD")
+    return rango
+
+
+def _dias_laborales():
+    return {int(d) for d in Colabskey.APPOINTMENT_WORKDAYS.split(",") if d.strip()}
+
+
+def bloques_ocupados(db, medico_id, desde, hasta):
+    """Bloques de las citas activas del doctor que pueden caer en [desde, hasta]: un rango de
+    (medicoId, inicio) con solo el campo bloques, en lugar de leer y parsear toda su agenda"""
+    # Una cita que empezó antes de 'desde' puede seguir ocupando sus primeros minutos
+    minimo = datetime.combine(desde, time()) - timedelta(minutes=Colabskey.APPOINTMENT_MAX_MINUTES)
+    maximo = datetime.combine(hasta + timedelta(days=1), time())
+    ocupados = set()
+    for cita in db.appointments.find(
+            {"medicoId": medico_id, "inicio": {"$gte": minimo, "$lt": maximo}, "activa": True},
+            {"_id": 0, "bloques": 1}):
+        ocupados.update(cita.get("bloques", ()))
+    return ocupados
+
+
+def horarios_disponibles(db, medico_id, desde, hasta, ahora=None):
+    """Inicios de los horarios de APPOINTMENT_SLOT_MINUTES libres dentro de la jornada, en orden"""
+    return horarios_libres(bloques_ocupados(db, medico_id, desde, hasta), desde, hasta, ahora or ahora_local())
+
+
+def horarios_libres(ocupados, desde, hasta, ahora):
+    duracion = timedelta(minutes=Colabskey.APPOINTMENT_SLOT_MINUTES)
+    apertura, cierre = _hora(Colabskey.APPOINTMENT_DAY_START), _hora(Colabskey.APPOINTMENT_DAY_END)
+    dias = _dias_laborales()
+
+    libres = []
+    dia = desde
+    while dia <= hasta:
+        if dia.weekday() in dias:
+            horario = datetime.combine(dia, apertura)
+            fin_jornada = datetime.combine(dia, cierre)
+            while horario + duracion <= fin_jornada:
+                if horario >= ahora and not any(b in ocupados for b in bloques(horario, horario + duracion)):
+                    libres.append(horario)
+                horario += duracion
+        dia += timedelta(days=1)
+    return libres
+
+
+# ==================== CITAS EXISTENTES (python -m Tools.agenda) ====================
+
+def rellenar(db, batch_size=500, recalcular=False, progreso=None):
+    """Calcula inicio/fin/bloques/activa de las citas que no tienen bloques (o de todas con recalcular).
+    Por lotes de _id; se puede interrumpir y repetir. Devuelve {"processed", "updated", "invalid"}"""
+    procesados = actualizados = invalidas = 0
+    ultimo = None
+    base = {} if recalcular else {"bloques": {"$exists": False}}
+    while True:
+        filtro = dict(base, _id={"$gt": ultimo}) if ultimo else base
+        lote = list(db.appointments.find(
+            filtro, {"fecha": 1, "hora": 1, "fechaHoraIso": 1, "duracionMin": 1, "estado": 1}
+        ).sort("_id", 1).limit(batch_size))
+        if not lote:
+            break
+        ultimo = lote[-1]["_id"]
+
+        operaciones = []
+        for cita in lote:
+            campos = campos_de_cita(cita)
+            if campos is None:
+                # Sin fecha utilizable no ocupa la agenda (se vuelve a contar en cada corrida)
+                invalidas += 1
+                operaciones.append(UpdateOne({"_id": cita["_id"]}, {
+                    "$set": {"activa": False},
+                    "$unset": {"inicio": "", "fin": "", "duracionMin": "", "bloques": ""}}))
+            else:
+                operaciones.append(UpdateOne({"_id": cita["_id"]}, {"$set": campos}))
+        if operaciones:
+            actualizados += db.appointments.bulk_write(operaciones, ordered=False).modified_count
+        procesados += len(lote)
+        if progreso:
+            progreso(procesados, actualizados, invalidas)
+    return {"processed": procesados, "updated": actualizados, "invalid": invalidas}
+
+
+def conflictos(db):
+    """Grupos de citas activas del mismo doctor que se traslapan: [(medicoId, [_id, ...])]. Mientras
+    existan, el índice único de la agenda no se puede crear"""
+    grupos = db.appointments.aggregate([
+        {"$match": {"activa": True, "bloques": {"$exists": True}}},
+        {"$unwind": "$bloques"},
+        {"$group": {"_id": {"medicoId": "$medicoId", "bloque": "$bloques"}, "citas": {"$addToSet": "$_id"}}},
+        {"$match": {"citas.1": {"$exists": True}}},
+    ], allowDiskUse=True)
+    vistos = {}
+    for grupo in grupos:
+        clave = (grupo["_id"]["medicoId"], tuple(sorted(grupo["citas"])))
+        vistos.setdefault(clave, None)
+    return [(medico_id, list(citas)) for medico_id, citas in vistos]
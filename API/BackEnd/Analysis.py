@@ -0,0 +1,286 @@
+from flask import jsonify, request
+from datetime import datetime
+import hashlib
+import json
+from bson import ObjectId
+import BackEnd.GlobalInfo.Keys as Colabskey
+from BackEnd.Functions import get_db_connection, cifrar_url_imagen
+import BackEnd.Versiones as Versiones
+from BackEnd.ModelRegistry import model_registry
+from BackEnd.InferenceQueue import inference_queue, InferenceQueueFull
+from BackEnd.Preprocessing import preprocess_batch
+from BackEnd.PredictionCache import prediction_cache
+from BackEnd.InferenceWorkers import inference_pool
+import BackEnd.Metrics as Metrics
+from BackEnd import Logs
+
+log = Logs.obtener(__name__)
+
+# Módulo con todo el stack de ML (numpy, PIL y, al cargar el modelo, TensorFlow).
+# Functions lo importa solo en la primera llamada a /analyze para que /login, /users, /citas
+# arranquen sin pagar ese costo.
+
+
+def precargar():
+    """Arranca el pool de workers o carga el modelo en este proceso antes de recibir tráfico"""
+    if inference_pool is not None:
+        inference_pool.start()
+    else:
+        model_registry.get_model()
+
+
+# ========== FUNCIONES DE PREDICCIÓN CON CIFRADO ==========
+
+def _clasificar(malignant_probability):
+    """Umbral 0.5 sobre la probabilidad de malignidad -> (clasificación, % de confianza)"""
+    if malignant_probability > 0.5:
+        return "Maligno", malignant_probability * 100
+    return "Benigno", (1 - malignant_probability) * 100
+
+def _documento_prediccion(cloudinary_url, patient_name, patient_age, patient_id,
+                          breast_side, clinical_notes, classification, confidence_percent):
+    patient_age = str(patient_age)
+    return {
+        'image_url': cifrar_url_imagen(cloudinary_url),
+        'patient_name': patient_name,
+        'patient_age': int(patient_age) if patient_age and patient_age.isdigit() else 0,
+        'patient_id': patient_id,
+        'breast_side': breast_side,
+        'clinical_notes': clinical_notes,
+        'classification': classification,
+        'confidence': confidence_percent,
+        'analysis_date': datetime.utcnow().isoformat(),
+        'created_at': datetime.utcnow()
+    }
+
+def _predecir_imagenes(lista_datos):
+    """Pool de procesos si está habilitado; si no, micro-batching dentro de este proceso.
+    Devuelve (predicciones, versión del modelo que las calculó)"""
+    if inference_pool is not None:
+        # El pool mide preprocess y predict por su cuenta
+        return inference_pool.predict_images(lista_datos, timeout=Colabskey.INFERENCE_TIMEOUT_SECONDS)
+    with Metrics.fase("preprocess"):
+        batch = preprocess_batch(lista_datos)
+    with Metrics.fase("predict"):
+        return inference_queue.predict(batch, timeout=Colabskey.INFERENCE_TIMEOUT_SECONDS)
+
+def _huella_solicitud(*campos):
+    """Identifica un reintento: todos los campos que se guardan en la predicción, además de la misma imagen"""
+    return hashlib.sha256("\x1f".join(str(c) for c in campos).encode()).hexdigest()
+
+def analyze_complete():
+    try:
+        if "image" not in request.files:
+            return jsonify({"error": "No se envió ninguna imagen para el modelo"}), 400
+
+        cloudinary_url = request.form.get('image_url', '')
+        patient_name = request.form.get('patient_name', '')
+        patient_age = request.form.get('patient_age', '')
+        patient_id = request.form.get('patient_id', '')
+        breast_side = request.form.get('breast_side', '')
+        clinical_notes = request.form.get('clinical_notes', '')
+        
+        file = request.files["image"]
+        
+        # 0. CACHÉ: la misma imagen con el mismo modelo no vuelve a pasar por TensorFlow
+        datos = file.read()
+        with Metrics.fase("cache"):
+            db_cache = get_db_connection() if prediction_cache.usar_mongo else None
+            clave_cache = prediction_cache.clave(datos)
+            huella = _huella_solicitud(cloudinary_url, patient_name, patient_age, patient_id,
+                                       breast_side, clinical_notes)
+            cacheado = prediction_cache.get(clave_cache, db_cache)
+
+        if cacheado is not None:
+            log.debug("⚡ Predicción tomada de caché")
+            malignant_probability = cacheado["malignant_probability"]
+        else:
+            # 1. PROCESAR CON MODELO (cargado una vez y agrupado en lotes con otras peticiones)
+            log.debug("🔮 Iniciando evaluación de imagen...")
+            try:
+                prediction, version_modelo = _predecir_imagenes([datos])
+                # La caché se guarda con la versión que realmente predijo, no con la del archivo en disco
+                clave_cache = prediction_cache.clave(datos, version_modelo)
+            except InferenceQueueFull:
+                return jsonify({"error": "Servidor de inferencia saturado, intenta de nuevo"}), 503
+            except FileNotFoundError:
+                return jsonify({"error": "Modelo no encontrado"}), 500
+            except Exception as e:
+                log.error("❌ Error en modelo: %s", e)
+                return jsonify({"error": str(e)}), 500
+            malignant_probability = float(prediction[0][0])
+
+        classification, confidence_percent = _clasificar(malignant_probability)
+
+        # 2. GUARDAR EN MONGODB (un reintento idéntico reutiliza el documento ya guardado, si sigue
+        # existiendo: DELETE /predictions/<id> no conoce el hash de la imagen para limpiar la caché)
+        prediction_id = None
+        if cacheado is not None and cacheado.get("huella") == huella and cacheado.get("prediction_id"):
+            try:
+                with Metrics.fase("persist"):
+                    if get_db_connection().prediction.find_one(
+                            {"_id": ObjectId(cacheado["prediction_id"])}, {"_id": 1}) is not None:
+                        prediction_id = cacheado["prediction_id"]
+            except Exception as e:
+                log.error("❌ Error DB: %s", e)
+                return jsonify({"error": str(e)}), 500
+
+        if prediction_id is None:
+            try:
+                with Metrics.fase("persist"):
+                    db = get_db_connection()
+                    prediction_doc = _documento_prediccion(
+                        cloudinary_url, patient_name, patient_age, patient_id,
+                        breast_side, clinical_notes, classification, confidence_percent
+                    )
+
+                    result = db.prediction.insert_one(prediction_doc)
+                    prediction_id = str(result.inserted_id)
+                    Versiones.incrementar(db, Versiones.PREDICCIONES)
+                
+            except Exception as e:
+                log.error("❌ Error DB: %s", e)
+                return jsonify({"error": str(e)}), 500
+
+            prediction_cache.set(clave_cache, {
+                "malignant_probability": malignant_probability,
+                "prediction_id": prediction_id,
+                "huella": huella
+            }, db_cache)
+
+        return jsonify({
+            "success": True,
+            "prediction_id": prediction_id,
+            "classification": classification,
+            "confidence": float(malignant_probability),
+            "confidence_percent": float(confidence_percent),
+            "data": {
+                "patient_name": patient_name
+            }
+        })
+
+    except Exception as e:
+        log.exception("💥 Error analyze_complete: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+def analyze_batch():
+    """Analiza un estudio completo (varias vistas) con un solo predict y un solo insert_many"""
+    try:
+        files = request.files.getlist("images")
+        if not files:
+            return jsonify({"error": "No se enviaron imágenes para el modelo"}), 400
+        if len(files) > Colabskey.ANALYZE_BATCH_MAX_IMAGES:
+            return jsonify({"error": f"Máximo {Colabskey.ANALYZE_BATCH_MAX_IMAGES} imágenes por estudio"}), 400
+
+        # Datos del estudio (comunes) + metadatos por imagen en el mismo orden que 'images'
+        patient_name = request.form.get('patient_name', '')
+        patient_age = request.form.get('patient_age', '')
+        patient_id = request.form.get('patient_id', '')
+        clinical_notes = request.form.get('clinical_notes', '')
+        try:
+            metadata = json.loads(request.form.get('metadata', '[]') or '[]')
+        except ValueError:
+            return jsonify({"error": "El campo 'metadata' no es un JSON válido"}), 400
+        if (not isinstance(metadata, list) or (metadata and len(metadata) != len(files))
+                or not all(isinstance(meta, dict) for meta in metadata)):
+            return jsonify({"error": "'metadata' debe ser una lista con un elemento por imagen"}), 400
+        if not metadata:
+            metadata = [{} for _ in files]
+
+        # 0. CACHÉ: solo las imágenes no vistas con este modelo pasan por TensorFlow
+        datos = [file.read() for file in files]
+        with Metrics.fase("cache"):
+            db_cache = get_db_connection() if prediction_cache.usar_mongo else None
+            claves_cache = [prediction_cache.clave(d) for d in datos]
+            probabilidades = []
+            for clave_cache in claves_cache:
+                cacheado = prediction_cache.get(clave_cache, db_cache)
+                probabilidades.append(cacheado["malignant_probability"] if cacheado is not None else None)
+        faltantes = [i for i, p in enumerate(probabilidades) if p is None]
+
+        # 1. PREPROCESAR LAS FALTANTES EN UN SOLO TENSOR float32
+        log.debug("🔮 Iniciando evaluación de estudio con %d imágenes (%d sin caché)...", len(files), len(faltantes))
+        try:
+            if faltantes:
+                predictions, version_modelo = _predecir_imagenes([datos[i] for i in faltantes])
+                for fila, i in enumerate(faltantes):
+                    probabilidades[i] = float(predictions[fila][0])
+                    claves_cache[i] = prediction_cache.clave(datos[i], version_modelo)
+        except InferenceQueueFull:
+            return jsonify({"error": "Servidor de inferencia saturado, intenta de nuevo"}), 503
+        except FileNotFoundError:
+            return jsonify({"error": "Modelo no encontrado"}), 500
+        except Exception as e:
+            log.error("❌ Error en modelo: %s", e)
+            return jsonify({"error": str(e)}), 500
+
+        resultados = []
+        documentos = []
+        for i, meta in enumerate(metadata):
+            malignant_probability = probabilidades[i]
+            classification, confidence_percent = _clasificar(malignant_probability)
+            documentos.append(_documento_prediccion(
+                meta.get('image_url', ''), patient_name, patient_age, patient_id,
+                meta.get('breast_side', ''), meta.get('clinical_notes', clinical_notes),
+                classification, confidence_percent
+            ))
+            resultados.append({
+                "filename": files[i].filename,
+                "view": meta.get('view', ''),
+                "breast_side": meta.get('breast_side', ''),
+                "classification": classification,
+                "confidence": malignant_probability,
+                "confidence_percent": float(confidence_percent)
+            })
+
+        # 2. GUARDAR TODO EL ESTUDIO EN UNA SOLA ESCRITURA
+        try:
+            with Metrics.fase("persist"):
+                db = get_db_connection()
+                result = db.prediction.insert_many(documentos)
+                Versiones.incrementar(db, Versiones.PREDICCIONES)
+                for resultado, inserted_id in zip(resultados, result.inserted_ids):
+                    resultado["prediction_id"] = str(inserted_id)
+                for i in faltantes:
+                    prediction_cache.set(claves_cache[i], {
+                        "malignant_probability": probabilidades[i],
+                        "prediction_id": resultados[i]["prediction_id"]
+                    }, db_cache)
+        except Exception as e:
+            log.error("❌ Error DB: %s", e)
+            return jsonify({"error": str(e)}), 500
+
+        # 3. RESUMEN DEL ESTUDIO: basta una vista maligna para marcarlo como maligno
+        max_probability = max(r["confidence"] for r in resultados)
+        malignos = sum(1 for r in resultados if r["classification"] == "Maligno")
+
+        return jsonify({
+            "success": True,
+            "results": resultados,
+            "summary": {
+                "total_images": len(resultados),
+                "malignant_count": malignos,
+                "benign_count": len(resultados) - malignos,
+                "max_malignant_probability": max_probability,
+                "classification": "Maligno" if malignos else "Benigno"
+            },
+            "data": {
+                "patient_name": patient_name
+            }
+        })
+
+    except Exception as e:
+        log.exception("💥 Error analyze_batch: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+def getModelStatus():
+    try:
+        return jsonify({
+            "intStatus": 200,
+            "model": model_registry.stats(),
+            "batching": inference_queue.stats(),
+            "prediction_cache": prediction_cache.stats(),
+            "worker_pool": inference_pool.stats() if inference_pool is not None else {"enabled": False}
+        })
+    except Exception as e:
+        return jsonify({"intStatus": 500, "Error": str(e)}), 500
@@ -0,0 +1,176 @@
+import asyncio
+from quart import jsonify, request
+from pymongo import AsyncMongoClient
+from pymongo.errors import DuplicateKeyError
+import BackEnd.GlobalInfo.ResponseMessages as respuestas
+import BackEnd.GlobalInfo.Keys as Colabskey
+from BackEnd.Pagination import leer_limite, codificar_cursor, CursorInvalido
+from BackEnd.Functions import (CAMPOS_USUARIO, COLECCIONES_USUARIOS, cursor_usuarios, _formatear_usuario,
+                               _rol_y_coleccion, _usuario_basico, _perfil_nuevo)
+import BackEnd.Identidades as Identidades
+import BackEnd.Versiones as Versiones
+import BackEnd.Metrics as Metrics
+from BackEnd import Logs
+from bson import ObjectId
+
+log = Logs.obtener(__name__)
+
+
+# ==================== VERSIONES ASYNC (modo ASGI, ver Asgi.py) ====================
+# Mismas respuestas que Functions, pero sobre AsyncMongoClient: mientras Atlas responde, el event loop
+# atiende otras peticiones, y las consultas independientes de una misma petición van en paralelo.
+
+def get_async_db():
+    """AsyncMongoClient del proceso; se crea en el event loop del servidor con la primera petición"""
+    if Colabskey.async_dbconn is None:
+        log.info("🔌 [DB async] Conectando a MongoDB...")
+        client = AsyncMongoClient(
+            Colabskey.MONGODB_URI,
+            serverSelectionTimeoutMS=10000,
+            connectTimeoutMS=10000,
+            socketTimeoutMS=10000,
+            retryWrites=True,
+            w='majority',
+            maxPoolSize=Colabskey.MONGO_MAX_POOL_SIZE,
+            minPoolSize=Colabskey.MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=Colabskey.MONGO_MAX_IDLE_TIME_MS,
+            event_listeners=Metrics.event_listeners()
+        )
+        Colabskey.async_dbconn = client[Colabskey.DB_NAME]
+    return Colabskey.async_dbconn
+
+
+async def getAllUsers():
+    try:
+        db = get_async_db()
+        limite = leer_limite(request.args)
+        cursor = cursor_usuarios(request.args.get('cursor'))
+        inicio = cursor["c"]
+
+        # Las colecciones pendientes se consultan a la vez (cada una con limite + 1) y se cosen en orden
+        def consulta(indice):
+            filtro = {"_id": {"$gt": cursor["i"]}} if indice == inicio and cursor["i"] else {}
+            return (db[COLECCIONES_USUARIOS[indice]]
+                    .find(filtro, CAMPOS_USUARIO).sort("_id", 1).limit(limite + 1).to_list())
+
+        lotes = await asyncio.gather(*(consulta(i) for i in range(inicio, len(COLECCIONES_USUARIOS))))
+
+        arrFinalUsers = []
+        siguiente = None
+        for indice, listUsers in zip(range(inicio, len(COLECCIONES_USUARIOS)), lotes):
+            faltan = limite - len(arrFinalUsers)
+            arrFinalUsers.extend(_formatear_usuario(u, COLECCIONES_USUARIOS[indice]) for u in listUsers[:faltan])
+            if len(listUsers) > faltan:
+                siguiente = codificar_cursor(c=indice, i=listUsers[faltan - 1]["_id"])
+                break
+            if len(arrFinalUsers) >= limite:
+                if indice + 1 < len(COLECCIONES_USUARIOS):
+                    siguiente = codificar_cursor(c=indice + 1, i=None)
+                break
+
+        objResponse = respuestas.succ200.copy()
+        objResponse["arrUsers"] = arrFinalUsers
+        objResponse["next"] = siguiente
+        return jsonify(objResponse)
+
+    except CursorInvalido as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        log.exception("💥 ERROR en getAllUsers (async): %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+async def addUser():
+    try:
+        data = await request.get_json()
+        if not data or 'email' not in data or 'password' not in data:
+            return jsonify({"intStatus": 400, "Error": "Faltan datos requeridos"}), 400
+
+        db = get_async_db()
+        email = data['email']
+
+        # Antes de la migración: las tres verificaciones anteriores, en paralelo
+        if not await Identidades.migracion_completa_async(db):
+            existentes = await asyncio.gather(*(db[c].find_one({"email": email}, {"_id": 1})
+                                                for c in COLECCIONES_USUARIOS))
+            if any(existentes):
+                return jsonify({"intStatus": 409, "Error": "El usuario ya existe"}), 409
+
+        role, collection_name = _rol_y_coleccion(data.get('role', 'patient'))
+        user_basic = dict(_usuario_basico(data, role), _id=ObjectId())
+        final_profile = dict(_perfil_nuevo(data, role, collection_name, user_basic["_id"]), _id=ObjectId())
+
+        # La identidad reserva el email; usuario y perfil ya no compiten entre sí y van en paralelo
+        await db[Identidades.COLECCION].insert_one(
+            Identidades.documento_identidad(user_basic, final_profile, collection_name))
+        try:
+            await asyncio.gather(db["users"].insert_one(user_basic),
+                                 db[collection_name].insert_one(final_profile))
+        except Exception:
+            # Deshacer el registro a medias (cualquiera de los dos inserts pudo haber entrado)
+            await asyncio.gather(db["users"].delete_one({"_id": user_basic["_id"]}),
+                                 db[collection_name].delete_one({"_id": final_profile["_id"]}))
+            await db[Identidades.COLECCION].delete_one({"_id": email, "userId": user_basic["_id"]})
+            raise
+        await Versiones.incrementar_async(db, Versiones.USUARIOS)
+
+        return jsonify({
+            "intStatus": 200,
+            "strAnswer": "Usuario creado exitosamente",
+            "userId": str(user_basic["_id"])
+        })
+
+    except DuplicateKeyError:
+        return jsonify({"intStatus": 409, "Error": "El usuario ya existe"}), 409
+    except Exception as e:
+        log.exception("💥💥 [REGISTRO async] ERROR: %s", e)
+        return jsonify({"intStatus": 500, "Error": str(e)}), 500
+
+
+async def _identidad_desde_colecciones(db, email):
+    """Usuarios aún sin identidad: users y los dos perfiles posibles a la vez; la identidad queda creada"""
+    user_basic, doctor, paciente = await asyncio.gather(
+        db["users"].find_one({"email": email}),
+        db["doctors"].find_one({"email": email}, {"nombre": 1, "apellidos": 1}),
+        db["patients"].find_one({"email": email}, {"nombre": 1, "apellidos": 1})
+    )
+    if not user_basic:
+        return None
+    collection_name = Identidades.coleccion_de_rol(user_basic.get('role', 'patient'))
+    user_profile = {"doctors": doctor, "patients": paciente}.get(collection_name)
+    identidad = Identidades.documento_identidad(user_basic, user_profile, collection_name)
+    try:
+        await db[Identidades.COLECCION].insert_one(identidad)
+    except DuplicateKeyError:
+        pass
+    return identidad
+
+
+async def loginUser():
+    try:
+        data = await request.get_json()
+        if not data or 'email' not in data or 'password' not in data:
+            return jsonify({"intStatus": 400, "Error": "Faltan credenciales"}), 400
+
+        db = get_async_db()
+        email = data['email']
+
+        identidad = await db[Identidades.COLECCION].find_one({"_id": email})
+        if identidad is None and not await Identidades.migracion_completa_async(db):
+            identidad = await _identidad_desde_colecciones(db, email)
+
+        if not Identidades.permite_login(identidad):
+            return jsonify({"intStatus": 404, "Error": "Usuario no encontrado"}), 404
+
+        if identidad['password'] != data['password']:
+            return jsonify({"intStatus": 401, "Error": "Contraseña incorrecta"}), 401
+
+        return jsonify({
+            "intStatus": 200,
+            "strAnswer": "Login exitoso",
+            "user": Identidades.usuario_login(identidad)
+        })
+
+    except Exception as e:
+        log.exception("💥 [LOGIN async] Error: %s", e)
+        return jsonify({"intStatus": 500, "Error": str(e)}), 500
@@ -0,0 +1,63 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+# ==================== CACHÉ EN MEMORIA CON LRU + TTL ====================
+
+class CacheTTL:
+    """Caché acotada por número de entradas (LRU) y por antigüedad (TTL), segura entre hilos"""
+
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._datos = OrderedDict()  # clave -> (expira_en, valor)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, clave):
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                self.misses += 1
+                return None
+            if entrada[0] <= ahora:
+                del self._datos[clave]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.hits += 1
+            return entrada[1]
+
+    def set(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + self.ttl_seconds, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entries:
+                self._datos.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def clear(self):
+        with self._lock:
+            self._datos.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._datos),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / total if total else None
+            }
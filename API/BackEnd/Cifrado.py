@@ -0,0 +1,165 @@
+import base64
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from cryptography.fernet import Fernet, MultiFernet, InvalidToken
+from dotenv import load_dotenv
+import BackEnd.GlobalInfo.Keys as Colabskey
+from BackEnd.Cache import CacheTTL
+from BackEnd import Logs
+
+log = Logs.obtener(__name__)
+
+
+# ========== CIFRADO DE URLS DE IMÁGENES ==========
+# Formato actual:  "enc:v1:" + token Fernet (el token ya es base64 urlsafe).
+# Formato antiguo: base64 urlsafe del token Fernet, sin marcador. Siempre empieza con "Z0FBQUFB"
+#                  (base64 de "gAAAAA", el inicio de todo token Fernet), así que se reconoce sin
+#                  adivinar por longitud.
+# Cualquier otra cadena es una URL en claro (predicciones guardadas antes del cifrado).
+
+MARCADOR = "enc:v1:"
+PREFIJO_LEGACY = "Z0FBQUFB"
+
+# Cargar variables de entorno
+load_dotenv()
+
+
+class ClaveNoConfigurada(RuntimeError):
+    """Sin ENCRYPTION_KEYS/ENCRYPTION_KEY fuera de desarrollo: arrancar con una clave temporal
+    dejaría ilegibles todas las URLs guardadas tras el siguiente reinicio"""
+
+
+def _leer_claves():
+    """ENCRYPTION_KEYS="primaria,anterior,..." (la primera cifra, todas descifran) o ENCRYPTION_KEY"""
+    claves = [c.strip() for c in os.getenv('ENCRYPTION_KEYS', '').split(',') if c.strip()]
+    if not claves and os.getenv('ENCRYPTION_KEY'):
+        claves = [os.getenv('ENCRYPTION_KEY').strip()]
+    if claves:
+        log.info("✅ Sistema de cifrado inicializado desde .env (%d clave(s))", len(claves))
+        return [c.encode() for c in claves]
+    if not Colabskey.ALLOW_TEMP_ENCRYPTION_KEY:
+        raise ClaveNoConfigurada("Falta ENCRYPTION_KEYS o ENCRYPTION_KEY en el entorno")
+    log.warning("⚠️ No se encontró ENCRYPTION_KEY en .env, usando clave temporal (solo desarrollo).")
+    return [Fernet.generate_key()]
+
+
+def huella_clave(clave):
+    """Identificador corto y no secreto de una clave (para registros y checkpoints)"""
+    return hashlib.sha256(clave).hexdigest()[:12]
+
+
+# URLs ya descifradas, por sha256 del texto cifrado. Solo en memoria del proceso: el texto en claro
+# nunca se escribe a disco, y la caché se vacía cuando cambian las claves.
+_cache_urls = CacheTTL(Colabskey.DECRYPT_CACHE_MAX_ENTRIES, Colabskey.DECRYPT_CACHE_TTL_SECONDS)
+
+
+def configurar_claves(claves):
+    """Instala las claves (rotación): la primera es la primaria, el resto solo se usan para descifrar"""
+    global fernet, primaria, CLAVES, CLAVE_FUNCIONAL
+    CLAVES = [c if isinstance(c, bytes) else c.encode() for c in claves]
+    CLAVE_FUNCIONAL = CLAVES[0]
+    primaria = Fernet(CLAVE_FUNCIONAL)
+    fernet = MultiFernet([primaria] + [Fernet(c) for c in CLAVES[1:]])
+    _cache_urls.clear()
+
+
+def cambiar_clave(clave):
+    """Instala una sola clave nueva y descarta lo descifrado con la anterior"""
+    configurar_claves([clave])
+
+
+configurar_claves(_leer_claves())
+
+
+def estadisticas_cache():
+    return _cache_urls.stats()
+
+
+def esta_cifrada(valor):
+    return isinstance(valor, str) and (valor.startswith(MARCADOR) or valor.startswith(PREFIJO_LEGACY))
+
+
+def token_fernet(url_cifrada):
+    """Token Fernet (bytes) de un valor cifrado en cualquiera de los dos formatos"""
+    if url_cifrada.startswith(MARCADOR):
+        return url_cifrada[len(MARCADOR):].encode()
+    return base64.urlsafe_b64decode(url_cifrada.encode())
+
+
+def cifrar_url_imagen(url: str) -> str:
+    """Cifra la URL de la imagen para almacenamiento seguro"""
+    try:
+        return MARCADOR + fernet.encrypt(url.encode()).decode()
+    except Exception as e:
+        log.warning("⚠️ Error cifrando URL: %s", e)
+        return url
+
+
+def descifrar_url_imagen(url_cifrada: str) -> str:
+    """Descifra la URL de la imagen para uso"""
+    try:
+        if not esta_cifrada(url_cifrada):
+            return url_cifrada
+        clave = hashlib.sha256(url_cifrada.encode()).digest()
+        url = _cache_urls.get(clave)
+        if url is not None:
+            return url
+        try:
+            url = fernet.decrypt(token_fernet(url_cifrada)).decode()
+        except (InvalidToken, ValueError) as e:
+            # Ninguna clave sirve: se recuerda el fallo para no repetir el intento (ni el aviso) en cada lectura
+            log.warning("⚠️ Error descifrando URL: %r", e)
+            url = url_cifrada
+        _cache_urls.set(clave, url)
+        return url
+    except Exception as e:
+        log.warning("⚠️ Error descifrando URL: %r", e)
+        return url_cifrada
+
+
+# ==================== DESCIFRADO EN LOTE ====================
+# La verificación HMAC y el AES de cryptography corren en Rust/OpenSSL y sueltan el GIL,
+# así que un pool de hilos reparte el trabajo entre núcleos sin salir del proceso.
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _obtener_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=Colabskey.DECRYPT_WORKERS,
+                                           thread_name_prefix="descifrado")
+    return _pool
+
+
+def _descifrar_tramo(valores):
+    return [descifrar_url_imagen(v) for v in valores]
+
+
+def descifrar_urls(valores):
+    """Descifra una lista de URLs conservando el orden. Listas cortas se procesan en el hilo actual"""
+    valores = list(valores)
+    if Colabskey.DECRYPT_WORKERS <= 1 or len(valores) < Colabskey.DECRYPT_PARALLEL_MIN:
+        return _descifrar_tramo(valores)
+
+    # Un tramo por tarea (no una tarea por URL) para que el costo de coordinación no domine
+    tamano = max(1, -(-len(valores) // (Colabskey.DECRYPT_WORKERS * 4)))
+    tramos = [valores[i:i + tamano] for i in range(0, len(valores), tamano)]
+    resultado = []
+    for parcial in _obtener_pool().map(_descifrar_tramo, tramos):
+        resultado.extend(parcial)
+    return resultado
+
+
+def descifrar_documentos(documentos, campo='image_url'):
+    """Descifra en lote el campo indicado de cada documento (in place) y devuelve la misma lista"""
+    descifradas = descifrar_urls(doc.get(campo) for doc in documentos)
+    for documento, url in zip(documentos, descifradas):
+        if campo in documento:
+            documento[campo] = url
+    return documentos
@@ -1,129 +1,243 @@
 from flask import jsonify, request
 from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, OperationFailure
+from pymongo.errors import ConnectionFailure, OperationFailure, DuplicateKeyError
 from datetime import datetime
-import traceback # Importante para ver errores detallados
 import BackEnd.GlobalInfo.ResponseMessages as respuestas
 import BackEnd.GlobalInfo.Keys as Colabskey
+from BackEnd.Pagination import leer_limite, codificar_cursor, decodificar_cursor, CursorInvalido
+from BackEnd.Streaming import leer_formato, respuesta_streaming, FormatoInvalido
+import BackEnd.Identidades as Identidades
+import BackEnd.Versiones as Versiones
+import BackEnd.Agenda as Agenda
+import BackEnd.Metrics as Metrics
+from BackEnd.ProfileCache import profile_cache
 from bson import ObjectId
-import json
-import tensorflow as tf
-from tensorflow.keras.models import load_model
-from PIL import Image
-import numpy as np
-import io
 import os
-import base64
+import threading
 
-# ========== CIFRADO SIMPLE Y FUNCIONAL ==========
-from cryptography.fernet import Fernet
-import os
-from dotenv import load_dotenv
-
-# Cargar variables de entorno
-load_dotenv()
+# ========== CIFRADO (implementación en BackEnd.Cifrado) ==========
+from BackEnd.Cifrado import cifrar_url_imagen, descifrar_url_imagen, descifrar_documentos, estadisticas_cache
+from BackEnd import Logs
 
-# Obtener clave del .env
-clave_env = os.getenv('ENCRYPTION_KEY')
+log = Logs.obtener(__name__)
 
-# Generar clave temporal si no existe (para evitar crash en desarrollo)
-if not clave_env:
-    CLAVE_FUNCIONAL = Fernet.generate_key()
-    print("⚠️ No se encontró ENCRYPTION_KEY en .env, usando clave temporal.")
-else:
-    CLAVE_FUNCIONAL = clave_env.encode()
-    print("✅ Sistema de cifrado inicializado desde .env")
 
-# Inicialización DIRECTA sin lógica compleja
-fernet = Fernet(CLAVE_FUNCIONAL)
-
-def cifrar_url_imagen(url: str) -> str:
-    """Cifra la URL de la imagen para almacenamiento seguro"""
-    try:
-        # print(f"🔐 Cifrando URL...") 
-        url_cifrada = fernet.encrypt(url.encode())
-        url_cifrada_b64 = base64.urlsafe_b64encode(url_cifrada).decode()
-        return url_cifrada_b64
-    except Exception as e:
-        print(f"⚠️ Error cifrando URL: {e}")
-        return url
+# ==================== CONEXIÓN A BASE DE DATOS ====================
 
-def descifrar_url_imagen(url_cifrada: str) -> str:
-    """Descifra la URL de la imagen para uso"""
+def _asegurar_indices(db):
     try:
-        if len(url_cifrada) > 200:
-            url_cifrada_bytes = base64.urlsafe_b64decode(url_cifrada.encode())
-            url_descifrada = fernet.decrypt(url_cifrada_bytes).decode()
-            return url_descifrada
-        return url_cifrada
+        from BackEnd.Indexes import ensure_indexes
+        for coleccion, indice, error in ensure_indexes(db):
+            if error:
+                log.warning("⚠️ [DB] No se pudo crear el índice %s.%s: %s", coleccion, indice, error)
     except Exception as e:
-        print(f"⚠️ Error descifrando URL: {e}")
-        return url_cifrada
+        # Sin índices la API funciona (más lenta); no debe impedir la conexión
+        log.warning("⚠️ [DB] Error creando índices: %s", e)
 
+# Un solo MongoClient por proceso: el lock evita que peticiones simultáneas creen (y filtren) varios
+# clientes con sus pools e hilos de monitoreo; el pid detecta que estamos en un hijo tras un fork.
+_db_lock = threading.Lock()
 
-# ==================== CONEXIÓN A BASE DE DATOS ====================
+def set_db_connection(db):
+    """Instala una base ya abierta (benchmarks, pruebas) como la conexión de este proceso"""
+    with _db_lock:
+        Colabskey.dbconn = db
+        Colabskey.dbconn_pid = os.getpid()
 
 def get_db_connection():
-    if Colabskey.dbconn is None:
+    db = Colabskey.dbconn
+    if db is not None and Colabskey.dbconn_pid in (None, os.getpid()):
+        return db
+
+    with _db_lock:
+        if Colabskey.dbconn is not None and Colabskey.dbconn_pid not in (None, os.getpid()):
+            # Cliente heredado del proceso padre: no es seguro usarlo ni cerrarlo aquí
+            log.info("🔁 [DB] Proceso hijo detectado, se crea un cliente propio")
+            Colabskey.dbconn = None
+        if Colabskey.dbconn is not None:
+            return Colabskey.dbconn
         try:
-            print("🔌 [DB] Intentando conectar a MongoDB...")
+            log.info("🔌 [DB] Intentando conectar a MongoDB...")
             client = MongoClient(
                 Colabskey.MONGODB_URI,
                 serverSelectionTimeoutMS=10000,
                 connectTimeoutMS=10000,
                 socketTimeoutMS=10000,
                 retryWrites=True,
-                w='majority'
+                w='majority',
+                maxPoolSize=Colabskey.MONGO_MAX_POOL_SIZE,
+                minPoolSize=Colabskey.MONGO_MIN_POOL_SIZE,
+                maxIdleTimeMS=Colabskey.MONGO_MAX_IDLE_TIME_MS,
+                event_listeners=Metrics.event_listeners()
             )
-            print("✅ [DB] Conexión exitosa!")
-            Colabskey.dbconn = client[Colabskey.DB_NAME]
+            log.info("✅ [DB] Conexión exitosa!")
+            db = client[Colabskey.DB_NAME]
+            if Colabskey.ENSURE_INDEXES:
+                _asegurar_indices(db)
+            Colabskey.dbconn = db
+            Colabskey.dbconn_pid = os.getpid()
             return Colabskey.dbconn
             
         except Exception as e:
-            print(f"❌ [DB] Error crítico de conexión: {e}")
+            log.error("❌ [DB] Error crítico de conexión: %s", e)
             raise e
-    
-    return Colabskey.dbconn
+
+def calentar_conexion():
+    """Abre la conexión y hace un primer viaje real, para que la primera petición no pague el handshake TLS"""
+    db = get_db_connection()
+    db["users"].find_one({}, {"_id": 1})
+    return db
 
 # ==================== FUNCIONES DE USUARIOS ====================
 
+# Campos que devuelven los listados de usuarios (getAllUsers y exportUsers)
+CAMPOS_USUARIO = {"email": 1, "role": 1, "nombre": 1, "apellidos": 1}
+COLECCIONES_USUARIOS = ["users", "doctors", "patients"]
+
+def cursor_usuarios(token):
+    """Cursor de getAllUsers: índice en COLECCIONES_USUARIOS y último _id (None al empezar una colección)"""
+    cursor = decodificar_cursor(token, {"c": int, "i": (ObjectId, type(None))}) or {"c": 0, "i": None}
+    if not 0 <= cursor["c"] < len(COLECCIONES_USUARIOS):
+        raise CursorInvalido("Cursor de paginación inválido")
+    return cursor
+
+def _formatear_usuario(objUser, collection_name):
+    return {
+        "id": str(objUser["_id"]),
+        "email": objUser.get("email", ""),
+        "role": objUser.get("role", "No especificado"),
+        "nombre": objUser.get("nombre", ""),
+        "apellidos": objUser.get("apellidos", ""),
+        "collection": collection_name
+    }
+
 def getAllUsers():
     try:
-        print("🔍 Iniciando getAllUsers...")
+        log.debug("🔍 Iniciando getAllUsers...")
         db = get_db_connection()
         
+        # Paginación: se recorre users -> doctors -> patients por _id; el cursor guarda colección y último _id
+        limite = leer_limite(request.args)
+        cursor = cursor_usuarios(request.args.get('cursor'))
+        
         arrFinalUsers = []
-        collections_to_check = ["users", "doctors", "patients"]
+        collections_to_check = COLECCIONES_USUARIOS
+        siguiente = None
         
-        for collection_name in collections_to_check:
-            collection = db[collection_name]
-            listUsers = list(collection.find({}))
+        for indice in range(cursor["c"], len(collections_to_check)):
+            collection_name = collections_to_check[indice]
+            filtro = {"_id": {"$gt": cursor["i"]}} if indice == cursor["c"] and cursor["i"] else {}
+            faltan = limite - len(arrFinalUsers)
+            
+            # Se pide uno de más para saber si queda algo después de esta página
+            listUsers = list(db[collection_name]
+                             .find(filtro, CAMPOS_USUARIO)
+                             .sort("_id", 1)
+                             .limit(faltan + 1))
             
-            if len(listUsers) > 0:
-                for objUser in listUsers:
-                    objFormateado = {
-                        "id": str(objUser["_id"]),
-                        "email": objUser.get("email", ""),
-                        "role": objUser.get("role", "No especificado"),
-                        "nombre": objUser.get("nombre", ""),
-                        "apellidos": objUser.get("apellidos", ""),
-                        "collection": collection_name
-                    }
-                    arrFinalUsers.append(objFormateado)
-        
-        print(f"📊 Total de usuarios encontrados: {len(arrFinalUsers)}")
+            for objUser in listUsers[:faltan]:
+                arrFinalUsers.append(_formatear_usuario(objUser, collection_name))
+            
+            if len(listUsers) > faltan:
+                siguiente = codificar_cursor(c=indice, i=listUsers[faltan - 1]["_id"])
+                break
+            if len(arrFinalUsers) >= limite:
+                # Página llena justo al final de esta colección: seguir con la próxima
+                if indice + 1 < len(collections_to_check):
+                    siguiente = codificar_cursor(c=indice + 1, i=None)
+                break
+        
+        log.debug("📊 Total de usuarios encontrados: %d", len(arrFinalUsers))
         
         objResponse = respuestas.succ200.copy()
         objResponse["arrUsers"] = arrFinalUsers
+        objResponse["next"] = siguiente
         return jsonify(objResponse)
         
+    except CursorInvalido as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        log.exception("💥 ERROR en getAllUsers: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+def exportUsers():
+    """Exporta todos los usuarios en streaming (?format=json|ndjson), sin cargar las colecciones en memoria"""
+    try:
+        formato = leer_formato(request.args)
+        db = get_db_connection()
+        
+        def documentos():
+            for collection_name in COLECCIONES_USUARIOS:
+                cursor = db[collection_name].find({}, CAMPOS_USUARIO).sort("_id", 1).batch_size(Colabskey.EXPORT_BATCH_SIZE)
+                with cursor:
+                    for objUser in cursor:
+                        yield _formatear_usuario(objUser, collection_name)
+        
+        return respuesta_streaming(documentos(), formato, "users")
+    except FormatoInvalido as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        print(f"💥 ERROR en getAllUsers: {str(e)}")
+        log.exception("💥 ERROR en exportUsers: %s", e)
         return jsonify({"error": str(e)}), 500
 
+def _rol_y_coleccion(role_raw):
+    """Rol normalizado y colección de perfil para un registro"""
+    role = str(role_raw).lower().strip()
+    if role in ['medico', 'doctor']:
+        return "doctor", "doctors"
+    if role in ['paciente', 'patient']:
+        return "paciente", "patients"
+    return role, "users"
+
+def _usuario_basico(data, role):
+    return {
+        "email": data['email'],
+        "password": data['password'],
+        "role": role,
+        "fechaRegistro": datetime.now()
+    }
+
+def _perfil_nuevo(data, role, collection_name, user_id):
+    base_profile = {
+        "email": data['email'],
+        "password": data['password'],
+        "role": role,
+        "nombre": data.get('nombre', ''),
+        "apellidos": data.get('apellidos', ''),
+        "edad": data.get('edad', ''),
+        "fechaNacimiento": data.get('fechaNacimiento', ''),
+        "genero": data.get('genero', ''),
+        "profileImage": data.get('profileImage', ''),
+        "fechaRegistro": datetime.now(),
+        "userId": user_id
+    }
+    
+    final_profile = base_profile.copy()
+    
+    if collection_name == "doctors":
+        final_profile.update({
+            "cedula": data.get('cedula', ''),
+            "especialidad": data.get('especialidad', ''),
+            "subespecialidad": data.get('subespecialidad', ''),
+            "estado": "activo",
+            "verificado": False
+        })
+    elif collection_name == "patients":
+        final_profile.update({
+            "peso": data.get('peso', ''),
+            "altura": data.get('altura', '')
+        })
+    return final_profile
+
+def _existe_en_colecciones(db, email):
+    """Verificación anterior a db.identities (tres consultas); solo mientras la migración no termine"""
+    return (db["users"].find_one({"email": email}, {"_id": 1}) or
+            db["doctors"].find_one({"email": email}, {"_id": 1}) or
+            db["patients"].find_one({"email": email}, {"_id": 1}))
+
 def addUser():
     try:
-        print("🔍 [REGISTRO] Iniciando addUser...")
+        log.debug("🔍 [REGISTRO] Iniciando addUser...")
         data = request.get_json()
         
         # 1. Validaciones básicas
@@ -133,78 +247,56 @@ def addUser():
         db = get_db_connection()
         email = data['email']
         
-        # 2. Verificar duplicados
-        if (db["users"].find_one({"email": email}) or 
-            db["doctors"].find_one({"email": email}) or 
-            db["patients"].find_one({"email": email})):
+        # 2. Verificar duplicados: con la migración hecha, reservar el email en identities ya lo verifica
+        if not Identidades.migracion_completa(db) and _existe_en_colecciones(db, email):
             return jsonify({"intStatus": 409, "Error": "El usuario ya existe"}), 409
         
         # 3. Determinar Rol y Colección
-        role_raw = data.get('role', 'patient')
-        role = str(role_raw).lower().strip()
+        role, collection_name = _rol_y_coleccion(data.get('role', 'patient'))
         
-        collection_name = "users"
-        if role in ['medico', 'doctor']:
-            collection_name = "doctors"
-            role = "doctor"
-        elif role in ['paciente', 'patient']:
-            collection_name = "patients"
-            role = "paciente"
-            
-        # 4. Crear Usuario Básico
-        user_basic_data = {
-            "email": email,
-            "password": data['password'],
-            "role": role,
-            "fechaRegistro": datetime.now()
-        }
-        user_result = db["users"].insert_one(user_basic_data)
-        user_id = user_result.inserted_id
-        
-        # 5. Crear Perfil Específico
-        base_profile = {
-            "email": email,
-            "password": data['password'],
-            "role": role,
-            "nombre": data.get('nombre', ''),
-            "apellidos": data.get('apellidos', ''),
-            "edad": data.get('edad', ''),
-            "fechaNacimiento": data.get('fechaNacimiento', ''),
-            "genero": data.get('genero', ''),
-            "profileImage": data.get('profileImage', ''),
-            "fechaRegistro": datetime.now(),
-            "userId": user_id
-        }
+        # Los _id se generan aquí para que la identidad se escriba primero (y sea el candado del email)
+        user_basic = dict(_usuario_basico(data, role), _id=ObjectId())
+        final_profile = dict(_perfil_nuevo(data, role, collection_name, user_basic["_id"]), _id=ObjectId())
+        db[Identidades.COLECCION].insert_one(
+            Identidades.documento_identidad(user_basic, final_profile, collection_name))
         
-        final_profile = base_profile.copy()
-        
-        if collection_name == "doctors":
-            final_profile.update({
-                "cedula": data.get('cedula', ''),
-                "especialidad": data.get('especialidad', ''),
-                "subespecialidad": data.get('subespecialidad', ''),
-                "estado": "activo",
-                "verificado": False
-            })
-        elif collection_name == "patients":
-            final_profile.update({
-                "peso": data.get('peso', ''),
-                "altura": data.get('altura', '')
-            })
+        try:
+            # 4. Crear Usuario Básico
+            db["users"].insert_one(user_basic)
             
-        db[collection_name].insert_one(final_profile)
+            # 5. Crear Perfil Específico
+            db[collection_name].insert_one(final_profile)
+        except Exception:
+            # Deshacer el registro a medias: sin esto el usuario huérfano deja el email en 409/404 para siempre
+            db["users"].delete_one({"_id": user_basic["_id"]})
+            db[Identidades.COLECCION].delete_one({"_id": email, "userId": user_basic["_id"]})
+            raise
+        Versiones.incrementar(db, Versiones.USUARIOS)
         
         return jsonify({
             "intStatus": 200,
             "strAnswer": "Usuario creado exitosamente",
-            "userId": str(user_id)
+            "userId": str(user_basic["_id"])
         })
         
+    except DuplicateKeyError:
+        # _id de identities (y el índice único de email) atrapan duplicados y registros simultáneos
+        return jsonify({"intStatus": 409, "Error": "El usuario ya existe"}), 409
     except Exception as e:
-        print(f"💥💥 [REGISTRO] ERROR: {str(e)}")
-        traceback.print_exc()
+        log.exception("💥💥 [REGISTRO] ERROR: %s", e)
         return jsonify({"intStatus": 500, "Error": str(e)}), 500
 
+def _identidad_desde_colecciones(db, email):
+    """Login anterior (users y luego el perfil) para usuarios aún sin identidad; la deja creada"""
+    user_basic = db["users"].find_one({"email": email})
+    if not user_basic:
+        return None
+    collection_name = Identidades.coleccion_de_rol(user_basic.get('role', 'patient'))
+    user_profile = db[collection_name].find_one({"email": email}) if collection_name != "users" else None
+    identidad = Identidades.documento_identidad(user_basic, user_profile, collection_name)
+    Identidades.insertar_si_no_existe(db, [identidad])
+    return identidad
+
 def loginUser():
     try:
         data = request.get_json()
@@ -215,134 +307,141 @@ def loginUser():
         email = data['email']
         password = data['password']
         
-        user_basic = db["users"].find_one({"email": email})
+        # Un solo find_one por _id
+        identidad = db[Identidades.COLECCION].find_one({"_id": email})
+        if identidad is None and not Identidades.migracion_completa(db):
+            identidad = _identidad_desde_colecciones(db, email)
         
-        if not user_basic:
+        if not Identidades.permite_login(identidad):
             return jsonify({"intStatus": 404, "Error": "Usuario no encontrado"}), 404
             
-        if user_basic['password'] != password:
+        if identidad['password'] != password:
             return jsonify({"intStatus": 401, "Error": "Contraseña incorrecta"}), 401
-            
-        role = user_basic.get('role', 'patient')
-        user_profile = None
-        collection_name = "users"
-        
-        if role in ['medico', 'doctor']:
-            user_profile = db["doctors"].find_one({"email": email})
-            collection_name = "doctors"
-        elif role in ['paciente', 'patient']:
-            user_profile = db["patients"].find_one({"email": email})
-            collection_name = "patients"
-            
-        user_response = {
-            "id": str(user_basic["_id"]),
-            "email": email,
-            "role": role,
-            "collection": collection_name
-        }
-        
-        if user_profile:
-            user_response["nombre"] = user_profile.get("nombre", "")
-            user_response["apellidos"] = user_profile.get("apellidos", "")
-            user_response["profileId"] = str(user_profile["_id"])
-        else:
-            user_response["nombre"] = user_basic.get("nombre", "")
-            user_response["apellidos"] = user_basic.get("apellidos", "")
 
         return jsonify({
             "intStatus": 200,
             "strAnswer": "Login exitoso",
-            "user": user_response
+            "user": Identidades.usuario_login(identidad)
         })
             
     except Exception as e:
-        print(f"💥 [LOGIN] Error: {str(e)}")
+        log.exception("💥 [LOGIN] Error: %s", e)
         return jsonify({"intStatus": 500, "Error": str(e)}), 500
 
+def _perfil_combinado(db, user_id):
+    """users + doctors/patients en el formato que espera la app; None si el usuario no existe"""
+    user_basic = db["users"].find_one({"_id": user_id})
+
+    if not user_basic:
+        return None
+
+    role = user_basic.get('role', 'patient')
+    user_profile = None
+
+    if role in ['medico', 'doctor']:
+        user_profile = db["doctors"].find_one({"userId": user_id})
+    elif role in ['paciente', 'patient']:
+        user_profile = db["patients"].find_one({"userId": user_id})
+
+    # 1. Crear Objeto Base y Mapear 'email' -> 'correo'
+    user_combined = {
+        "id": str(user_basic["_id"]),
+        "correo": user_basic["email"],
+        "role": role,
+        "nombre": user_basic.get("nombre", ""),
+        "apellido": user_basic.get("apellidos", "")
+    }
+
+    if user_profile:
+        # 2. Actualizar con datos del perfil y Mapear nombres
+        user_combined.update({
+            "nombre": user_profile.get("nombre", ""),
+            "apellido": user_profile.get("apellidos", ""),
+            "profileId": str(user_profile["_id"]),
+            "profileImage": user_profile.get("profileImage", ""),
+            "edad": user_profile.get("edad", 0),
+            "genero": user_profile.get("genero", ""),
+            "pdfUrl": user_profile.get("pdfUrl", ""),
+            "nacimiento": user_profile.get("fechaNacimiento", "")
+        })
+
+        # 3. AGREGAR PESO Y ALTURA
+        if role in ['paciente', 'patient']:
+            user_combined["peso"] = user_profile.get("peso", 0)
+            user_combined["altura"] = user_profile.get("altura", 0)
+
+        # Datos extra Doctor
+        if role in ['medico', 'doctor']:
+            user_combined["cedula"] = user_profile.get("cedula", "")
+            user_combined["especialidad"] = user_profile.get("especialidad", "")
+
+    return user_combined
+
 def getUserById(user_id):
     try:
         from bson import ObjectId
-        db = get_db_connection()
-        
-        user_basic = db["users"].find_one({"_id": ObjectId(user_id)})
-        
-        if not user_basic:
-            return jsonify({"user": None})
-            
-        role = user_basic.get('role', 'patient')
-        user_profile = None
-        
-        if role in ['medico', 'doctor']:
-            user_profile = db["doctors"].find_one({"userId": ObjectId(user_id)})
-        elif role in ['paciente', 'patient']:
-            user_profile = db["patients"].find_one({"userId": ObjectId(user_id)})
-            
-        # 1. Crear Objeto Base y Mapear 'email' -> 'correo'
-        user_combined = {
-            "id": str(user_basic["_id"]),
-            "correo": user_basic["email"],
-            "role": role,
-            "nombre": user_basic.get("nombre", ""),
-            "apellido": user_basic.get("apellidos", "")
-        }
-        
-        if user_profile:
-            # 2. Actualizar con datos del perfil y Mapear nombres
-            user_combined.update({
-                "nombre": user_profile.get("nombre", ""),
-                "apellido": user_profile.get("apellidos", ""), 
-                "profileId": str(user_profile["_id"]),
-                "profileImage": user_profile.get("profileImage", ""),
-                "edad": user_profile.get("edad", 0),
-                "genero": user_profile.get("genero", ""),
-                "pdfUrl": user_profile.get("pdfUrl", ""),
-                "nacimiento": user_profile.get("fechaNacimiento", "")
-            })
-
-            # 3. AGREGAR PESO Y ALTURA
-            if role in ['paciente', 'patient']:
-                user_combined["peso"] = user_profile.get("peso", 0)
-                user_combined["altura"] = user_profile.get("altura", 0)
-
-            # Datos extra Doctor
-            if role in ['medico', 'doctor']:
-                user_combined["cedula"] = user_profile.get("cedula", "")
-                user_combined["especialidad"] = user_profile.get("especialidad", "")
-            
+        oid = ObjectId(user_id)
+        clave = str(oid)
+
+        # Repetir el perfil (dashboard, ajustes, perfil del doctor...) no toca Mongo
+        user_combined = profile_cache.get(clave)
+        if user_combined is None:
+            generacion = profile_cache.generacion()
+            user_combined = _perfil_combinado(get_db_connection(), oid)
+            if user_combined is None:
+                return jsonify({"user": None})
+            profile_cache.set(clave, user_combined, generacion)
+
         return jsonify({"intStatus": 200, "user": user_combined})
-        
+
     except Exception as e:
-        print(f"💥 Error getUserById: {e}")
+        log.exception("💥 Error getUserById: %s", e)
         return jsonify({"intStatus": 500, "Error": str(e)}), 500
     
 def getUsersByRole(role):
     try:
         db = get_db_connection()
-        arrFinalUsers = []
-        collection = db["users"] 
-        
-        if role in ['medico', 'doctor']:
-            collection = db["doctors"]
-        elif role in ['paciente', 'patient']:
-            collection = db["patients"]
-            
-        listUsers = list(collection.find({}))
-        
-        for objUser in listUsers:
-            arrFinalUsers.append({
-                "id": str(objUser.get("userId", objUser["_id"])),
-                "email": objUser.get("email", ""),
-                "nombre": objUser.get("nombre", ""),
-                "apellidos": objUser.get("apellidos", ""),
-                "role": objUser.get("role", role),
-                # 🔥 AGREGA ESTA LÍNEA AQUÍ ABAJO:
-                "especialidad": objUser.get("especialidad", "Médico General") 
-            })
-            
-        return jsonify({"intStatus": 200, "arrUsers": arrFinalUsers})
+        # 304 sin consultar la colección si la app ya tiene esta versión del listado
+        return Versiones.respuesta_condicional(db, [Versiones.USUARIOS], lambda: _pagina_por_rol(db, role))
+    except CursorInvalido as e:
+        return jsonify({"intStatus": 400, "Error": str(e)}), 400
     except Exception as e:
         return jsonify({"intStatus": 500, "Error": str(e)}), 500
-    
+
+def _pagina_por_rol(db, role):
+    arrFinalUsers = []
+    collection = db["users"] 
+
+    if role in ['medico', 'doctor']:
+        collection = db["doctors"]
+    elif role in ['paciente', 'patient']:
+        collection = db["patients"]
+
+    limite = leer_limite(request.args)
+    cursor = decodificar_cursor(request.args.get('cursor'), {"i": ObjectId})
+    filtro = {"_id": {"$gt": cursor["i"]}} if cursor else {}
+
+    listUsers = list(collection
+                     .find(filtro, {"userId": 1, "email": 1, "nombre": 1, "apellidos": 1,
+                                    "role": 1, "especialidad": 1})
+                     .sort("_id", 1)
+                     .limit(limite + 1))
+
+    for objUser in listUsers[:limite]:
+        arrFinalUsers.append({
+            "id": str(objUser.get("userId", objUser["_id"])),
+            "email": objUser.get("email", ""),
+            "nombre": objUser.get("nombre", ""),
+            "apellidos": objUser.get("apellidos", ""),
+            "role": objUser.get("role", role),
+            # 🔥 AGREGA ESTA LÍNEA AQUÍ ABAJO:
+            "especialidad": objUser.get("especialidad", "Médico General") 
+        })
+
+    siguiente = codificar_cursor(i=listUsers[limite - 1]["_id"]) if len(listUsers) > limite else None
+
+    return jsonify({"intStatus": 200, "arrUsers": arrFinalUsers, "next": siguiente})
+
 # ==================== 🔥 FUNCIÓN UPDATEUSER BLINDADA 🔥 ====================
 def updateUser(user_id=None):
     try:
@@ -360,7 +459,7 @@ def updateUser(user_id=None):
 
         # 🛡️ VALIDACIÓN EXTRA: Si el ID que llega por URL no es válido (ej: dice "profile"), lo ignoramos
         if target_id and not ObjectId.is_valid(target_id):
-            print(f"⚠️ El ID recibido en URL '{target_id}' no es válido. Buscando en el JSON...")
+            log.warning("⚠️ El ID recibido en URL '%s' no es válido. Buscando en el JSON...", target_id)
             target_id = None 
 
         # Si no tenemos ID válido de la URL, lo sacamos del JSON (Frontend)
@@ -368,10 +467,13 @@ def updateUser(user_id=None):
             target_id = data.get('userId') or data.get('id')
             
         if not target_id or not ObjectId.is_valid(target_id):
-            print("❌ Error: No se encontró un userId válido ni en URL ni en JSON")
+            log.warning("❌ Error: No se encontró un userId válido ni en URL ni en JSON")
             return jsonify({"intStatus": 400, "Error": "Falta el ID válido del usuario"}), 400
 
-        print(f"🔄 Actualizando usuario ID: {target_id}")
+        log.info("🔄 Actualizando usuario ID: %s", target_id)
+        # También antes de escribir: una lectura en curso no vuelve a guardar el perfil anterior y, si
+        # alguna escritura falla a medias, la siguiente lectura va a Mongo
+        profile_cache.invalidar(str(ObjectId(target_id)))
 
         # 2. LIMPIEZA DE DATOS
         datos_limpios = data.copy()
@@ -418,12 +520,15 @@ def updateUser(user_id=None):
                 if update_profile:
                     db[collection_name].update_one({"userId": ObjectId(target_id)}, {"$set": update_profile})
 
+            # Login lee de identities: email, contraseña, rol o nombre pudieron cambiar
+            Identidades.sincronizar(db, ObjectId(target_id))
+
+        profile_cache.invalidar(str(ObjectId(target_id)))
+        Versiones.incrementar(db, Versiones.USUARIOS)
         return jsonify({"intStatus": 200, "strAnswer": "Actualizado correctamente"})
         
     except Exception as e:
-        print(f"💥💥 ERROR CRÍTICO EN UPDATEUSER: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("💥💥 ERROR CRÍTICO EN UPDATEUSER: %s", e)
         return jsonify({"intStatus": 500, "Error": f"Error interno: {str(e)}"}), 500
     
 def deleteUser(user_id):
@@ -433,7 +538,11 @@ def deleteUser(user_id):
         
         db["doctors"].delete_one({"userId": ObjectId(user_id)})
         db["patients"].delete_one({"userId": ObjectId(user_id)})
+        db[Identidades.COLECCION].delete_many({"userId": ObjectId(user_id)})
         result = db["users"].delete_one({"_id": ObjectId(user_id)})
+        profile_cache.invalidar(str(ObjectId(user_id)))
+        if result.deleted_count > 0:
+            Versiones.incrementar(db, Versiones.USUARIOS)
         
         if result.deleted_count > 0:
             return jsonify({"intStatus": 200, "strAnswer": "Eliminado"})
@@ -446,103 +555,156 @@ def deleteUser(user_id):
     
 
 # ========== FUNCIONES DE PREDICCIÓN CON CIFRADO ==========
+# El análisis vive en BackEnd.Analysis y se importa en la primera petición que lo usa
+
+def _analysis():
+    from BackEnd import Analysis
+    return Analysis
 
 def analyze_complete():
-    try:
-        if "image" not in request.files:
-            return jsonify({"error": "No se envió ninguna imagen para el modelo"}), 400
+    return _analysis().analyze_complete()
 
-        cloudinary_url = request.form.get('image_url', '')
-        patient_name = request.form.get('patient_name', '')
-        patient_age = request.form.get('patient_age', '')
-        patient_id = request.form.get('patient_id', '')
-        breast_side = request.form.get('breast_side', '')
-        clinical_notes = request.form.get('clinical_notes', '')
-        
-        file = request.files["image"]
-        
-        # 1. PROCESAR CON MODELO
-        print("🔮 Iniciando evaluación de imagen...")
-        current_file = os.path.abspath(__file__)
-        BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(current_file)))
-        MODEL_PATH = os.path.join(BASE_DIR, "models", "model_vgg16_final.keras")
-        
-        if not os.path.exists(MODEL_PATH):
-            return jsonify({"error": "Modelo no encontrado"}), 500
-        
-        try:
-            model = load_model(MODEL_PATH)
-            img = Image.open(io.BytesIO(file.read())).convert("RGB")
-            img = img.resize((227, 227))
-            img_array = np.array(img) / 255.0
-            img_array = np.expand_dims(img_array, axis=0)
-            prediction = model.predict(img_array)
-        except Exception as e:
-            print(f"❌ Error en modelo: {e}")
-            return jsonify({"error": str(e)}), 500
+def analyze_batch():
+    return _analysis().analyze_batch()
 
-        malignant_probability = float(prediction[0][0])
+def getModelStatus():
+    return _analysis().getModelStatus()
 
-        if malignant_probability > 0.5:
-            classification = "Maligno"
-            confidence_percent = malignant_probability * 100
-        else:
-            classification = "Benigno"
-            confidence_percent = (1 - malignant_probability) * 100
+# Campos que devuelven los listados de predicciones (los mismos que escribe analyze_complete)
+CAMPOS_PREDICCION = {
+    'image_url': 1, 'patient_name': 1, 'patient_age': 1, 'patient_id': 1, 'breast_side': 1,
+    'clinical_notes': 1, 'classification': 1, 'confidence': 1, 'analysis_date': 1, 'created_at': 1
+}
 
-        # 2. GUARDAR EN MONGODB
-        try:
-            db = get_db_connection()
-            url_cifrada = cifrar_url_imagen(cloudinary_url)
-            
-            prediction_doc = {
-                'image_url': url_cifrada,
-                'patient_name': patient_name,
-                'patient_age': int(patient_age) if patient_age and patient_age.isdigit() else 0,
-                'patient_id': patient_id,
-                'breast_side': breast_side,
-                'clinical_notes': clinical_notes,
-                'classification': classification,
-                'confidence': confidence_percent,
-                'analysis_date': datetime.utcnow().isoformat(),
-                'created_at': datetime.utcnow()
-            }
-            
-            result = db.prediction.insert_one(prediction_doc)
-            prediction_id = str(result.inserted_id)
-            
-        except Exception as e:
-            print(f"❌ Error DB: {e}")
-            return jsonify({"error": str(e)}), 500
+def getAllPredictions():
+    try:
+        db = get_db_connection()
+        # 304 sin consultar, descifrar ni serializar si la app ya tiene esta página
+        return Versiones.respuesta_condicional(db, [Versiones.PREDICCIONES], lambda: _pagina_predicciones(db))
+    except CursorInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        return jsonify({
-            "success": True,
-            "prediction_id": prediction_id,
-            "classification": classification,
-            "confidence": float(malignant_probability),
-            "confidence_percent": float(confidence_percent),
-            "data": {
-                "patient_name": patient_name
-            }
-        })
+def _pagina_predicciones(db):
+    # Más recientes primero; el cursor es (created_at, _id) de la última de la página anterior
+    limite = leer_limite(request.args)
+    cursor = decodificar_cursor(request.args.get('cursor'), {"c": datetime, "i": ObjectId})
+    filtro = {}
+    if cursor:
+        filtro = {"$or": [
+            {"created_at": {"$lt": cursor["c"]}},
+            {"created_at": cursor["c"], "_id": {"$lt": cursor["i"]}}
+        ]}
 
-    except Exception as e:
-        print(f"💥 Error analyze_complete: {e}")
-        return jsonify({"error": str(e)}), 500
+    predictions = list(db.prediction
+                       .find(filtro, CAMPOS_PREDICCION)
+                       .sort([('created_at', -1), ('_id', -1)])
+                       .limit(limite + 1))
 
-def getAllPredictions():
+    siguiente = None
+    if len(predictions) > limite:
+        predictions = predictions[:limite]
+        ultima = predictions[-1]
+        siguiente = codificar_cursor(c=ultima['created_at'], i=ultima['_id'])
+
+    for prediction in predictions:
+        prediction['_id'] = str(prediction['_id'])
+    # Descifrado en lote (pool de hilos) en lugar de una URL a la vez
+    descifrar_documentos(predictions)
+
+    # La respuesta sigue siendo un arreglo; el cursor de la siguiente página va en un header
+    response = jsonify(predictions)
+    if siguiente:
+        response.headers['X-Next-Cursor'] = siguiente
+    return response
+
+def exportPredictions():
+    """Historial completo de predicciones en streaming (?format=json|ndjson), para auditorías.
+    Cada documento se descifra y serializa al vuelo: la memoria no crece con el tamaño de la colección."""
     try:
+        formato = leer_formato(request.args)
         db = get_db_connection()
-        predictions = list(db.prediction.find().sort('created_at', -1))
         
-        for prediction in predictions:
-            prediction['_id'] = str(prediction['_id'])
-            prediction['image_url'] = descifrar_url_imagen(prediction['image_url'])
+        def documentos():
+            cursor = (db.prediction
+                      .find({}, CAMPOS_PREDICCION)
+                      .sort([('created_at', -1), ('_id', -1)])
+                      .batch_size(Colabskey.EXPORT_BATCH_SIZE))
+            with cursor:
+                # Se descifra por lotes del tamaño del batch del cursor: memoria acotada y crypto en paralelo
+                lote = []
+                for prediction in cursor:
+                    prediction['_id'] = str(prediction['_id'])
+                    lote.append(prediction)
+                    if len(lote) >= Colabskey.EXPORT_BATCH_SIZE:
+                        yield from descifrar_documentos(lote)
+                        lote = []
+                yield from descifrar_documentos(lote)
         
-        return jsonify(predictions)
+        return respuesta_streaming(documentos(), formato, "predictions")
+    except FormatoInvalido as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def getCryptoStatus():
+    """Métricas de la caché de URLs descifradas (aciertos, fallos, expulsiones)"""
+    return jsonify({"intStatus": 200, "decrypted_url_cache": estadisticas_cache()})
+
+# ==================== ADMINISTRACIÓN: RE-CIFRADO ====================
+
+def _admin_autorizado():
+    return bool(Colabskey.ADMIN_TOKEN) and request.headers.get('X-Admin-Token') == Colabskey.ADMIN_TOKEN
+
+def _estado_recifrado(db):
+    from BackEnd import Recifrado
+    estado = Recifrado.TrabajoRecifrado(db).estado() or {"status": "never_run"}
+    estado.pop("_id", None)
+    if estado.get("last_id") is not None:
+        estado["last_id"] = str(estado["last_id"])
+    estado["running"] = Recifrado.en_ejecucion(estado)
+    for campo in ("lease_until", "owner"):
+        estado.pop(campo, None)
+    total = estado.get("total") or 0
+    estado["progress"] = min(1.0, estado.get("processed", 0) / total) if total else None
+    return estado
+
+def startReencryption():
+    """Lanza el re-cifrado en segundo plano (body opcional: {"restart": true})"""
+    if not _admin_autorizado():
+        return jsonify({"intStatus": 403, "Error": "No autorizado"}), 403
+    try:
+        from BackEnd import Recifrado
+        db = get_db_connection()
+        reiniciar = bool((request.get_json(silent=True) or {}).get("restart"))
+        try:
+            Recifrado.iniciar_en_segundo_plano(db, reiniciar=reiniciar)
+        except Recifrado.TrabajoEnEjecucion:
+            return jsonify({"intStatus": 409, "Error": "El re-cifrado ya está en ejecución",
+                            "job": _estado_recifrado(db)}), 409
+        return jsonify({"intStatus": 202, "job": _estado_recifrado(db)}), 202
+    except Exception as e:
+        return jsonify({"intStatus": 500, "Error": str(e)}), 500
+
+def getReencryptionStatus():
+    if not _admin_autorizado():
+        return jsonify({"intStatus": 403, "Error": "No autorizado"}), 403
+    try:
+        return jsonify({"intStatus": 200, "job": _estado_recifrado(get_db_connection())})
+    except Exception as e:
+        return jsonify({"intStatus": 500, "Error": str(e)}), 500
+
+def stopReencryption():
+    """Detiene el trabajo al terminar el lote en curso (en el worker que lo ejecute); el checkpoint permite reanudarlo"""
+    if not _admin_autorizado():
+        return jsonify({"intStatus": 403, "Error": "No autorizado"}), 403
+    try:
+        from BackEnd import Recifrado
+        return jsonify({"intStatus": 200, "stopping": Recifrado.solicitar_detencion(get_db_connection())})
+    except Exception as e:
+        return jsonify({"intStatus": 500, "Error": str(e)}), 500
+
 def getPredictionById(prediction_id):
     try:
         db = get_db_connection()
@@ -563,6 +725,7 @@ def deletePrediction(prediction_id):
         result = db.prediction.delete_one({'_id': ObjectId(prediction_id)})
         
         if result.deleted_count == 0: return jsonify({'error': 'No encontrada'}), 404
+        Versiones.incrementar(db, Versiones.PREDICCIONES)
         
         return jsonify({'message': 'Eliminada exitosamente'})
     except Exception as e:
@@ -570,7 +733,7 @@ def deletePrediction(prediction_id):
     
 def createAppointment():
     try:
-        print("📅 [CITAS] Iniciando creación de cita...")
+        log.debug("📅 [CITAS] Iniciando creación de cita...")
         data = request.get_json()
         
         if not data:
@@ -582,6 +745,12 @@ def createAppointment():
         if 'medicoId' not in data or 'pacienteId' not in data:
              return jsonify({"intStatus": 400, "message": "Faltan IDs de médico o paciente"}), 400
 
+        try:
+            inicio = Agenda.leer_inicio(data.get('fecha'), data.get('hora'), data.get('fechahoraCita'))
+            duracion = Agenda.leer_duracion(data.get('duracionMin'))
+        except Agenda.FechaInvalida as e:
+            return jsonify({"intStatus": 400, "message": str(e)}), 400
+
         # Preparar objeto para MongoDB
         # Nota: Guardamos los IDs como strings para referencia fácil, 
         # o puedes usar ObjectId(data['medicoId']) si prefieres referencias estrictas.
@@ -599,11 +768,21 @@ def createAppointment():
             "estado": "pendiente",      # Estado inicial
             "fechaCreacion": datetime.now()
         }
+        # inicio/fin/bloques normalizados: el índice único de la agenda rechaza el choque en el mismo insert
+        nueva_cita.update(Agenda.campos_agenda(inicio, duracion, nueva_cita["estado"]))
 
         # Guardar en colección 'appointments'
-        result = db.appointments.insert_one(nueva_cita)
+        try:
+            result = db.appointments.insert_one(nueva_cita)
+        except DuplicateKeyError:
+            log.info("⛔ [CITAS] Horario ocupado para el médico %s: %s", nueva_cita["medicoId"], inicio)
+            return jsonify({"intStatus": 409, "success": False,
+                            "message": "El médico ya tiene una cita en ese horario"}), 409
+        # Agendas del doctor y del paciente: sus ETag dejan de coincidir
+        Versiones.incrementar(db, Versiones.citas_medico(nueva_cita["medicoId"]),
+                              Versiones.citas_paciente(nueva_cita["pacienteId"]))
         
-        print(f"✅ [CITAS] Cita guardada con ID: {result.inserted_id}")
+        log.info("✅ [CITAS] Cita guardada con ID: %s", result.inserted_id)
 
         return jsonify({
             "intStatus": 200,
@@ -613,118 +792,207 @@ def createAppointment():
         })
 
     except Exception as e:
-        print(f"❌ [CITAS] Error al crear cita: {e}")
+        log.exception("❌ [CITAS] Error al crear cita: %s", e)
         return jsonify({"intStatus": 500, "message": str(e)}), 500
 
 # ==================== 🔥 OBTENER CITAS POR USUARIO 🔥 ====================
+def _buscar_doctores(db, medico_ids):
+    """Resuelve todos los medicoId en UNA consulta; mismo orden de prioridad que antes: id, userId, _id"""
+    medico_ids = [m for m in medico_ids if m]
+    if not medico_ids:
+        return {}
+
+    oids = [ObjectId(m) for m in medico_ids if ObjectId.is_valid(m)]
+    condiciones = [{"id": {"$in": medico_ids}}]
+    if oids:
+        condiciones += [{"userId": {"$in": oids}}, {"_id": {"$in": oids}}]
+    proyeccion = {"id": 1, "userId": 1, "nombre": 1, "apellidos": 1, "especialidad": 1}
+
+    por_id, por_user_id, por_oid = {}, {}, {}
+    for doc in db.doctors.find({"$or": condiciones}, proyeccion):
+        if "id" in doc:
+            por_id.setdefault(doc["id"], doc)
+        if doc.get("userId") is not None:
+            por_user_id.setdefault(str(doc["userId"]), doc)
+        por_oid.setdefault(str(doc["_id"]), doc)
+
+    return {
+        m: por_id.get(m) or por_user_id.get(str(m)) or por_oid.get(str(m))
+        for m in medico_ids
+    }
+
 def getCitasByUserId(user_id):
     try:
-        print(f"🔎 Buscando citas para el usuario: {user_id}")
+        log.debug("🔎 Buscando citas para el usuario: %s", user_id)
         db = get_db_connection()
-        
-        # 1. Buscar en la colección de citas donde el pacienteId coincida
-        # Nota: Asegúrate de que en createAppointment guardaste el ID como string.
-        lista_citas = list(db.appointments.find({"pacienteId": user_id}))
-        
-        arrCitas = []
-        
-        for cita in lista_citas:
-            # 2. Buscar información del Doctor para mostrar nombre y especialidad
-            doctor_info = {"nombre": "No asignado", "apellidos": "", "especialidad": "General"}
-            
-            if "medicoId" in cita:
-                try:
-                    # Buscamos en la colección de doctores
-                    doc = db.doctors.find_one({"id": cita["medicoId"]}) # Si guardaste el ID del front
-                    if not doc:
-                        doc = db.doctors.find_one({"userId": ObjectId(cita["medicoId"])}) # Si guardaste el ObjectId
-                    if not doc:
-                        # Intento final buscandolo como _id string
-                         doc = db.doctors.find_one({"_id": ObjectId(cita["medicoId"])})
-
-                    if doc:
-                        doctor_info["nombre"] = doc.get("nombre", "")
-                        doctor_info["apellidos"] = doc.get("apellidos", "")
-                        doctor_info["especialidad"] = doc.get("especialidad", "General")
-                except:
-                    pass # Si falla la búsqueda del doctor, dejamos los datos por defecto
-
-            # 3. Formatear el objeto para el Frontend
-            cita_fmt = {
-                "id": str(cita["_id"]),
-                "tipoCita": cita.get("tipoCita", "Consulta"),
-                "fechahoraCita": cita.get("fechaHoraIso") or f"{cita.get('fecha')}T{cita.get('hora')}",
-                "estatus": cita.get("estado", "Pendiente"), # 'estado' en BD -> 'estatus' en Front
-                "nombreDoctor": f"{doctor_info['nombre']} {doctor_info['apellidos']}",
-                "especialidad": doctor_info["especialidad"],
-                "motivo": cita.get("motivo", ""),
-                "notas": cita.get("notas", "")
-            }
-            arrCitas.append(cita_fmt)
-
-        print(f"✅ Se encontraron {len(arrCitas)} citas.")
-        
-        return jsonify({
-            "intStatus": 200,
-            "arrCitas": arrCitas
-        })
-
+        return Versiones.respuesta_condicional(
+            db, [Versiones.citas_paciente(user_id), Versiones.USUARIOS], lambda: _citas_paciente(db, user_id))
     except Exception as e:
-        print(f"❌ Error obteniendo citas: {e}")
+        log.exception("❌ Error obteniendo citas: %s", e)
         return jsonify({"intStatus": 500, "Error": str(e)}), 500
-    
+
+def _citas_paciente(db, user_id):
+    # 1. Buscar en la colección de citas donde el pacienteId coincida
+    # Nota: Asegúrate de que en createAppointment guardaste el ID como string.
+    lista_citas = list(db.appointments.find(
+        {"pacienteId": user_id},
+        {"medicoId": 1, "tipoCita": 1, "fechaHoraIso": 1, "fecha": 1, "hora": 1,
+         "estado": 1, "motivo": 1, "notas": 1}
+    ))
+
+    # 2. Buscar a TODOS los doctores de estas citas en una sola consulta (antes: hasta 3 por cita)
+    try:
+        doctores = _buscar_doctores(db, {cita["medicoId"] for cita in lista_citas if cita.get("medicoId")})
+    except Exception as e:
+        log.warning("⚠️ No se pudieron resolver los doctores: %s", e)
+        doctores = {}
+
+    arrCitas = []
+
+    for cita in lista_citas:
+        doctor_info = {"nombre": "No asignado", "apellidos": "", "especialidad": "General"}
+
+        doc = doctores.get(cita.get("medicoId"))
+        if doc:
+            doctor_info["nombre"] = doc.get("nombre", "")
+            doctor_info["apellidos"] = doc.get("apellidos", "")
+            doctor_info["especialidad"] = doc.get("especialidad", "General")
+
+        # 3. Formatear el objeto para el Frontend
+        cita_fmt = {
+            "id": str(cita["_id"]),
+            "tipoCita": cita.get("tipoCita", "Consulta"),
+            "fechahoraCita": cita.get("fechaHoraIso") or f"{cita.get('fecha')}T{cita.get('hora')}",
+            "estatus": cita.get("estado", "Pendiente"), # 'estado' en BD -> 'estatus' en Front
+            "nombreDoctor": f"{doctor_info['nombre']} {doctor_info['apellidos']}",
+            "especialidad": doctor_info["especialidad"],
+            "motivo": cita.get("motivo", ""),
+            "notas": cita.get("notas", "")
+        }
+        arrCitas.append(cita_fmt)
+
+    log.debug("✅ Se encontraron %d citas.", len(arrCitas))
+
+    return jsonify({
+        "intStatus": 200,
+        "arrCitas": arrCitas
+    })
+
+def _buscar_pacientes(db, paciente_ids):
+    """Resuelve los pacienteId sin snapshot con a lo más dos $in: primero el perfil en patients (users no
+    guarda nombre/apellidos de los pacientes registrados), y en users solo lo que no tenga perfil"""
+    oids = {ObjectId(p) for p in paciente_ids if ObjectId.is_valid(p)}
+    if not oids:
+        return {}
+
+    proyeccion = {"userId": 1, "nombre": 1, "apellidos": 1, "edad": 1}
+    encontrados = {}
+    for doc in db.patients.find({"userId": {"$in": list(oids)}}, proyeccion):
+        encontrados.setdefault(str(doc["userId"]), doc)
+
+    faltantes = [oid for oid in oids if str(oid) not in encontrados]
+    if faltantes:
+        for doc in db.users.find({"_id": {"$in": faltantes}}, proyeccion):
+            encontrados[str(doc["_id"])] = doc
+    return encontrados
+
+def _filtro_agenda(doctor_id, args):
+    """Filtros opcionales ?desde=YYYY-MM-DD&hasta=YYYY-MM-DD&estatus=pendiente,Confirmada"""
+    filtro = {"medicoId": doctor_id}
+
+    rango = Agenda.filtro_inicio(args)
+    if rango:
+        # Rango sobre el inicio normalizado (índice medicoId_inicio); las citas sin inicio
+        # aparecen después de correr python -m Tools.agenda
+        filtro["inicio"] = rango
+
+    estatus = [e.strip() for e in args.get('estatus', '').split(',') if e.strip()]
+    if estatus:
+        filtro["estado"] = {"$in": estatus}
+    return filtro
+
 def getCitasByDoctorId(doctor_id):
     try:
-        print(f"👨‍⚕️ Buscando agenda para el doctor ID: {doctor_id}")
+        log.debug("👨‍⚕️ Buscando agenda para el doctor ID: %s", doctor_id)
         db = get_db_connection()
-        
-        # 1. Buscar todas las citas donde el medicoId coincida
-        # Nota: Buscamos como string porque así lo guardamos en createAppointment
-        lista_citas = list(db.appointments.find({"medicoId": doctor_id}))
-        
-        arrCitas = []
-        
-        for cita in lista_citas:
-            # 2. Obtener nombre del PACIENTE
-            # Primero intentamos sacar el nombre guardado en la cita (snapshot)
-            paciente_nombre = f"{cita.get('nombrePaciente', '')} {cita.get('apellidoPaciente', '')}".strip()
-            paciente_edad = cita.get('edadPaciente', 0)
-            
-            # Si por alguna razón no está en la cita, buscamos en la colección de usuarios
-            if not paciente_nombre and "pacienteId" in cita:
-                try:
-                    from bson import ObjectId
-                    paciente = db.users.find_one({"_id": ObjectId(cita["pacienteId"])})
-                    if not paciente:
-                        # Intento en collection patients
-                        paciente = db.patients.find_one({"userId": ObjectId(cita["pacienteId"])})
-                    
-                    if paciente:
-                        paciente_nombre = f"{paciente.get('nombre', '')} {paciente.get('apellidos', '')}"
-                        paciente_edad = paciente.get('edad', 0)
-                except:
-                    pass # Si falla, se queda con "Sin nombre"
-
-            # 3. Formatear para el Frontend
-            cita_fmt = {
-                "id": str(cita["_id"]),
-                "tipo": cita.get("tipoCita", "Consulta General"),
-                "tipoConsulta": cita.get("tipoCita", "Consulta"),
-                "fechahoraCita": cita.get("fechaHoraIso") or f"{cita.get('fecha')} {cita.get('hora')}",
-                "paciente": paciente_nombre or "Paciente Sin Nombre",
-                "pacienteEdad": paciente_edad,
-                "estatus": cita.get("estado", "Pendiente"), # BD: estado -> Front: estatus
-                "motivo": cita.get("motivo", "Sin motivo")
-            }
-            arrCitas.append(cita_fmt)
-
-        print(f"✅ Se encontraron {len(arrCitas)} citas para el doctor.")
-        return jsonify(arrCitas) # Devolvemos el array directo
-
+        # Los nombres de pacientes sin snapshot salen de users/patients: también dependen de USUARIOS
+        return Versiones.respuesta_condicional(
+            db, [Versiones.citas_medico(doctor_id), Versiones.USUARIOS], lambda: _agenda_doctor(db, doctor_id))
+    except Agenda.FechaInvalida as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        print(f"❌ Error obteniendo agenda doctor: {e}")
+        log.exception("❌ Error obteniendo agenda doctor: %s", e)
         return jsonify({"error": str(e)}), 500
 
+def _agenda_doctor(db, doctor_id):
+    # 1. Buscar las citas del doctor con los filtros aplicados en MongoDB, no en Python
+    # Nota: Buscamos como string porque así lo guardamos en createAppointment
+    lista_citas = list(db.appointments.find(
+        _filtro_agenda(doctor_id, request.args),
+        {"pacienteId": 1, "nombrePaciente": 1, "apellidoPaciente": 1, "edadPaciente": 1,
+         "tipoCita": 1, "fechaHoraIso": 1, "fecha": 1, "hora": 1, "estado": 1, "motivo": 1}
+    ))
+
+    # 2. Las citas antiguas sin snapshot del paciente se resuelven todas juntas
+    sin_snapshot = {
+        str(cita["pacienteId"]) for cita in lista_citas
+        if "pacienteId" in cita
+        and not f"{cita.get('nombrePaciente', '')} {cita.get('apellidoPaciente', '')}".strip()
+    }
+    try:
+        pacientes = _buscar_pacientes(db, sin_snapshot)
+    except Exception as e:
+        log.warning("⚠️ No se pudieron resolver los pacientes: %s", e)
+        pacientes = {}
+
+    arrCitas = []
+
+    for cita in lista_citas:
+        # Primero intentamos sacar el nombre guardado en la cita (snapshot)
+        paciente_nombre = f"{cita.get('nombrePaciente', '')} {cita.get('apellidoPaciente', '')}".strip()
+        paciente_edad = cita.get('edadPaciente', 0)
+
+        if not paciente_nombre and "pacienteId" in cita:
+            paciente = pacientes.get(str(cita["pacienteId"]))
+            if paciente:
+                paciente_nombre = f"{paciente.get('nombre', '')} {paciente.get('apellidos', '')}".strip()
+                paciente_edad = paciente.get('edad', 0)
+
+        # 3. Formatear para el Frontend
+        cita_fmt = {
+            "id": str(cita["_id"]),
+            "tipo": cita.get("tipoCita", "Consulta General"),
+            "tipoConsulta": cita.get("tipoCita", "Consulta"),
+            "fechahoraCita": cita.get("fechaHoraIso") or f"{cita.get('fecha')} {cita.get('hora')}",
+            "paciente": paciente_nombre or "Paciente Sin Nombre",
+            "pacienteEdad": paciente_edad,
+            "estatus": cita.get("estado", "Pendiente"), # BD: estado -> Front: estatus
+            "motivo": cita.get("motivo", "Sin motivo")
+        }
+        arrCitas.append(cita_fmt)
+
+    log.debug("✅ Se encontraron %d citas para el doctor.", len(arrCitas))
+    return jsonify(arrCitas) # Devolvemos el array directo
+
+
+# ==================== HORARIOS DISPONIBLES DE UN DOCTOR ====================
+def getHorariosDisponibles(doctor_id):
+    try:
+        desde, hasta = Agenda.leer_rango(request.args)
+        db = get_db_connection()
+        libres = Agenda.horarios_disponibles(db, doctor_id, desde, hasta)
+        return jsonify({
+            "intStatus": 200,
+            "medicoId": doctor_id,
+            "duracionMin": Colabskey.APPOINTMENT_SLOT_MINUTES,
+            "arrHorarios": [horario.isoformat() for horario in libres]
+        })
+    except Agenda.FechaInvalida as e:
+        return jsonify({"intStatus": 400, "message": str(e)}), 400
+    except Exception as e:
+        log.exception("❌ Error obteniendo horarios disponibles: %s", e)
+        return jsonify({"intStatus": 500, "message": str(e)}), 500
+
 
 # ==================== 🔥 ACTUALIZAR ESTADO (CONFIRMAR/CANCELAR) 🔥 ====================
 def updateAppointmentStatus(cita_id):
@@ -736,21 +1004,30 @@ def updateAppointmentStatus(cita_id):
         if not nuevo_estatus:
             return jsonify({"error": "No se envió el nuevo estatus"}), 400
 
-        print(f"🔄 Cambiando estado de cita {cita_id} a: {nuevo_estatus}")
+        log.info("🔄 Cambiando estado de cita %s a: %s", cita_id, nuevo_estatus)
         
         db = get_db_connection()
         
-        # Actualizamos el campo 'estado' en la base de datos
-        result = db.appointments.update_one(
-            {"_id": ObjectId(cita_id)},
-            {"$set": {"estado": nuevo_estatus}}
-        )
+        # Actualizamos el campo 'estado' en la base de datos; el documento anterior dice de quién es la
+        # cita (para invalidar su agenda) y si el estado realmente cambió
+        # 'activa' libera o vuelve a ocupar el horario; reactivar una cita cuyo horario ya tomó otra
+        # choca con el índice único de la agenda
+        try:
+            anterior = db.appointments.find_one_and_update(
+                {"_id": ObjectId(cita_id)},
+                {"$set": {"estado": nuevo_estatus, "activa": Agenda.ocupa_agenda(nuevo_estatus)}},
+                projection={"estado": 1, "medicoId": 1, "pacienteId": 1}
+            )
+        except DuplicateKeyError:
+            return jsonify({"success": False, "message": "El horario de esta cita ya está ocupado por otra"}), 409
         
-        if result.modified_count > 0:
+        if anterior is not None and anterior.get("estado") != nuevo_estatus:
+            Versiones.incrementar(db, Versiones.citas_medico(anterior.get("medicoId")),
+                                  Versiones.citas_paciente(anterior.get("pacienteId")))
             return jsonify({"success": True, "message": "Estado actualizado correctamente"})
         else:
             return jsonify({"success": False, "message": "No se realizaron cambios (tal vez ya tenía ese estado)"})
 
     except Exception as e:
-        print(f"❌ Error actualizando estado: {e}")
+        log.exception("❌ Error actualizando estado: %s", e)
         return jsonify({"error": str(e)}), 500
\ No newline at end of file
@@ -13,4 +13,122 @@ cluster = os.getenv("MONGO_CLUSTER")
 MONGODB_URI = f"mongodb+srv://{username}:{password}@{cluster}"
 
 DB_NAME = "VirtualMedDB"
-dbconn = None
\ No newline at end of file
+dbconn = None
+# Proceso dueño de dbconn (get_db_connection crea otro cliente si cambia, p. ej. tras un fork)
+dbconn_pid = None
+# Cliente async (AsyncMongoClient) del modo ASGI; ver Asgi.py
+async_dbconn = None
+
+# Model Configuration
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+KERAS_MODEL_PATH = os.getenv("MODEL_PATH", os.path.join(BASE_DIR, "models", "model_vgg16_final.keras"))
+TFLITE_MODEL_PATH = os.getenv("TFLITE_MODEL_PATH", os.path.join(BASE_DIR, "models", "model_vgg16_final_float16.tflite"))
+# Backend de inferencia: "keras" (float32 original) o "tflite" (convertido con Tools.tflite)
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "keras").lower()
+MODEL_PATH = TFLITE_MODEL_PATH if MODEL_BACKEND == "tflite" else KERAS_MODEL_PATH
+TFLITE_NUM_THREADS = int(os.getenv("TFLITE_NUM_THREADS", str(os.cpu_count() or 1)))
+MODEL_INPUT_SIZE = (227, 227)
+# Cargar el modelo al arrancar el servidor en lugar de en la primera petición
+PRELOAD_MODEL = os.getenv("PRELOAD_MODEL", "0") == "1"
+# Cada cuántos segundos se revisa si el modelo cambió en disco (0 = sin recarga en caliente)
+MODEL_RELOAD_CHECK_SECONDS = float(os.getenv("MODEL_RELOAD_CHECK_SECONDS", "5"))
+
+# Micro-batching de inferencia
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "8"))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "10"))
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", "64"))
+INFERENCE_TIMEOUT_SECONDS = float(os.getenv("INFERENCE_TIMEOUT_SECONDS", "30"))
+
+# Máximo de imágenes por estudio en /analyze/batch
+ANALYZE_BATCH_MAX_IMAGES = int(os.getenv("ANALYZE_BATCH_MAX_IMAGES", "16"))
+
+# Caché de predicciones por hash de imagen + versión del modelo
+PREDICTION_CACHE_MAX_ENTRIES = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "2048"))
+PREDICTION_CACHE_TTL_SECONDS = float(os.getenv("PREDICTION_CACHE_TTL_SECONDS", "86400"))
+# Segundo nivel persistente en MongoDB (colección prediction_cache), compartido entre procesos
+PREDICTION_CACHE_MONGO = os.getenv("PREDICTION_CACHE_MONGO", "0") == "1"
+
+# Pool de procesos de inferencia (0 = inferencia dentro del proceso de Flask, "auto" = según núcleos)
+_workers_env = os.getenv("INFERENCE_WORKERS", "0")
+INFERENCE_WORKERS = max(1, (os.cpu_count() or 2) // 2) if _workers_env == "auto" else int(_workers_env)
+# Buffers de memoria compartida; si todos están ocupados se responde 503
+INFERENCE_POOL_SLOTS = int(os.getenv("INFERENCE_POOL_SLOTS", str(max(INFERENCE_WORKERS, 1) * 2)))
+
+# Crear/verificar índices al abrir la conexión (también disponible como: python -m Tools.indexes)
+ENSURE_INDEXES = os.getenv("ENSURE_INDEXES", "1") == "1"
+
+# Paginación por cursor en los listados (?limit=...&cursor=...)
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+
+# Exportaciones en streaming (/predictions/export, /users/export)
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "200"))
+# Bytes acumulados antes de enviar un fragmento al cliente
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", "65536"))
+
+# Descifrado en lote de image_url (hilos; cryptography suelta el GIL)
+DECRYPT_WORKERS = int(os.getenv("DECRYPT_WORKERS", str(min(8, os.cpu_count() or 1))))
+# Por debajo de este número de URLs se descifra en el hilo de la petición
+DECRYPT_PARALLEL_MIN = int(os.getenv("DECRYPT_PARALLEL_MIN", "64"))
+
+# Caché en memoria de URLs descifradas (sha256 del cifrado -> URL); 0 entradas la desactiva
+DECRYPT_CACHE_MAX_ENTRIES = int(os.getenv("DECRYPT_CACHE_MAX_ENTRIES", "10000"))
+DECRYPT_CACHE_TTL_SECONDS = float(os.getenv("DECRYPT_CACHE_TTL_SECONDS", "3600"))
+
+# Sin ENCRYPTION_KEYS/ENCRYPTION_KEY solo se permite una clave temporal en desarrollo
+ALLOW_TEMP_ENCRYPTION_KEY = (os.getenv("FLASK_ENV") == "development"
+                             or os.getenv("ALLOW_TEMP_ENCRYPTION_KEY", "0") == "1")
+
+# Re-cifrado de predicciones con la clave primaria (python -m Tools.reencrypt o POST /admin/reencrypt)
+REENCRYPT_BATCH_SIZE = int(os.getenv("REENCRYPT_BATCH_SIZE", "500"))
+# Límite de documentos por segundo para no competir con el tráfico de producción (0 = sin límite)
+REENCRYPT_MAX_DOCS_PER_SECOND = float(os.getenv("REENCRYPT_MAX_DOCS_PER_SECOND", "200"))
+# El trabajo se reclama en db.jobs con un lease que se renueva en cada lote: si el proceso muere, otro
+# worker (o Tools.reencrypt) puede retomarlo cuando vence
+REENCRYPT_LEASE_SECONDS = float(os.getenv("REENCRYPT_LEASE_SECONDS", "60"))
+# Token para los endpoints /admin/* (header X-Admin-Token); sin token los endpoints quedan deshabilitados
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Modo ASGI (Asgi.py): hilos para las rutas que siguen siendo Flask/WSGI (inferencia incluida)
+ASGI_WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", str(min(32, (os.cpu_count() or 1) + 4))))
+
+# Servidor de producción (gunicorn.conf.py): procesos y hilos por proceso
+PORT = int(os.getenv("PORT", "3000"))
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", str((os.cpu_count() or 1) * 2 + 1)))
+WEB_THREADS = int(os.getenv("WEB_THREADS", "4"))
+# Cargar el modelo en cada worker antes de aceptar tráfico (si no, se carga con el primer /analyze)
+WARMUP_MODEL = os.getenv("WARMUP_MODEL", "0") == "1"
+
+# Pool de conexiones de MongoDB por proceso: un MongoClient por worker, dimensionado por sus hilos
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", str(max(10, WEB_THREADS * 2))))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", str(min(WEB_THREADS, 4))))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+
+# /health/ready: cada cuánto se vuelve a hacer ping a Mongo (los balanceadores consultan cada segundo)
+READY_CACHE_SECONDS = float(os.getenv("READY_CACHE_SECONDS", "5"))
+READY_TIMEOUT_SECONDS = float(os.getenv("READY_TIMEOUT_SECONDS", "2"))
+
+# Logs: nivel (DEBUG, INFO, WARNING, ERROR) y tamaño de la cola en memoria que escribe un hilo aparte
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Métricas en formato Prometheus en /metrics (latencia por ruta, Mongo por petición, fases de /analyze)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+# Caché de perfiles de GET /user/<id> (LRU + TTL por proceso; 0 entradas la desactiva). Con
+# PROFILE_CACHE_REDIS_URL (requiere el paquete redis) se comparte entre workers en lugar de la memoria
+PROFILE_CACHE_MAX_ENTRIES = int(os.getenv("PROFILE_CACHE_MAX_ENTRIES", "10000"))
+PROFILE_CACHE_TTL_SECONDS = float(os.getenv("PROFILE_CACHE_TTL_SECONDS", "60"))
+PROFILE_CACHE_REDIS_URL = os.getenv("PROFILE_CACHE_REDIS_URL")
+
+# Agenda de citas: duración por defecto (y de cada horario libre), duración máxima que se acepta y
+# jornada de los doctores para GET /citas/doctor/<id>/disponibles (días: 0 = lunes ... 6 = domingo)
+APPOINTMENT_SLOT_MINUTES = int(os.getenv("APPOINTMENT_SLOT_MINUTES", "30"))
+APPOINTMENT_MAX_MINUTES = int(os.getenv("APPOINTMENT_MAX_MINUTES", "240"))
+APPOINTMENT_DAY_START = os.getenv("APPOINTMENT_DAY_START", "09:00")
+APPOINTMENT_DAY_END = os.getenv("APPOINTMENT_DAY_END", "18:00")
+APPOINTMENT_WORKDAYS = os.getenv("APPOINTMENT_WORKDAYS", "0,1,2,3,4")
+APPOINTMENT_MAX_RANGE_DAYS = int(os.getenv("APPOINTMENT_MAX_RANGE_DAYS", "31"))
+# Zona horaria IANA de la clínica (p. ej. America/Mexico_City): las fechas ISO con zona (...Z) se pasan
+# a esta hora local y define "hoy" en los horarios disponibles. Sin configurar se usa la del servidor
+APPOINTMENT_TIMEZONE = os.getenv("APPOINTMENT_TIMEZONE")
@@ -0,0 +1,70 @@
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from flask import jsonify
+import BackEnd.GlobalInfo.Keys as Colabskey
+from BackEnd.Functions import get_db_connection
+
+
+# ==================== LIVENESS / READINESS ====================
+# live: el proceso responde (no toca dependencias; si falla, el orquestador reinicia el proceso).
+# ready: Mongo responde a un ping y el modelo está cargado si este proceso lo debe tener precargado.
+# El resultado de ready se guarda READY_CACHE_SECONDS: un balanceador que consulta cada segundo
+# genera como mucho un ping por intervalo y por proceso.
+
+_ping_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="health")
+_lock = threading.Lock()
+_ultimo = {"en": 0.0, "resultado": None}
+
+
+def _ping_mongo():
+    inicio = time.perf_counter()
+    get_db_connection().command("ping")
+    return round((time.perf_counter() - inicio) * 1000, 2)
+
+
+def _estado_mongo():
+    # El ping corre en otro hilo para acotarlo a READY_TIMEOUT_SECONDS (la selección de servidor
+    # del cliente espera hasta 10 s)
+    futuro = _ping_executor.submit(_ping_mongo)
+    try:
+        return {"ok": True, "ping_ms": futuro.result(timeout=Colabskey.READY_TIMEOUT_SECONDS)}
+    except FuturesTimeout:
+        return {"ok": False, "error": f"ping sin respuesta en {Colabskey.READY_TIMEOUT_SECONDS}s"}
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+
+
+def _estado_modelo():
+    requerido = Colabskey.PRELOAD_MODEL or Colabskey.WARMUP_MODEL or Colabskey.INFERENCE_WORKERS > 0
+    # Sin importar Analysis: si nadie lo importó, el modelo no está cargado (y no se carga aquí)
+    analysis = sys.modules.get("BackEnd.Analysis")
+    if analysis is None:
+        cargado = False
+    elif analysis.inference_pool is not None:
+        estado = analysis.inference_pool.stats()
+        cargado = estado.get("started", False) and estado.get("workers_ready", 0) > 0
+    else:
+        cargado = analysis.model_registry.is_loaded
+    return {"ok": cargado or not requerido, "loaded": cargado, "required": requerido}
+
+
+def _evaluar():
+    mongo = _estado_mongo()
+    modelo = _estado_modelo()
+    return {"ready": mongo["ok"] and modelo["ok"], "mongo": mongo, "model": modelo}
+
+
+def liveness():
+    return jsonify({"status": "alive"})
+
+
+def readiness():
+    ahora = time.monotonic()
+    with _lock:
+        if _ultimo["resultado"] is None or ahora - _ultimo["en"] >= Colabskey.READY_CACHE_SECONDS:
+            _ultimo["resultado"] = _evaluar()
+            _ultimo["en"] = ahora
+        resultado = dict(_ultimo["resultado"], age_seconds=round(ahora - _ultimo["en"], 3))
+    return jsonify(resultado), 200 if resultado["ready"] else 503
@@ -0,0 +1,196 @@
+import time
+from datetime import datetime
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+
+# ==================== IDENTIDADES: EMAIL -> USUARIO EN UN SOLO DOCUMENTO ====================
+# db.identities tiene un documento por email (_id = email) con lo que necesitan login y registro:
+# userId, contraseña, rol, colección y perfilId, y nombre/apellidos. Así el login es un find_one por _id
+# y el registro reserva el email con un insert (DuplicateKeyError = ya existe), en lugar de buscar en
+# users, doctors y patients.
+#
+# Mientras la migración (python -m Tools.identities) no haya terminado, login y registro siguen
+# consultando las colecciones antiguas cuando no hay identidad, y el login la rellena de paso.
+#
+# Los emails que solo existen en un perfil (doctors/patients sin documento en users, p. ej. del front
+# antiguo) quedan reservados con una identidad soloPerfil: el registro responde 409 igual que antes de
+# la migración y el login 404, como siempre les respondió.
+
+COLECCION = "identities"
+ID_MIGRACION = "identities_migration"
+# Cada cuánto un proceso vuelve a preguntar si la migración ya terminó
+RECHEQUEO_SEGUNDOS = 60
+
+_migracion = {"completa": False, "revisado_en": 0.0}
+
+
+def documento_identidad(user_basic, perfil, collection_name):
+    """Identidad a partir del documento de users y el perfil (doctors/patients) si lo hay"""
+    con_perfil = collection_name != "users" and perfil is not None
+    origen = perfil if con_perfil else user_basic
+    return {
+        "_id": user_basic["email"],
+        "userId": user_basic["_id"],
+        "password": user_basic.get("password"),
+        "role": user_basic.get("role", "patient"),
+        "collection": collection_name,
+        "profileId": perfil["_id"] if con_perfil else None,
+        "nombre": origen.get("nombre", ""),
+        "apellidos": origen.get("apellidos", ""),
+        "updated_at": datetime.now()
+    }
+
+
+def documento_reserva(perfil, collection_name):
+    """Identidad de un email que solo existe en doctors/patients: reserva el email, no permite login"""
+    return {
+        "_id": perfil["email"],
+        "userId": perfil.get("userId"),
+        "password": None,
+        "role": "doctor" if collection_name == "doctors" else "patient",
+        "collection": collection_name,
+        "profileId": perfil["_id"],
+        "nombre": perfil.get("nombre", ""),
+        "apellidos": perfil.get("apellidos", ""),
+        "soloPerfil": True,
+        "updated_at": datetime.now()
+    }
+
+
+def permite_login(identidad):
+    return bool(identidad) and not identidad.get("soloPerfil")
+
+
+def usuario_login(identidad):
+    """Mismo objeto 'user' que devolvía loginUser a partir de users + perfil"""
+    user_response = {
+        "id": str(identidad["userId"]),
+        "email": identidad["_id"],
+        "role": identidad.get("role", "patient"),
+        "collection": identidad.get("collection", "users"),
+        "nombre": identidad.get("nombre", ""),
+        "apellidos": identidad.get("apellidos", "")
+    }
+    if identidad.get("profileId") is not None:
+        user_response["profileId"] = str(identidad["profileId"])
+    return user_response
+
+
+def _hay_que_revisar():
+    return not _migracion["completa"] and time.monotonic() - _migracion["revisado_en"] >= RECHEQUEO_SEGUNDOS
+
+
+def _registrar_revision(estado):
+    _migracion["revisado_en"] = time.monotonic()
+    _migracion["completa"] = bool(estado) and estado.get("status") == "completed"
+
+
+def migracion_completa(db):
+    """True cuando toda identidad existe en db.identities (se cachea en el proceso)"""
+    if _hay_que_revisar():
+        _registrar_revision(db.jobs.find_one({"_id": ID_MIGRACION}, {"status": 1}))
+    return _migracion["completa"]
+
+
+async def migracion_completa_async(db):
+    if _hay_que_revisar():
+        _registrar_revision(await db.jobs.find_one({"_id": ID_MIGRACION}, {"status": 1}))
+    return _migracion["completa"]
+
+
+def insertar_si_no_existe(db, identidades):
+    """Inserta identidades sin pisar las existentes (el primer usuario con ese email gana).
+    Devuelve cuántas se crearon"""
+    if not identidades:
+        return 0
+    try:
+        return len(db[COLECCION].insert_many(identidades, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        duplicados = [err for err in e.details.get("writeErrors", []) if err.get("code") == 11000]
+        if len(duplicados) != len(e.details.get("writeErrors", [])):
+            raise
+        return e.details.get("nInserted", 0)
+
+
+def sincronizar(db, user_id):
+    """Reconstruye la identidad de un usuario después de editarlo (el email puede haber cambiado).
+    Primero se escribe la nueva y después se borran las de emails anteriores, para que el login
+    no encuentre un hueco sin identidad entre las dos operaciones"""
+    user_basic = db["users"].find_one({"_id": user_id})
+    if not user_basic or not user_basic.get("email"):
+        db[COLECCION].delete_many({"userId": user_id})
+        return
+    collection_name = coleccion_de_rol(user_basic.get("role", "patient"))
+    perfil = db[collection_name].find_one({"userId": user_id}) if collection_name != "users" else None
+    identidad = documento_identidad(user_basic, perfil, collection_name)
+    try:
+        # El filtro por userId evita pisar la identidad de otro usuario con ese email (el primero gana)
+        db[COLECCION].replace_one({"_id": identidad["_id"], "userId": user_id}, identidad, upsert=True)
+    except DuplicateKeyError:
+        pass
+    db[COLECCION].delete_many({"userId": user_id, "_id": {"$ne": identidad["_id"]}})
+
+
+def coleccion_de_rol(role):
+    if role in ['medico', 'doctor']:
+        return "doctors"
+    if role in ['paciente', 'patient']:
+        return "patients"
+    return "users"
+
+
+def migrar(db, batch_size=500, progreso=None):
+    """Crea la identidad de cada documento de users y reserva los emails que solo están en un perfil
+    (idempotente; se puede repetir sin riesgo). Devuelve {"processed": n, "created": m, "reserved": r}"""
+    procesados = creados = 0
+    ultimo = None
+    while True:
+        filtro = {"_id": {"$gt": ultimo}} if ultimo else {}
+        lote = list(db["users"].find(filtro).sort("_id", 1).limit(batch_size))
+        if not lote:
+            break
+        ultimo = lote[-1]["_id"]
+
+        # Perfiles del lote en una consulta por colección
+        ids = [u["_id"] for u in lote]
+        perfiles = {}
+        for collection_name in ("doctors", "patients"):
+            for perfil in db[collection_name].find({"userId": {"$in": ids}}):
+                perfiles.setdefault((collection_name, perfil["userId"]), perfil)
+
+        identidades = []
+        for user_basic in lote:
+            if not user_basic.get("email"):
+                continue
+            collection_name = coleccion_de_rol(user_basic.get("role", "patient"))
+            perfil = perfiles.get((collection_name, user_basic["_id"]))
+            identidades.append(documento_identidad(user_basic, perfil, collection_name))
+
+        creados += insertar_si_no_existe(db, identidades)
+        procesados += len(lote)
+        if progreso:
+            progreso(procesados, creados)
+
+    # Después de users: los emails con usuario ya tienen identidad y insertar_si_no_existe no los pisa
+    reservados = 0
+    for collection_name in ("doctors", "patients"):
+        ultimo = None
+        while True:
+            filtro = {"email": {"$type": "string"}}
+            if ultimo:
+                filtro["_id"] = {"$gt": ultimo}
+            lote = list(db[collection_name].find(
+                filtro, {"email": 1, "userId": 1, "nombre": 1, "apellidos": 1}).sort("_id", 1).limit(batch_size))
+            if not lote:
+                break
+            ultimo = lote[-1]["_id"]
+            reservados += insertar_si_no_existe(db, [documento_reserva(p, collection_name) for p in lote])
+            procesados += len(lote)
+            if progreso:
+                progreso(procesados, creados + reservados)
+
+    db.jobs.replace_one({"_id": ID_MIGRACION},
+                        {"status": "completed", "processed": procesados, "created": creados,
+                         "reserved": reservados, "finished_at": datetime.now()}, upsert=True)
+    _migracion["completa"] = True
+    return {"processed": procesados, "created": creados, "reserved": reservados}
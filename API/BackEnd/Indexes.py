@@ -0,0 +1,123 @@
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+import BackEnd.GlobalInfo.Keys as Colabskey
+
+
+# ==================== ÍNDICES DE LAS COLECCIONES CALIENTES ====================
+# Fuente única de verdad: si una consulta nueva filtra u ordena por un campo, su índice va aquí
+# y la consulta va en CONSULTAS para que el verificador de planes la revise.
+
+INDICES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "doctors": [
+        # sparse: los perfiles antiguos sin email (doctores del front anterior, solo con 'id') no chocan en null
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True, sparse=True),
+        IndexModel([("userId", ASCENDING)], name="userId"),
+        # 'id' solo existe en doctores creados desde el front antiguo
+        IndexModel([("id", ASCENDING)], name="id_sparse", sparse=True),
+    ],
+    "patients": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True, sparse=True),
+        IndexModel([("userId", ASCENDING)], name="userId"),
+    ],
+    "appointments": [
+        IndexModel([("pacienteId", ASCENDING)], name="pacienteId"),
+        # Agenda del doctor por rango de fechas y horarios disponibles
+        IndexModel([("medicoId", ASCENDING), ("inicio", ASCENDING)], name="medicoId_inicio"),
+        # Choques de horario: dos citas activas del mismo doctor no pueden compartir un bloque (BackEnd.Agenda)
+        IndexModel([("medicoId", ASCENDING), ("bloques", ASCENDING)], name="medicoId_bloques_activa_unique",
+                   unique=True, partialFilterExpression={"activa": True, "bloques": {"$exists": True}}),
+    ],
+    "prediction": [
+        # Orden y cursor de getAllPredictions: (created_at, _id) descendente
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_at_id_desc"),
+    ],
+    "identities": [
+        # _id es el email; userId para sincronizar al editar/eliminar un usuario
+        IndexModel([("userId", ASCENDING)], name="userId"),
+    ],
+    "prediction_cache": [
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl",
+                   expireAfterSeconds=int(Colabskey.PREDICTION_CACHE_TTL_SECONDS)),
+    ],
+}
+
+
+def _consultas():
+    """Consultas registradas (colección, filtro, orden) con valores de ejemplo, tal como las hace Functions"""
+    oid = ObjectId()
+    return [
+        ("users", {"email": "indices@virtualmed.test"}, None),
+        ("doctors", {"email": "indices@virtualmed.test"}, None),
+        ("patients", {"email": "indices@virtualmed.test"}, None),
+        ("users", {"_id": oid}, None),
+        ("users", {"_id": {"$in": [oid]}}, None),
+        ("doctors", {"userId": oid}, None),
+        ("patients", {"userId": oid}, None),
+        ("patients", {"userId": {"$in": [oid]}}, None),
+        ("doctors", {"$or": [{"id": {"$in": [str(oid)]}}, {"userId": {"$in": [oid]}}, {"_id": {"$in": [oid]}}]}, None),
+        ("appointments", {"pacienteId": str(oid)}, None),
+        ("appointments", {"medicoId": str(oid)}, None),
+        ("appointments", {"medicoId": str(oid), "inicio": {"$gte": datetime(2025, 1, 1), "$lt": datetime(2026, 1, 1)}},
+         None),
+        ("appointments", {"medicoId": str(oid), "inicio": {"$gte": datetime(2025, 1, 1), "$lt": datetime(2025, 1, 8)},
+                          "activa": True}, None),
+        ("prediction", {}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+        ("prediction", {"$or": [{"created_at": {"$lt": datetime.utcnow()}},
+                                {"created_at": datetime.utcnow(), "_id": {"$lt": oid}}]},
+         [("created_at", DESCENDING), ("_id", DESCENDING)]),
+        ("identities", {"_id": "indices@virtualmed.test"}, None),
+        ("identities", {"userId": oid}, None),
+        ("prediction_cache", {"_id": "clave", "created_at": {"$gte": datetime.utcnow()}}, None),
+    ]
+
+
+def ensure_indexes(db):
+    """Crea los índices declarados (idempotente). Devuelve [(colección, índice, error o None)]"""
+    reporte = []
+    for coleccion, modelos in INDICES.items():
+        try:
+            # Un solo createIndexes por colección
+            db[coleccion].create_indexes(modelos)
+            reporte.extend((coleccion, m.document["name"], None) for m in modelos)
+            continue
+        except OperationFailure:
+            pass
+        # Si el lote falló (p. ej. correos duplicados que impiden el índice único), se reporta uno por uno
+        for modelo in modelos:
+            try:
+                db[coleccion].create_indexes([modelo])
+                reporte.append((coleccion, modelo.document["name"], None))
+            except OperationFailure as e:
+                reporte.append((coleccion, modelo.document["name"], str(e)))
+    return reporte
+
+
+def _etapas(plan):
+    """Todas las etapas de un árbol de plan de ejecución"""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for valor in plan.values():
+            yield from _etapas(valor)
+    elif isinstance(plan, list):
+        for valor in plan:
+            yield from _etapas(valor)
+
+
+def verificar_planes(db):
+    """Explica cada consulta registrada. Devuelve [(colección, filtro, etapas)] de las que hacen COLLSCAN"""
+    con_collscan = []
+    for coleccion, filtro, orden in _consultas():
+        cursor = db[coleccion].find(filtro)
+        if orden:
+            cursor = cursor.sort(orden)
+        plan = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        etapas = list(_etapas(plan))
+        if "COLLSCAN" in etapas:
+            con_collscan.append((coleccion, filtro, etapas))
+    return con_collscan
@@ -0,0 +1,82 @@
+import os
+import threading
+import numpy as np
+import BackEnd.GlobalInfo.Keys as Colabskey
+
+
+# ==================== BACKENDS DE INFERENCIA (KERAS / TFLITE) ====================
+# Ambos exponen la misma interfaz que usa el resto del backend: predict(batch, verbose=0)
+# sobre un arreglo float32 (n, alto, ancho, 3) y devuelven (n, 1) con la probabilidad de malignidad.
+# TensorFlow se importa dentro de cada función: importar este módulo (o el registro del modelo)
+# no debe costar los segundos y cientos de MB de TF hasta que de verdad se carga un modelo.
+
+class TFLiteModel:
+    """Envuelve un tf.lite.Interpreter (float16 o int8 de rango dinámico) con la interfaz de Keras"""
+
+    def __init__(self, model_path, num_threads=None):
+        import tensorflow as tf
+
+        self.model_path = model_path
+        self.size_bytes = os.path.getsize(model_path)
+        self._interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=num_threads)
+        self._interpreter.allocate_tensors()
+        self._entrada = self._interpreter.get_input_details()[0]["index"]
+        self._salida = self._interpreter.get_output_details()[0]["index"]
+        self._filas = int(self._interpreter.get_input_details()[0]["shape"][0])
+        # El intérprete no es seguro entre hilos y guarda estado (tensores asignados)
+        self._lock = threading.Lock()
+
+    @property
+    def weights(self):
+        return []
+
+    def predict(self, batch, verbose=0):
+        batch = np.asarray(batch, dtype=np.float32)
+        with self._lock:
+            if batch.shape[0] != self._filas:
+                # Reasignar solo cuando cambia el tamaño del lote
+                self._interpreter.resize_tensor_input(self._entrada, list(batch.shape))
+                self._interpreter.allocate_tensors()
+                self._filas = batch.shape[0]
+            self._interpreter.set_tensor(self._entrada, batch)
+            self._interpreter.invoke()
+            return self._interpreter.get_tensor(self._salida).copy()
+
+
+def cargar_modelo(model_path):
+    """Elige el backend por extensión: .tflite -> intérprete TFLite, cualquier otro -> Keras"""
+    if model_path.endswith(".tflite"):
+        return TFLiteModel(model_path, num_threads=Colabskey.TFLITE_NUM_THREADS)
+    from tensorflow.keras.models import load_model
+    return load_model(model_path)
+
+
+def convertir_a_tflite(keras_path, output_path, quantization="float16"):
+    """Convierte el .keras a TFLite: 'none' (float32), 'float16' o 'int8' (rango dinámico)"""
+    import tempfile
+    import tensorflow as tf
+    from tensorflow.keras.models import load_model
+
+    model = load_model(keras_path)
+    with tempfile.TemporaryDirectory() as carpeta:
+        try:
+            # Keras 3: exportar como SavedModel es la ruta soportada por el conversor
+            model.export(carpeta)
+            converter = tf.lite.TFLiteConverter.from_saved_model(carpeta)
+        except AttributeError:
+            converter = tf.lite.TFLiteConverter.from_keras_model(model)
+
+        if quantization == "float16":
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+            converter.target_spec.supported_types = [tf.float16]
+        elif quantization == "int8":
+            # Pesos en int8, activaciones en float: no requiere dataset representativo
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        elif quantization != "none":
+            raise ValueError(f"Cuantización no soportada: {quantization}")
+
+        contenido = converter.convert()
+
+    with open(output_path, "wb") as f:
+        f.write(contenido)
+    return len(contenido)
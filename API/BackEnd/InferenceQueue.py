@@ -0,0 +1,154 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+import numpy as np
+import BackEnd.GlobalInfo.Keys as Colabskey
+from BackEnd.ModelRegistry import model_registry
+
+
+# ==================== MICRO-BATCHING DE INFERENCIA ====================
+
+class InferenceQueueFull(Exception):
+    """La cola de inferencia está llena; el llamador debe responder 503"""
+
+
+class _Solicitud:
+    __slots__ = ("array", "future", "encolada")
+
+    def __init__(self, array):
+        self.array = array
+        self.future = Future()
+        self.encolada = time.perf_counter()
+
+
+class MicroBatcher:
+    """Agrupa las peticiones concurrentes en un solo predict por lote.
+
+    predict_fn(batch) devuelve (predicciones, versión del modelo que las calculó)"""
+
+    def __init__(self, predict_fn, max_batch_size, max_wait_ms, max_queue_size, latency_window=1024):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.latency_window = latency_window
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._pendiente = None  # Solicitud que no cupo en el lote anterior
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+
+    def predict(self, array, timeout=None):
+        """Encola un arreglo (n, alto, ancho, 3) y bloquea hasta tener (sus n predicciones, versión del modelo)"""
+        self._asegurar_hilo()
+        solicitud = _Solicitud(np.asarray(array, dtype=np.float32))
+        try:
+            self._queue.put_nowait(solicitud)
+        except queue.Full:
+            raise InferenceQueueFull("Cola de inferencia saturada")
+        return solicitud.future.result(timeout=timeout)
+
+    def _asegurar_hilo(self):
+        if self._thread is not None:
+            return
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._bucle, name="inference-batcher", daemon=True)
+                self._thread.start()
+
+    def _siguiente(self, timeout=None):
+        if self._pendiente is not None:
+            solicitud, self._pendiente = self._pendiente, None
+            return solicitud
+        return self._queue.get(timeout=timeout)
+
+    def _bucle(self):
+        while True:
+            lote = [self._siguiente()]
+            filas = len(lote[0].array)
+            limite = time.perf_counter() + self.max_wait
+
+            # Juntar más solicitudes hasta llenar el lote o agotar la espera
+            while filas < self.max_batch_size:
+                restante = limite - time.perf_counter()
+                if restante <= 0:
+                    break
+                try:
+                    solicitud = self._siguiente(timeout=restante)
+                except queue.Empty:
+                    break
+                if filas + len(solicitud.array) > self.max_batch_size:
+                    self._pendiente = solicitud
+                    break
+                lote.append(solicitud)
+                filas += len(solicitud.array)
+
+            self._ejecutar(lote, filas)
+
+    def _ejecutar(self, lote, filas):
+        inicio = time.perf_counter()
+        try:
+            batch = lote[0].array if len(lote) == 1 else np.concatenate([s.array for s in lote])
+            resultados, version = self.predict_fn(batch)
+        except Exception as e:
+            for solicitud in lote:
+                solicitud.future.set_exception(e)
+            return
+        fin = time.perf_counter()
+
+        # Repartir los resultados a cada solicitud en su orden original
+        offset = 0
+        for solicitud in lote:
+            n = len(solicitud.array)
+            solicitud.future.set_result((resultados[offset:offset + n], version))
+            offset += n
+
+        self._registrar(filas, fin - inicio, [fin - s.encolada for s in lote])
+
+    def _registrar(self, filas, segundos_predict, latencias):
+        with self._stats_lock:
+            stats = self._stats.get(filas)
+            if stats is None:
+                stats = {"batches": 0, "items": 0, "predict_seconds": 0.0,
+                         "latencies": deque(maxlen=self.latency_window)}
+                self._stats[filas] = stats
+            stats["batches"] += 1
+            stats["items"] += filas
+            stats["predict_seconds"] += segundos_predict
+            stats["latencies"].extend(latencias)
+
+    def stats(self):
+        """Throughput y latencia p99 por tamaño de lote, para ajustar max_batch_size / max_wait_ms"""
+        with self._stats_lock:
+            por_tamano = {}
+            for filas, stats in sorted(self._stats.items()):
+                latencias = sorted(stats["latencies"])
+                p99 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))] if latencias else None
+                por_tamano[str(filas)] = {
+                    "batches": stats["batches"],
+                    "items": stats["items"],
+                    "items_per_second": stats["items"] / stats["predict_seconds"] if stats["predict_seconds"] else None,
+                    "p99_latency_ms": p99 * 1000 if p99 is not None else None
+                }
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self._queue.qsize(),
+            "by_batch_size": por_tamano
+        }
+
+
+def _predecir_con_registro(batch):
+    model, version = model_registry.modelo_y_version()
+    return model.predict(batch, verbose=0), version
+
+
+inference_queue = MicroBatcher(
+    _predecir_con_registro,
+    max_batch_size=Colabskey.INFERENCE_MAX_BATCH_SIZE,
+    max_wait_ms=Colabskey.INFERENCE_MAX_WAIT_MS,
+    max_queue_size=Colabskey.INFERENCE_QUEUE_SIZE
+)
@@ -0,0 +1,262 @@
+import os
+import atexit
+import itertools
+import pickle
+import queue
+import threading
+import time
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from concurrent.futures import Future
+import numpy as np
+import BackEnd.GlobalInfo.Keys as Colabskey
+from BackEnd.InferenceQueue import InferenceQueueFull
+from BackEnd.Preprocessing import preprocess_batch
+import BackEnd.Metrics as Metrics
+from BackEnd import Logs
+
+log = Logs.obtener(__name__)
+
+
+# ==================== POOL DE PROCESOS DE INFERENCIA ====================
+# Cada worker tiene su propio modelo cargado; los tensores viajan por memoria compartida
+# y por las colas solo pasan (id, slot, filas) y las probabilidades de salida con la versión del modelo
+# que las calculó. Cada worker revisa el archivo del modelo como el proceso principal (recarga en caliente).
+
+def _worker_main(indice, nombres_slots, forma_slot, tareas, resultados, model_path, input_size, hilos_tf,
+                 reload_check_seconds=0):
+    """Punto de entrada de cada proceso worker (se importa limpio con 'spawn')"""
+    import tensorflow as tf
+    if hilos_tf:
+        # Repartir los núcleos entre workers en lugar de que cada uno intente usarlos todos
+        tf.config.threading.set_intra_op_parallelism_threads(hilos_tf)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    from BackEnd.ModelRegistry import ModelRegistry
+
+    slots = [shared_memory.SharedMemory(name=nombre) for nombre in nombres_slots]
+    vistas = [np.ndarray(forma_slot, dtype=np.float32, buffer=slot.buf) for slot in slots]
+
+    registro = ModelRegistry(model_path, input_size, reload_check_seconds=reload_check_seconds)
+    try:
+        registro.get_model()
+        error_carga = None
+    except Exception as e:
+        # Sin modelo el worker sigue vivo y responde el error, para no entrar en un ciclo de reinicios
+        error_carga = e
+    resultados.put(("ready", indice, registro.stats()))
+
+    while True:
+        tarea = tareas.get()
+        if tarea is None:
+            break
+        task_id, slot, filas = tarea
+        try:
+            if not registro.is_loaded:
+                raise error_carga
+            # get_model() recarga si el archivo cambió; la versión es la del modelo que predijo
+            model, version = registro.modelo_y_version()
+            salida = model.predict(vistas[slot][:filas], verbose=0)
+            resultados.put(("ok", task_id, (np.asarray(salida), version)))
+        except Exception as e:
+            try:
+                pickle.dumps(e)
+            except Exception:
+                e = RuntimeError(f"{type(e).__name__}: {e}")
+            resultados.put(("error", task_id, e))
+
+    del vistas
+    for slot in slots:
+        slot.close()
+
+
+class WorkerDiedError(RuntimeError):
+    """El proceso que atendía la petición terminó antes de responder"""
+
+
+class InferencePool:
+    """N procesos con el modelo precargado, con backpressure por slots de memoria compartida"""
+
+    def __init__(self, n_workers, n_slots, max_rows, input_size, model_path, reload_check_seconds=0):
+        self.n_workers = n_workers
+        self.n_slots = n_slots
+        self.forma_slot = (max_rows, input_size[1], input_size[0], 3)
+        self.input_size = input_size
+        self.model_path = model_path
+        self.reload_check_seconds = reload_check_seconds
+        self.hilos_tf = max(1, (os.cpu_count() or 1) // n_workers)
+
+        self._ctx = mp.get_context("spawn")  # TensorFlow no es seguro tras fork()
+        self._lock = threading.Lock()
+        self._iniciado = False
+        self._deteniendo = False
+        self._ids = itertools.count()
+        self._tareas = {}      # task_id -> (future, slot, worker)
+        self._en_curso = []    # por worker: set de task_id
+        self._procesos = []
+        self._colas = []
+        self._listos = set()
+        self.restarts = 0
+
+    # ---------- ciclo de vida ----------
+
+    def start(self):
+        with self._lock:
+            if self._iniciado:
+                return
+            tamano = int(np.prod(self.forma_slot)) * np.dtype(np.float32).itemsize
+            self._shm = [shared_memory.SharedMemory(create=True, size=tamano) for _ in range(self.n_slots)]
+            self._vistas = [np.ndarray(self.forma_slot, dtype=np.float32, buffer=s.buf) for s in self._shm]
+            self._libres = queue.Queue()
+            for slot in range(self.n_slots):
+                self._libres.put(slot)
+
+            self._resultados = self._ctx.Queue()
+            for indice in range(self.n_workers):
+                self._procesos.append(None)
+                self._colas.append(None)
+                self._en_curso.append(set())
+                self._lanzar(indice)
+
+            threading.Thread(target=self._recolectar, name="inference-pool-results", daemon=True).start()
+            threading.Thread(target=self._vigilar, name="inference-pool-monitor", daemon=True).start()
+            atexit.register(self.shutdown)
+            self._iniciado = True
+            log.info("🧵 [POOL] %d workers de inferencia, %d slots compartidos", self.n_workers, self.n_slots)
+
+    def _lanzar(self, indice):
+        cola = self._ctx.Queue()
+        proceso = self._ctx.Process(
+            target=_worker_main,
+            args=(indice, [s.name for s in self._shm], self.forma_slot, cola, self._resultados,
+                  self.model_path, self.input_size, self.hilos_tf, self.reload_check_seconds),
+            name=f"inference-worker-{indice}",
+            daemon=True
+        )
+        proceso.start()
+        self._procesos[indice] = proceso
+        self._colas[indice] = cola
+
+    def shutdown(self):
+        with self._lock:
+            if not self._iniciado or self._deteniendo:
+                return
+            self._deteniendo = True
+        for cola in self._colas:
+            cola.put(None)
+        for proceso in self._procesos:
+            proceso.join(timeout=5)
+            if proceso.is_alive():
+                proceso.terminate()
+        del self._vistas
+        for shm in self._shm:
+            shm.close()
+            shm.unlink()
+
+    # ---------- peticiones ----------
+
+    def predict_images(self, lista_datos, timeout=None):
+        """Preprocesa directo en memoria compartida y devuelve (predicciones, versión del modelo del worker)"""
+        if len(lista_datos) > self.forma_slot[0]:
+            raise ValueError(f"Máximo {self.forma_slot[0]} imágenes por petición al pool")
+        self.start()
+
+        try:
+            slot = self._libres.get_nowait()
+        except queue.Empty:
+            raise InferenceQueueFull("Todos los workers de inferencia están ocupados")
+
+        try:
+            with Metrics.fase("preprocess"):
+                preprocess_batch(lista_datos, out=self._vistas[slot])
+            future = self._despachar(slot, len(lista_datos))
+        except Exception:
+            self._libres.put(slot)
+            raise
+        with Metrics.fase("predict"):
+            return future.result(timeout=timeout)
+
+    def _despachar(self, slot, filas):
+        future = Future()
+        with self._lock:
+            task_id = next(self._ids)
+            # El worker vivo con menos trabajo pendiente
+            vivos = [i for i, p in enumerate(self._procesos) if p.is_alive()] or list(range(self.n_workers))
+            worker = min(vivos, key=lambda i: len(self._en_curso[i]))
+            self._tareas[task_id] = (future, slot, worker)
+            self._en_curso[worker].add(task_id)
+            self._colas[worker].put((task_id, slot, filas))
+        return future
+
+    def _terminar(self, task_id):
+        """Saca la tarea de los registros y libera su slot; el slot solo se recicla aquí"""
+        with self._lock:
+            tarea = self._tareas.pop(task_id, None)
+            if tarea is None:
+                return None
+            future, slot, worker = tarea
+            self._en_curso[worker].discard(task_id)
+        self._libres.put(slot)
+        return future
+
+    def _recolectar(self):
+        while not self._deteniendo:
+            try:
+                tipo, ident, valor = self._resultados.get(timeout=1)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+
+            if tipo == "ready":
+                self._listos.add(ident)
+                continue
+
+            future = self._terminar(ident)
+            if future is None:
+                continue
+            if tipo == "ok":
+                future.set_result(valor)
+            else:
+                future.set_exception(valor)
+
+    def _vigilar(self):
+        while not self._deteniendo:
+            time.sleep(1.0)
+            for indice, proceso in enumerate(self._procesos):
+                if self._deteniendo or proceso.is_alive():
+                    continue
+                log.error("💀 [POOL] Worker %d terminó (exitcode=%s), reiniciando...", indice, proceso.exitcode)
+                self._listos.discard(indice)
+                with self._lock:
+                    perdidas = list(self._en_curso[indice])
+                for task_id in perdidas:
+                    future = self._terminar(task_id)
+                    if future is not None:
+                        future.set_exception(WorkerDiedError(f"El worker {indice} terminó inesperadamente"))
+                self._lanzar(indice)
+                self.restarts += 1
+
+    def stats(self):
+        if not self._iniciado:
+            return {"enabled": True, "started": False, "workers": self.n_workers}
+        return {
+            "enabled": True,
+            "started": True,
+            "workers": self.n_workers,
+            "workers_alive": sum(1 for p in self._procesos if p.is_alive()),
+            "workers_ready": len(self._listos),
+            "restarts": self.restarts,
+            "slots_total": self.n_slots,
+            "slots_free": self._libres.qsize(),
+            "pending": len(self._tareas)
+        }
+
+
+inference_pool = InferencePool(
+    Colabskey.INFERENCE_WORKERS,
+    Colabskey.INFERENCE_POOL_SLOTS,
+    Colabskey.ANALYZE_BATCH_MAX_IMAGES,
+    Colabskey.MODEL_INPUT_SIZE,
+    Colabskey.MODEL_PATH,
+    reload_check_seconds=Colabskey.MODEL_RELOAD_CHECK_SECONDS
+) if Colabskey.INFERENCE_WORKERS > 0 else None
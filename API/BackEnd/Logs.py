@@ -0,0 +1,68 @@
+import atexit
+import logging
+import os
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+import BackEnd.GlobalInfo.Keys as Colabskey
+
+
+# ==================== LOGS CON NIVEL Y SIN BLOQUEAR LA PETICIÓN ====================
+# La petición solo deja el mensaje en una cola en memoria; un hilo aparte lo escribe en stdout. Si la
+# cola se llena (ráfaga con la terminal lenta) el mensaje se descarta y se cuenta, en lugar de frenar la
+# respuesta. Uso en cada módulo:
+#
+#     log = Logs.obtener(__name__)
+#     log.debug("🔍 Buscando citas para %s", user_id)   # con LOG_LEVEL=INFO no cuesta ni el formateo
+
+FORMATO = "%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s"
+
+
+class _HandlerCola(QueueHandler):
+    descartados = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _HandlerCola.descartados += 1
+
+
+_salida = logging.StreamHandler(sys.stdout)
+_salida.setFormatter(logging.Formatter(FORMATO))
+_handler = _HandlerCola(queue.Queue(Colabskey.LOG_QUEUE_SIZE))
+_listener = None
+
+raiz = logging.getLogger("virtualmed")
+raiz.setLevel(Colabskey.LOG_LEVEL)
+raiz.addHandler(_handler)
+raiz.propagate = False
+
+
+def _iniciar():
+    global _listener
+    # Cola nueva: tras un fork el hilo escritor no existe y el lock de la cola heredada puede estar tomado
+    _handler.queue = queue.Queue(Colabskey.LOG_QUEUE_SIZE)
+    _listener = QueueListener(_handler.queue, _salida)
+    _listener.start()
+
+
+def _detener():
+    # Escribe lo que quede en la cola antes de salir
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def obtener(nombre):
+    """Logger hijo de 'virtualmed' (BackEnd.Functions -> virtualmed.Functions)"""
+    return raiz.getChild(nombre.rsplit(".", 1)[-1])
+
+
+def descartados():
+    return _HandlerCola.descartados
+
+
+_iniciar()
+atexit.register(_detener)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_iniciar)
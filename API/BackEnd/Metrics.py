@@ -0,0 +1,270 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pymongo import monitoring
+from BackEnd import Logs
+
+
+# ==================== MÉTRICAS EN FORMATO PROMETHEUS (/metrics) ====================
+# Contadores e histogramas en memoria del proceso, sin dependencias, expuestos en el formato de texto
+# de Prometheus. Con gunicorn cada worker tiene los suyos: Prometheus debe consultar cada worker (o
+# correr con un solo worker por contenedor) y sumar con sum by (...).
+#
+# - Latencia por ruta: virtualmed_http_request_duration_seconds{method,route,status}
+# - Mongo por petición: cuántos comandos y cuánto tiempo (CommandListener de pymongo, sync y async)
+# - Fases de /analyze: cache, preprocess, predict y persist
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BUCKETS_COMANDOS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+REGISTRO = []
+
+
+def _numero(valor):
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(valor) if isinstance(valor, float) else str(valor)
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(nombres, valores, extra=""):
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+class _Metrica:
+    tipo = "untyped"
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._series = {}
+        self._lock = threading.Lock()
+        REGISTRO.append(self)
+
+    def _clave(self, valores):
+        return tuple(str(valores.get(e, "")) for e in self.etiquetas)
+
+    def exponer(self):
+        yield f"# HELP {self.nombre} {self.ayuda}"
+        yield f"# TYPE {self.nombre} {self.tipo}"
+        with self._lock:
+            series = sorted(self._series.items())
+            series = [(clave, self._copiar(valor)) for clave, valor in series]
+        for clave, valor in series:
+            yield from self._lineas(clave, valor)
+
+    def _copiar(self, valor):
+        return valor
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def inc(self, cantidad=1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._series[clave] = self._series.get(clave, 0) + cantidad
+
+    def _lineas(self, clave, valor):
+        yield f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(valor)}"
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_LATENCIA):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(sorted(buckets))
+
+    def observar(self, valor, **etiquetas):
+        clave = self._clave(etiquetas)
+        indice = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                # [conteos por bucket (no acumulados, el último es +Inf), total, suma]
+                serie = self._series[clave] = [[0] * (len(self.buckets) + 1), 0, 0.0]
+            serie[0][indice] += 1
+            serie[1] += 1
+            serie[2] += valor
+
+    def _copiar(self, valor):
+        return [list(valor[0]), valor[1], valor[2]]
+
+    def _lineas(self, clave, valor):
+        conteos, total, suma = valor
+        acumulado = 0
+        for limite, conteo in zip(self.buckets + (float("inf"),), conteos):
+            acumulado += conteo
+            le = 'le="' + _numero(float(limite)) + '"'
+            yield f"{self.nombre}_bucket{_etiquetas(self.etiquetas, clave, le)} {acumulado}"
+        yield f"{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {total}"
+        yield f"{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {_numero(suma)}"
+
+
+class Calculada(_Metrica):
+    """Valor que se lee al exponer (p. ej. contadores que ya lleva otro módulo)"""
+
+    def __init__(self, nombre, ayuda, funcion, tipo="gauge"):
+        super().__init__(nombre, ayuda)
+        self.tipo = tipo
+        self.funcion = funcion
+
+    def exponer(self):
+        yield f"# HELP {self.nombre} {self.ayuda}"
+        yield f"# TYPE {self.nombre} {self.tipo}"
+        yield f"{self.nombre} {_numero(self.funcion())}"
+
+
+def exponer():
+    lineas = []
+    for metrica in REGISTRO:
+        lineas.extend(metrica.exponer())
+    return "\n".join(lineas) + "\n"
+
+
+# ==================== MÉTRICAS DE LA API ====================
+
+duracion_peticion = Histograma(
+    "virtualmed_http_request_duration_seconds", "Latencia de cada petición HTTP",
+    ("method", "route", "status"))
+comandos_por_peticion = Histograma(
+    "virtualmed_http_request_mongo_commands", "Comandos de MongoDB por petición",
+    ("route",), buckets=BUCKETS_COMANDOS)
+mongo_por_peticion = Histograma(
+    "virtualmed_http_request_mongo_seconds", "Tiempo total en MongoDB por petición", ("route",))
+duracion_comando = Histograma(
+    "virtualmed_mongo_command_duration_seconds", "Duración de cada comando de MongoDB", ("command",))
+errores_comando = Contador(
+    "virtualmed_mongo_command_errors_total", "Comandos de MongoDB que fallaron", ("command",))
+duracion_fase = Histograma(
+    "virtualmed_analyze_phase_seconds", "Duración de cada fase de /analyze", ("route", "phase"))
+Calculada("virtualmed_log_messages_dropped_total", "Mensajes de log descartados con la cola llena",
+          Logs.descartados, tipo="counter")
+
+
+# ==================== CONTEXTO DE LA PETICIÓN ====================
+# Un dict mutable por petición: las tareas de asyncio.gather y los hilos que copian el contexto
+# suman sobre el mismo objeto.
+
+_peticion = ContextVar("virtualmed_peticion", default=None)
+
+
+def iniciar_peticion(ruta):
+    return _peticion.set({"ruta": ruta, "inicio": time.perf_counter(), "comandos": 0, "mongo": 0.0})
+
+
+def terminar_peticion(token, method, status):
+    datos = _peticion.get()
+    try:
+        _peticion.reset(token)
+    except ValueError:
+        # El token se creó en otro contexto (p. ej. el servidor terminó la respuesta en otro hilo)
+        _peticion.set(None)
+    if datos is None:
+        return
+    ruta = datos["ruta"]
+    duracion_peticion.observar(time.perf_counter() - datos["inicio"], method=method, route=ruta, status=status)
+    comandos_por_peticion.observar(datos["comandos"], route=ruta)
+    mongo_por_peticion.observar(datos["mongo"], route=ruta)
+
+
+@contextmanager
+def fase(nombre):
+    """Mide una fase de /analyze (cache, preprocess, predict, persist)"""
+    datos = _peticion.get()
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracion_fase.observar(time.perf_counter() - inicio,
+                               route=datos["ruta"] if datos else "", phase=nombre)
+
+
+class _EscuchaMongo(monitoring.CommandListener):
+    """Se pasa en event_listeners a MongoClient y AsyncMongoClient; corre en el hilo/tarea que consulta"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._registrar(event)
+
+    def failed(self, event):
+        errores_comando.inc(command=event.command_name)
+        self._registrar(event)
+
+    def _registrar(self, event):
+        segundos = event.duration_micros / 1e6
+        duracion_comando.observar(segundos, command=event.command_name)
+        datos = _peticion.get()
+        if datos is not None:
+            datos["comandos"] += 1
+            datos["mongo"] += segundos
+
+
+escucha_mongo = _EscuchaMongo()
+
+
+def event_listeners():
+    return [escucha_mongo]
+
+
+# ==================== INSTRUMENTACIÓN DE LAS APPS ====================
+
+def _ruta(request):
+    # La plantilla de la ruta (/user/<user_id>), no la URL: acota el número de series
+    return request.url_rule.rule if request.url_rule is not None else "sin_ruta"
+
+
+def instrumentar_flask(app):
+    from flask import request, g
+
+    @app.before_request
+    def _inicio_metricas():
+        g._metricas = iniciar_peticion(_ruta(request))
+
+    @app.after_request
+    def _status_metricas(response):
+        g._metricas_status = response.status_code
+        return response
+
+    # teardown también corre con excepciones no manejadas y, en streaming, al terminar de enviar
+    @app.teardown_request
+    def _fin_metricas(error=None):
+        token = g.pop("_metricas", None)
+        if token is not None:
+            terminar_peticion(token, request.method, g.pop("_metricas_status", 500))
+
+
+def instrumentar_quart(app):
+    from quart import request, g
+
+    @app.before_request
+    async def _inicio_metricas():
+        g._metricas = iniciar_peticion(_ruta(request))
+
+    @app.after_request
+    async def _status_metricas(response):
+        g._metricas_status = response.status_code
+        return response
+
+    @app.teardown_request
+    async def _fin_metricas(error=None):
+        token = g.pop("_metricas", None)
+        if token is not None:
+            terminar_peticion(token, request.method, g.pop("_metricas_status", 500))
+
+
+def respuesta():
+    from flask import Response
+    return Response(exponer(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,184 @@
+import os
+import threading
+import time
+from datetime import datetime
+import numpy as np
+from BackEnd.InferenceBackends import cargar_modelo
+import BackEnd.GlobalInfo.Keys as Colabskey
+from BackEnd import Logs
+
+log = Logs.obtener(__name__)
+
+
+# ==================== REGISTRO DEL MODELO (UNA CARGA POR PROCESO) ====================
+
+def _rss_actual():
+    """Memoria residente actual del proceso en bytes (Linux), o el pico si no hay /proc"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource  # No existe en Windows
+        # ru_maxrss viene en KB en Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except ImportError:
+        return 0
+
+
+class ModelRegistry:
+    """Mantiene el modelo cargado y calentado en memoria, compartido por todos los hilos de Flask"""
+
+    def __init__(self, model_path, input_size, reload_check_seconds=0):
+        self.model_path = model_path
+        self.input_size = input_size
+        self.reload_check_seconds = reload_check_seconds
+
+        self._lock = threading.Lock()
+        self._model = None
+        self._publicado = (None, None)  # (modelo, versión) se publican juntos para modelo_y_version()
+        self._mtime = None
+        self._ultima_revision = 0.0
+        self._recargando = False
+        self.version = None
+
+        # Métricas de la última carga
+        self.load_seconds = None
+        self.rss_delta_bytes = None
+        self.params_bytes = None
+        self.loaded_at = None
+        self.reloads = 0
+
+    @property
+    def is_loaded(self):
+        return self._model is not None
+
+    def _version_en_disco(self):
+        st = os.stat(self.model_path)
+        return f"{os.path.basename(self.model_path)}:{st.st_size}:{st.st_mtime_ns}"
+
+    def current_version(self):
+        """Versión del modelo (nombre, tamaño y mtime del archivo) sin necesidad de cargarlo"""
+        if self.version is not None:
+            return self.version
+        try:
+            return self._version_en_disco()
+        except OSError:
+            return "sin-modelo"
+
+    def get_model(self):
+        """Devuelve el modelo, cargándolo la primera vez y recargándolo si el archivo cambió"""
+        model = self._model
+        if model is None:
+            with self._lock:
+                # Doble verificación: otro hilo pudo cargarlo mientras esperábamos
+                if self._model is None:
+                    self._cargar()
+                return self._model
+
+        if self.reload_check_seconds > 0:
+            self._revisar_recarga()
+        return self._model
+
+    def modelo_y_version(self):
+        """Modelo y la versión de ESE modelo, sin mezclar con una recarga que ocurra en medio"""
+        self.get_model()
+        return self._publicado
+
+    def _revisar_recarga(self):
+        ahora = time.monotonic()
+        if ahora - self._ultima_revision < self.reload_check_seconds:
+            return
+        self._ultima_revision = ahora
+
+        try:
+            mtime = os.path.getmtime(self.model_path)
+        except OSError:
+            return  # Si el archivo desapareció seguimos sirviendo el modelo actual
+
+        if mtime == self._mtime:
+            return
+        # La recarga corre en su propio hilo: quien la detectó (el micro-batcher) y todos los demás
+        # siguen usando el modelo anterior hasta que el nuevo está cargado y calentado
+        with self._lock:
+            if self._recargando or mtime == self._mtime:
+                return
+            self._recargando = True
+        threading.Thread(target=self._recargar, args=(mtime,), name="model-reload", daemon=True).start()
+
+    def _recargar(self, mtime):
+        try:
+            log.info("♻️ [MODELO] Cambio detectado en %s, recargando...", self.model_path)
+            cargado = self._construir()
+            with self._lock:
+                self._publicar(*cargado)
+            self.reloads += 1
+        except Exception as e:
+            log.error("❌ [MODELO] Falló la recarga, se mantiene el modelo anterior: %s", e)
+            self._mtime = mtime  # Evita reintentar en cada revisión con un archivo roto
+        finally:
+            self._recargando = False
+
+    def _cargar(self):
+        """Primera carga, con self._lock tomado"""
+        self._publicar(*self._construir())
+
+    def _construir(self):
+        """Carga y calienta el modelo sin tocar el publicado. Devuelve (modelo, mtime, versión, métricas)"""
+        if not os.path.exists(self.model_path):
+            raise FileNotFoundError(f"Modelo no encontrado: {self.model_path}")
+
+        mtime = os.path.getmtime(self.model_path)
+        version = self._version_en_disco()
+        rss_antes = _rss_actual()
+        inicio = time.perf_counter()
+
+        model = cargar_modelo(self.model_path)
+        # Calentamiento: la primera predicción construye el grafo, mejor pagarla aquí
+        warmup = np.zeros((1, self.input_size[0], self.input_size[1], 3), dtype=np.float32)
+        model.predict(warmup, verbose=0)
+
+        if hasattr(model, "size_bytes"):
+            params_bytes = model.size_bytes
+        else:
+            params_bytes = int(sum(int(np.prod(w.shape)) * np.dtype(w.dtype).itemsize for w in model.weights))
+        metricas = {"load_seconds": time.perf_counter() - inicio,
+                    "rss_delta_bytes": max(_rss_actual() - rss_antes, 0),
+                    "params_bytes": params_bytes}
+        return model, mtime, version, metricas
+
+    def _publicar(self, model, mtime, version, metricas):
+        """Cambia al modelo nuevo ya listo (con self._lock tomado)"""
+        self.load_seconds = metricas["load_seconds"]
+        self.rss_delta_bytes = metricas["rss_delta_bytes"]
+        self.params_bytes = metricas["params_bytes"]
+        self.loaded_at = datetime.utcnow()
+
+        self._model = model
+        self._mtime = mtime
+        self.version = version
+        self._publicado = (model, version)
+
+        log.info("✅ [MODELO] Cargado en %.2fs (RSS +%.1f MB, pesos %.1f MB)",
+                 self.load_seconds, self.rss_delta_bytes / 1e6, self.params_bytes / 1e6)
+
+    def stats(self):
+        return {
+            "model_path": self.model_path,
+            "backend": "tflite" if self.model_path.endswith(".tflite") else "keras",
+            "version": self.version,
+            "loaded": self.is_loaded,
+            "load_seconds": self.load_seconds,
+            "rss_delta_bytes": self.rss_delta_bytes,
+            "params_bytes": self.params_bytes,
+            "loaded_at": self.loaded_at.isoformat() if self.loaded_at else None,
+            "reloads": self.reloads
+        }
+
+
+model_registry = ModelRegistry(
+    Colabskey.MODEL_PATH,
+    Colabskey.MODEL_INPUT_SIZE,
+    reload_check_seconds=Colabskey.MODEL_RELOAD_CHECK_SECONDS
+)
@@ -0,0 +1,60 @@
+import base64
+import json
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+import BackEnd.GlobalInfo.Keys as Colabskey
+
+
+# ==================== PAGINACIÓN POR CURSOR (KEYSET) ====================
+# El cursor es opaco para el cliente: JSON en base64url con la última llave de la página anterior.
+
+class CursorInvalido(ValueError):
+    """El parámetro ?cursor= no se pudo decodificar; el endpoint responde 400"""
+
+
+def leer_limite(args):
+    """?limit= acotado a MAX_PAGE_SIZE para que ninguna petición cargue una colección entera
+    (DEFAULT_PAGE_SIZE si no viene). Los volcados completos van por /users/export y /predictions/export"""
+    try:
+        limite = int(args.get('limit', Colabskey.DEFAULT_PAGE_SIZE))
+    except (TypeError, ValueError):
+        limite = Colabskey.DEFAULT_PAGE_SIZE
+    return max(1, min(limite, Colabskey.MAX_PAGE_SIZE))
+
+
+def codificar_cursor(**llave):
+    datos = {}
+    for campo, valor in llave.items():
+        if isinstance(valor, ObjectId):
+            datos[campo] = {"$oid": str(valor)}
+        elif isinstance(valor, datetime):
+            datos[campo] = {"$date": valor.isoformat()}
+        else:
+            datos[campo] = valor
+    return base64.urlsafe_b64encode(json.dumps(datos, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(token, tipos):
+    """Devuelve el dict de la llave, o None si no hay cursor. `tipos` es {campo: tipo o tupla de tipos}
+    de lo que espera el endpoint: un campo que falte o sea de otro tipo también es CursorInvalido (400)"""
+    if not token:
+        return None
+    try:
+        relleno = "=" * (-len(token) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(token + relleno))
+        llave = {}
+        for campo, valor in datos.items():
+            if isinstance(valor, dict) and "$oid" in valor:
+                llave[campo] = ObjectId(valor["$oid"])
+            elif isinstance(valor, dict) and "$date" in valor:
+                llave[campo] = datetime.fromisoformat(valor["$date"])
+            else:
+                llave[campo] = valor
+    except (ValueError, TypeError, AttributeError, InvalidId):
+        raise CursorInvalido("Cursor de paginación inválido")
+    for campo, tipo in tipos.items():
+        # bool es subclase de int: true/false no sirven como índice
+        if campo not in llave or not isinstance(llave[campo], tipo) or isinstance(llave[campo], bool):
+            raise CursorInvalido("Cursor de paginación inválido")
+    return llave
@@ -0,0 +1,81 @@
+import hashlib
+import threading
+from datetime import datetime, timedelta
+import BackEnd.GlobalInfo.Keys as Colabskey
+from BackEnd.Cache import CacheTTL
+from BackEnd.ModelRegistry import model_registry
+from BackEnd import Logs
+
+log = Logs.obtener(__name__)
+
+
+# ==================== CACHÉ DE PREDICCIONES (HASH DE IMAGEN + VERSIÓN DEL MODELO) ====================
+
+class PredictionCache:
+    """Evita repetir el forward pass de imágenes ya analizadas con la misma versión del modelo"""
+
+    def __init__(self, max_entries, ttl_seconds, usar_mongo=False, coleccion="prediction_cache"):
+        self.memoria = CacheTTL(max_entries, ttl_seconds)
+        self.ttl_seconds = ttl_seconds
+        self.usar_mongo = usar_mongo
+        self.coleccion = coleccion
+        self._lock = threading.Lock()
+        self.hits_mongo = 0
+        self.misses_mongo = 0
+
+    def clave(self, datos, version=None):
+        """sha256 de los bytes subidos + versión del modelo: un modelo nuevo invalida todo. Para guardar,
+        pasar la versión que devolvió la inferencia (con el pool, la del worker, que puede no haber
+        recargado todavía el archivo nuevo)"""
+        return f"{hashlib.sha256(datos).hexdigest()}:{version or model_registry.current_version()}"
+
+    def get(self, clave, db=None):
+        valor = self.memoria.get(clave)
+        if valor is not None or not self.usar_mongo or db is None:
+            return valor
+
+        limite = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+        try:
+            doc = db[self.coleccion].find_one({"_id": clave, "created_at": {"$gte": limite}})
+        except Exception as e:
+            # La caché nunca debe tumbar un análisis: si Mongo falla, se trata como miss
+            log.warning("⚠️ [CACHE] Error leyendo caché persistente: %s", e)
+            doc = None
+        with self._lock:
+            if doc:
+                self.hits_mongo += 1
+            else:
+                self.misses_mongo += 1
+        if not doc:
+            return None
+
+        valor = doc["value"]
+        self.memoria.set(clave, valor)
+        return valor
+
+    def set(self, clave, valor, db=None):
+        self.memoria.set(clave, valor)
+        if self.usar_mongo and db is not None:
+            try:
+                db[self.coleccion].update_one(
+                    {"_id": clave},
+                    {"$set": {"value": valor, "created_at": datetime.utcnow()}},
+                    upsert=True
+                )
+            except Exception as e:
+                log.warning("⚠️ [CACHE] Error guardando en caché persistente: %s", e)
+
+    def stats(self):
+        stats = self.memoria.stats()
+        stats["mongo_enabled"] = self.usar_mongo
+        if self.usar_mongo:
+            stats["mongo_hits"] = self.hits_mongo
+            stats["mongo_misses"] = self.misses_mongo
+        return stats
+
+
+prediction_cache = PredictionCache(
+    Colabskey.PREDICTION_CACHE_MAX_ENTRIES,
+    Colabskey.PREDICTION_CACHE_TTL_SECONDS,
+    usar_mongo=Colabskey.PREDICTION_CACHE_MONGO
+)
@@ -0,0 +1,44 @@
+import io
+import numpy as np
+from PIL import Image
+import BackEnd.GlobalInfo.Keys as Colabskey
+
+
+# ==================== PREPROCESAMIENTO DE IMÁGENES PARA EL MODELO ====================
+# Decodifica directo a buffers float32 (la mitad de memoria que float64) y normaliza en sitio.
+
+ESCALA = np.float32(1.0 / 255.0)
+
+
+def _decodificar_en(destino, datos, size):
+    """Decodifica los bytes de una imagen y la escribe (sin normalizar) en destino[alto, ancho, 3]"""
+    img = Image.open(io.BytesIO(datos))
+    # En JPEG, draft() hace que libjpeg decodifique ya reducido (1/2, 1/4, 1/8) sin bajar de 'size'
+    img.draft("RGB", size)
+    img = img.convert("RGB")
+    if img.size != size:
+        # reducing_gap reduce primero por bloques enteros y deja el remuestreo fino para el final
+        img = img.resize(size, reducing_gap=3.0)
+    # La asignación convierte uint8 -> float32 dentro del buffer, sin temporales float64
+    destino[...] = np.asarray(img)
+
+
+def preprocess_batch(lista_datos, out=None, size=Colabskey.MODEL_INPUT_SIZE):
+    """Convierte una lista de imágenes (bytes) en un tensor (n, alto, ancho, 3) float32 en [0, 1]"""
+    n = len(lista_datos)
+    forma = (n, size[1], size[0], 3)
+    if out is None:
+        out = np.empty(forma, dtype=np.float32)
+    elif out.shape[0] < n or out.shape[1:] != forma[1:] or out.dtype != np.float32:
+        raise ValueError(f"Buffer de salida incompatible: {out.shape} {out.dtype}, se esperaba {forma} float32")
+
+    batch = out[:n]
+    for i, datos in enumerate(lista_datos):
+        _decodificar_en(batch[i], datos, size)
+    batch *= ESCALA
+    return batch
+
+
+def preprocess_image(datos, size=Colabskey.MODEL_INPUT_SIZE):
+    """Una sola imagen lista para predict: (1, alto, ancho, 3) float32"""
+    return preprocess_batch([datos], size=size)
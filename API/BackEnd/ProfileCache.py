@@ -0,0 +1,136 @@
+import json
+import threading
+import time
+import BackEnd.GlobalInfo.Keys as Colabskey
+import BackEnd.Metrics as Metrics
+from BackEnd.Cache import CacheTTL
+from BackEnd import Logs
+
+log = Logs.obtener(__name__)
+
+
+# ==================== CACHÉ DE PERFILES (getUserById) ====================
+# El perfil combinado (users + doctors/patients) que devuelve GET /user/<id>, por userId. La app lo pide
+# en casi cada pantalla; con la caché, repetirlo no toca Mongo.
+#
+# Sin PROFILE_CACHE_REDIS_URL vive en la memoria de cada proceso: updateUser/deleteUser invalidan el
+# proceso que atendió la escritura, y los demás workers de gunicorn pueden servir el perfil anterior
+# hasta PROFILE_CACHE_TTL_SECONDS. Con Redis la caché es una sola para todos los workers y la
+# invalidación es inmediata en todos (no se usa la memoria local para no reintroducir ese desfase).
+
+class ProfileCache:
+    """Read-through por userId con LRU + TTL en memoria o Redis compartido"""
+
+    def __init__(self, max_entries, ttl_seconds, redis_url=None, prefijo="virtualmed:perfil:"):
+        self.ttl_seconds = ttl_seconds
+        self.memoria = CacheTTL(max_entries, ttl_seconds) if max_entries > 0 and not redis_url else None
+        self.redis_url = redis_url
+        self.prefijo = prefijo
+        self._redis = None
+        self._lock = threading.Lock()
+        self._generacion = 0
+        self.hits = 0
+        self.misses = 0
+        self.errores_redis = 0
+
+    @property
+    def habilitada(self):
+        return self.memoria is not None or bool(self.redis_url)
+
+    def _cliente_redis(self):
+        if self._redis is None:
+            import redis  # Dependencia opcional: solo si se configura PROFILE_CACHE_REDIS_URL
+            self._redis = redis.Redis.from_url(self.redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        return self._redis
+
+    def _contar(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def generacion(self):
+        """Tomarla antes de leer de Mongo y pasarla a set(): si hubo una invalidación en medio, no se guarda"""
+        return self._generacion
+
+    def get(self, user_id):
+        if not self.habilitada:
+            return None
+        entrada = None
+        if self.redis_url:
+            try:
+                crudo = self._cliente_redis().get(self.prefijo + user_id)
+                entrada = json.loads(crudo) if crudo is not None else None
+            except Exception as e:
+                # La caché nunca debe tumbar la petición: si Redis falla, se trata como miss
+                self.errores_redis += 1
+                log.warning("⚠️ [PERFILES] Error leyendo de Redis: %s", e)
+        else:
+            entrada = self.memoria.get(user_id)
+
+        self._contar(entrada is not None)
+        if entrada is None:
+            return None
+        edad_cache.observar(max(time.time() - entrada["guardado_en"], 0.0))
+        return entrada["perfil"]
+
+    def set(self, user_id, perfil, generacion):
+        if not self.habilitada:
+            return
+        with self._lock:
+            if generacion != self._generacion:
+                return
+        entrada = {"perfil": perfil, "guardado_en": time.time()}
+        if self.redis_url:
+            try:
+                self._cliente_redis().set(self.prefijo + user_id, json.dumps(entrada, default=str),
+                                          ex=max(int(self.ttl_seconds), 1))
+            except Exception as e:
+                self.errores_redis += 1
+                log.warning("⚠️ [PERFILES] Error guardando en Redis: %s", e)
+        else:
+            self.memoria.set(user_id, entrada)
+
+    def invalidar(self, user_id):
+        with self._lock:
+            self._generacion += 1
+        if self.redis_url:
+            try:
+                self._cliente_redis().delete(self.prefijo + user_id)
+            except Exception as e:
+                self.errores_redis += 1
+                log.warning("⚠️ [PERFILES] Error invalidando en Redis: %s", e)
+        elif self.memoria is not None:
+            self.memoria.delete(user_id)
+
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        stats = self.memoria.stats() if self.memoria is not None else {}
+        stats.update({"backend": "redis" if self.redis_url else "memory", "hits": self.hits,
+                      "misses": self.misses, "hit_ratio": self.hit_ratio() if self.hits + self.misses else None,
+                      "ttl_seconds": self.ttl_seconds})
+        if self.redis_url:
+            stats["redis_errors"] = self.errores_redis
+        return stats
+
+
+profile_cache = ProfileCache(
+    Colabskey.PROFILE_CACHE_MAX_ENTRIES,
+    Colabskey.PROFILE_CACHE_TTL_SECONDS,
+    redis_url=Colabskey.PROFILE_CACHE_REDIS_URL
+)
+
+# Antigüedad de cada perfil servido desde la caché: cuánto puede estar atrasado respecto a Mongo
+edad_cache = Metrics.Histograma(
+    "virtualmed_profile_cache_age_seconds", "Antigüedad de los perfiles servidos desde la caché",
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600))
+Metrics.Calculada("virtualmed_profile_cache_hits_total", "Perfiles servidos desde la caché",
+                  lambda: profile_cache.hits, tipo="counter")
+Metrics.Calculada("virtualmed_profile_cache_misses_total", "Perfiles leídos de MongoDB",
+                  lambda: profile_cache.misses, tipo="counter")
+Metrics.Calculada("virtualmed_profile_cache_hit_ratio", "Proporción de aciertos de la caché de perfiles",
+                  profile_cache.hit_ratio)
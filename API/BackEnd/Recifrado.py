@@ -0,0 +1,187 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from cryptography.fernet import InvalidToken
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+import BackEnd.GlobalInfo.Keys as Colabskey
+from BackEnd import Cifrado
+from BackEnd import Logs
+
+log = Logs.obtener(__name__)
+
+
+# ==================== RE-CIFRADO DE PREDICCIONES CON LA CLAVE PRIMARIA ====================
+# Recorre db.prediction por _id en lotes y reescribe image_url en el formato actual con la clave
+# primaria. El avance se guarda en db.jobs después de cada lote, así que se puede detener y reanudar.
+# Si cambia la clave primaria, el trabajo vuelve a empezar desde el principio.
+
+ID_TRABAJO = "reencrypt_predictions"
+
+
+def _recifrar(valor):
+    """Nuevo valor de image_url, o None si ya está en el formato actual con la clave primaria"""
+    if not isinstance(valor, str) or not valor:
+        return None
+    if not Cifrado.esta_cifrada(valor):
+        # URL en claro guardada antes del cifrado
+        return Cifrado.cifrar_url_imagen(valor)
+    token = Cifrado.token_fernet(valor)
+    if valor.startswith(Cifrado.MARCADOR):
+        try:
+            Cifrado.primaria.decrypt(token)
+            return None
+        except InvalidToken:
+            pass
+    # rotate() descifra con cualquier clave conocida y cifra con la primaria; InvalidToken si ninguna sirve
+    return Cifrado.MARCADOR + Cifrado.fernet.rotate(token).decode()
+
+
+class TrabajoEnEjecucion(RuntimeError):
+    """Otro proceso (worker de gunicorn o Tools.reencrypt) tiene el trabajo reclamado"""
+
+
+class TrabajoRecifrado:
+    """Trabajo reanudable y con límite de velocidad; el estado persistente vive en db.jobs.
+
+    El documento de db.jobs es también el candado entre procesos: quien lo reclama con status=running
+    y un lease vigente es el único que procesa lotes, y renueva el lease después de cada lote. Si el
+    proceso muere, otro puede reclamarlo cuando el lease vence. Para detenerlo desde cualquier worker
+    se marca stop_requested en el documento."""
+
+    def __init__(self, db, batch_size=None, max_docs_per_second=None):
+        self.db = db
+        self.batch_size = batch_size or Colabskey.REENCRYPT_BATCH_SIZE
+        self.max_docs_per_second = (Colabskey.REENCRYPT_MAX_DOCS_PER_SECOND
+                                    if max_docs_per_second is None else max_docs_per_second)
+        self.propietario = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def estado(self):
+        return self.db.jobs.find_one({"_id": ID_TRABAJO})
+
+    def _lease(self):
+        return datetime.now() + timedelta(seconds=Colabskey.REENCRYPT_LEASE_SECONDS)
+
+    def reclamar(self, reiniciar=False):
+        """Toma el candado de db.jobs y prepara el checkpoint. TrabajoEnEjecucion si otro lo tiene"""
+        ahora = datetime.now()
+        candado = {"status": "running", "owner": self.propietario, "lease_until": self._lease(),
+                   "stop_requested": False, "error": None, "updated_at": ahora}
+        try:
+            # Devuelve el documento anterior (None si no existía y se acaba de crear)
+            anterior = self.db.jobs.find_one_and_update(
+                {"_id": ID_TRABAJO, "$or": [{"status": {"$ne": "running"}}, {"lease_until": {"$lt": ahora}}]},
+                {"$set": candado}, upsert=True, return_document=ReturnDocument.BEFORE)
+        except DuplicateKeyError:
+            # El documento existe pero no cumple el filtro: otro proceso tiene un lease vigente
+            raise TrabajoEnEjecucion("El re-cifrado ya está en ejecución")
+
+        estado = dict(anterior or {}, _id=ID_TRABAJO, **candado)
+        huella = Cifrado.huella_clave(Cifrado.CLAVE_FUNCIONAL)
+        if (reiniciar or anterior is None or anterior.get("primary_key") != huella
+                or anterior.get("status") == "completed" or "last_id" not in anterior):
+            estado.update({
+                "primary_key": huella, "last_id": None,
+                "total": self.db.prediction.estimated_document_count(),
+                "processed": 0, "updated": 0, "failed": 0, "started_at": ahora, "finished_at": None
+            })
+            self._guardar(estado)
+        return estado
+
+    def _guardar(self, estado, **cambios):
+        """Guarda el checkpoint y renueva el lease. Devuelve el documento, o None si el lease se perdió"""
+        estado.update(cambios, updated_at=datetime.now())
+        if estado.get("status") == "running":
+            estado["lease_until"] = self._lease()
+        return self.db.jobs.find_one_and_update(
+            {"_id": ID_TRABAJO, "owner": self.propietario},
+            {"$set": {k: v for k, v in estado.items() if k not in ("_id", "stop_requested")}},
+            projection={"stop_requested": 1})
+
+    def ejecutar(self, reiniciar=False, progreso=None):
+        """Reclama el trabajo y procesa hasta terminar o hasta que se pida detenerlo. Devuelve el estado final"""
+        return self.procesar(self.reclamar(reiniciar), progreso)
+
+    def procesar(self, estado, progreso=None):
+        """Procesa lotes con un trabajo ya reclamado (reclamar())"""
+        try:
+            while True:
+                inicio_lote = time.monotonic()
+                filtro = {"_id": {"$gt": estado["last_id"]}} if estado["last_id"] else {}
+                lote = list(self.db.prediction.find(filtro, {"image_url": 1}).sort("_id", 1).limit(self.batch_size))
+                if not lote:
+                    self._guardar(estado, status="completed", finished_at=datetime.now())
+                    break
+
+                operaciones, fallidos = [], 0
+                for doc in lote:
+                    try:
+                        nuevo = _recifrar(doc.get("image_url"))
+                    except (InvalidToken, ValueError):
+                        fallidos += 1
+                        continue
+                    if nuevo is not None:
+                        # Solo si nadie cambió el documento mientras tanto
+                        operaciones.append(UpdateOne({"_id": doc["_id"], "image_url": doc["image_url"]},
+                                                     {"$set": {"image_url": nuevo}}))
+                actualizados = self.db.prediction.bulk_write(operaciones, ordered=False).modified_count if operaciones else 0
+
+                control = self._guardar(estado, last_id=lote[-1]["_id"],
+                                        processed=estado["processed"] + len(lote),
+                                        updated=estado["updated"] + actualizados,
+                                        failed=estado["failed"] + fallidos)
+                if control is None:
+                    # Otro proceso reclamó el trabajo (nuestro lease venció): él sigue desde su checkpoint
+                    log.warning("⚠️ [Recifrado] Se perdió el lease del trabajo; este proceso se detiene")
+                    estado["status"] = "lost"
+                    break
+                if progreso:
+                    progreso(estado)
+                if control.get("stop_requested"):
+                    self._guardar(estado, status="paused")
+                    break
+
+                # Límite de velocidad: el lote debe durar al menos len(lote) / max_docs_per_second
+                if self.max_docs_per_second:
+                    espera = len(lote) / self.max_docs_per_second - (time.monotonic() - inicio_lote)
+                    if espera > 0:
+                        time.sleep(espera)
+        except (KeyboardInterrupt, SystemExit):
+            # Ctrl+C en Tools.reencrypt: se libera el candado y el checkpoint queda listo para reanudar
+            self._guardar(estado, status="paused")
+            raise
+        except BaseException as e:
+            self._guardar(estado, status="failed", error=str(e) or type(e).__name__)
+            raise
+        return estado
+
+
+# ==================== EJECUCIÓN EN SEGUNDO PLANO (endpoints /admin/reencrypt) ====================
+# El estado sale siempre de db.jobs, no del hilo: cualquier worker puede consultarlo o detenerlo.
+
+def iniciar_en_segundo_plano(db, reiniciar=False):
+    """Reclama el trabajo en la petición y lo procesa en un hilo daemon. TrabajoEnEjecucion si ya corre"""
+    trabajo = TrabajoRecifrado(db)
+    estado = trabajo.reclamar(reiniciar)
+
+    def correr():
+        try:
+            trabajo.procesar(estado)
+        except Exception as e:
+            log.exception("💥 [Recifrado] El trabajo falló: %s", e)
+
+    threading.Thread(target=correr, name="recifrado", daemon=True).start()
+
+
+def solicitar_detencion(db):
+    """El proceso que lo ejecuta se detiene al terminar el lote en curso. False si no hay trabajo corriendo"""
+    return db.jobs.update_one({"_id": ID_TRABAJO, "status": "running", "lease_until": {"$gte": datetime.now()}},
+                              {"$set": {"stop_requested": True}}).modified_count > 0
+
+
+def en_ejecucion(estado):
+    return bool(estado) and estado.get("status") == "running" and \
+        estado.get("lease_until") is not None and estado["lease_until"] >= datetime.now()
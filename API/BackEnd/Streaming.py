@@ -0,0 +1,58 @@
+from flask import Response, stream_with_context, json
+import BackEnd.GlobalInfo.Keys as Colabskey
+
+
+# ==================== RESPUESTAS EN STREAMING ====================
+# Para exportaciones completas: se serializa documento por documento mientras se recorre el cursor,
+# así nunca existe la lista entera (ni su JSON) en memoria.
+
+FORMATOS = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+}
+
+
+class FormatoInvalido(ValueError):
+    """?format= no soportado; el endpoint responde 400"""
+
+
+def leer_formato(args):
+    formato = args.get('format', 'json').lower()
+    if formato not in FORMATOS:
+        raise FormatoInvalido(f"Formato no soportado: {formato}. Usa: {', '.join(FORMATOS)}")
+    return formato
+
+
+def _fragmentos(documentos, formato):
+    """Agrupa los documentos serializados en fragmentos de ~EXPORT_CHUNK_BYTES"""
+    buffer, tamano = [], 0
+    if formato == "json":
+        buffer.append("[")
+    primero = True
+    for documento in documentos:
+        # json de Flask: mismas reglas de serialización (fechas, etc.) que jsonify
+        texto = json.dumps(documento, separators=(",", ":"))
+        if formato == "json":
+            texto = texto if primero else "," + texto
+        else:
+            texto += "\n"
+        primero = False
+        buffer.append(texto)
+        tamano += len(texto)
+        if tamano >= Colabskey.EXPORT_CHUNK_BYTES:
+            yield "".join(buffer)
+            buffer, tamano = [], 0
+    if formato == "json":
+        buffer.append("]")
+    if buffer:
+        yield "".join(buffer)
+
+
+def respuesta_streaming(documentos, formato, nombre):
+    """Response chunked a partir de un generador de documentos; el cursor se consume mientras se envía"""
+    extension = "ndjson" if formato == "ndjson" else "json"
+    return Response(
+        stream_with_context(_fragmentos(documentos, formato)),
+        mimetype=FORMATOS[formato],
+        headers={"Content-Disposition": f"attachment; filename={nombre}.{extension}"}
+    )
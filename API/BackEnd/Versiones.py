@@ -0,0 +1,103 @@
+import hashlib
+from datetime import datetime, timedelta
+from flask import request, make_response, Response
+from BackEnd import Logs
+
+log = Logs.obtener(__name__)
+
+
+# ==================== VERSIONES DE RECURSOS (ETag / Last-Modified) ====================
+# db.versions guarda un contador por recurso ({_id, v, updated_at}) que los handlers de escritura
+# incrementan DESPUÉS de escribir. Los listados que la app consulta una y otra vez calculan su ETag con
+# esos contadores (una sola consulta por _id) y, si el cliente ya tiene esa versión, responden 304 sin
+# consultar, descifrar ni serializar nada.
+#
+# Solo las escrituras hechas por la API incrementan versiones: un cambio hecho a mano en Atlas o con un
+# script debe llamar a incrementar() o los clientes seguirán recibiendo 304 hasta la siguiente escritura.
+
+COLECCION = "versions"
+# Cambiarlo invalida todos los ETag (p. ej. si cambia el formato de las respuestas)
+FORMATO = "1"
+
+USUARIOS = "users"
+PREDICCIONES = "predictions"
+
+
+def citas_medico(medico_id):
+    return f"appointments:doctor:{medico_id}"
+
+
+def citas_paciente(paciente_id):
+    return f"appointments:patient:{paciente_id}"
+
+
+def _cambios(ahora):
+    return {"$inc": {"v": 1}, "$set": {"updated_at": ahora}}
+
+
+def incrementar(db, *nombres):
+    """Marca los recursos como modificados. Un fallo aquí no revierte la escritura ya hecha"""
+    ahora = datetime.utcnow()
+    for nombre in nombres:
+        try:
+            db[COLECCION].update_one({"_id": nombre}, _cambios(ahora), upsert=True)
+        except Exception as e:
+            log.error("❌ [VERSIONES] No se pudo incrementar %s: %s", nombre, e)
+
+
+async def incrementar_async(db, *nombres):
+    ahora = datetime.utcnow()
+    for nombre in nombres:
+        try:
+            await db[COLECCION].update_one({"_id": nombre}, _cambios(ahora), upsert=True)
+        except Exception as e:
+            log.error("❌ [VERSIONES] No se pudo incrementar %s: %s", nombre, e)
+
+
+def _etiqueta(nombres, documentos):
+    # La URL completa va incluida: cada página (?limit, ?cursor) y filtro es una representación distinta
+    partes = [FORMATO, request.full_path] + [f"{n}={documentos.get(n, {}).get('v', 0)}" for n in nombres]
+    return hashlib.sha1("\x1f".join(partes).encode()).hexdigest()[:20]
+
+
+def _ultima_modificacion(documentos):
+    """Last-Modified al segundo, solo si ese segundo ya terminó: una escritura posterior tendrá siempre
+    una fecha mayor y If-Modified-Since no puede confundirla con la versión anterior"""
+    fechas = [doc["updated_at"] for doc in documentos.values() if doc.get("updated_at")]
+    if not fechas:
+        return None
+    segundo = max(fechas).replace(microsecond=0)
+    return segundo if segundo + timedelta(seconds=1) <= datetime.utcnow() else None
+
+
+def _no_modificado(etiqueta, ultima_modificacion):
+    if request.if_none_match:
+        # Si el cliente manda If-None-Match, If-Modified-Since se ignora (RFC 9110)
+        return request.if_none_match.contains_weak(etiqueta)
+    ims = request.if_modified_since
+    return bool(ims and ultima_modificacion and ultima_modificacion <= ims.replace(tzinfo=None))
+
+
+def _cabeceras(respuesta, etiqueta, ultima_modificacion):
+    respuesta.set_etag(etiqueta, weak=True)
+    if ultima_modificacion:
+        respuesta.last_modified = ultima_modificacion
+    # El cliente puede guardar la respuesta pero debe revalidarla en cada consulta
+    respuesta.headers["Cache-Control"] = "no-cache"
+
+
+def respuesta_condicional(db, nombres, construir):
+    """304 si el cliente tiene la versión actual de los recursos `nombres`; si no, construir() con ETag"""
+    documentos = {doc["_id"]: doc for doc in db[COLECCION].find({"_id": {"$in": list(nombres)}})}
+    etiqueta = _etiqueta(nombres, documentos)
+    ultima_modificacion = _ultima_modificacion(documentos)
+
+    if _no_modificado(etiqueta, ultima_modificacion):
+        respuesta = Response(status=304)
+        _cabeceras(respuesta, etiqueta, ultima_modificacion)
+        return respuesta
+
+    respuesta = make_response(construir())
+    if respuesta.status_code == 200:
+        _cabeceras(respuesta, etiqueta, ultima_modificacion)
+    return respuesta
@@ -0,0 +1,216 @@
+"""Utilidades compartidas por los benchmarks: base local con contador de viajes a Mongo y datos sintéticos."""
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+
+# Datos sintéticos: sin ENCRYPTION_KEYS basta una clave temporal
+os.environ.setdefault("ALLOW_TEMP_ENCRYPTION_KEY", "1")
+
+import BackEnd.GlobalInfo.Keys as Colabskey
+from BackEnd import Agenda
+
+# Métodos de Collection que implican (al menos) un viaje de ida y vuelta al servidor
+OPERACIONES = {
+    "find", "find_one", "aggregate", "count_documents", "distinct",
+    "insert_one", "insert_many", "update_one", "update_many", "replace_one",
+    "delete_one", "delete_many", "find_one_and_update", "bulk_write", "create_index"
+}
+
+
+class Contador:
+    """Cuenta viajes a la base y opcionalmente simula la latencia de red de Atlas"""
+
+    def __init__(self, rtt_ms=0.0):
+        self.rtt = rtt_ms / 1000.0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.total = 0
+        self.por_operacion = {}
+
+    def registrar(self, coleccion, operacion):
+        with self._lock:
+            self.total += 1
+            clave = f"{coleccion}.{operacion}"
+            self.por_operacion[clave] = self.por_operacion.get(clave, 0) + 1
+        self._local.viajes = getattr(self._local, "viajes", 0) + 1
+        if self.rtt:
+            time.sleep(self.rtt)
+
+    def viajes_hilo(self):
+        """Viajes hechos por el hilo actual desde el último reinicio_hilo()"""
+        return getattr(self._local, "viajes", 0)
+
+    def reinicio_hilo(self):
+        self._local.viajes = 0
+
+    def reiniciar(self):
+        with self._lock:
+            self.total = 0
+            self.por_operacion = {}
+
+
+class _ColeccionContada:
+    def __init__(self, coleccion, contador):
+        self._coleccion = coleccion
+        self._contador = contador
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._coleccion, nombre)
+        if nombre not in OPERACIONES or not callable(atributo):
+            return atributo
+
+        def envoltura(*args, **kwargs):
+            self._contador.registrar(self._coleccion.name, nombre)
+            return atributo(*args, **kwargs)
+        return envoltura
+
+
+class DBContada:
+    """Envuelve una Database (pymongo o mongomock) contando cada operación por colección"""
+
+    def __init__(self, db, contador):
+        self._db = db
+        self.contador = contador
+
+    def __getitem__(self, nombre):
+        return _ColeccionContada(self._db[nombre], self.contador)
+
+    def command(self, *args, **kwargs):
+        self.contador.registrar("$cmd", "command")
+        return self._db.command(*args, **kwargs)
+
+    def __getattr__(self, nombre):
+        if nombre.startswith("_"):
+            raise AttributeError(nombre)
+        return _ColeccionContada(getattr(self._db, nombre), self.contador)
+
+
+def base_local(rtt_ms=0.0, uri=None):
+    """mongomock en memoria (o un mongod local si se pasa uri), instalado como conexión de la API"""
+    if uri:
+        from pymongo import MongoClient
+        db = MongoClient(uri)[f"{Colabskey.DB_NAME}_bench"]
+        for nombre in db.list_collection_names():
+            db.drop_collection(nombre)
+    else:
+        import mongomock
+        db = mongomock.MongoClient()[Colabskey.DB_NAME]
+
+    contador = Contador(rtt_ms)
+    from BackEnd.Functions import set_db_connection
+    set_db_connection(DBContada(db, contador))
+    return db, contador
+
+
+def sembrar(db, doctores=20, pacientes=100, citas_por_paciente=5, citas_por_doctor=None,
+            legacy_sin_nombre=0.3, semilla=0):
+    """Usuarios, doctores, pacientes y citas con la misma forma que escriben addUser/createAppointment"""
+    rng = random.Random(semilla)
+    ahora = datetime.now()
+    ids_doctores, ids_pacientes = [], []
+
+    for i in range(doctores + pacientes):
+        es_doctor = i < doctores
+        user_id = ObjectId()
+        email = f"{'doc' if es_doctor else 'pac'}{i}@virtualmed.test"
+        rol = "doctor" if es_doctor else "paciente"
+        db.users.insert_one({"_id": user_id, "email": email, "password": "bench", "role": rol,
+                             "fechaRegistro": ahora})
+        perfil = {"email": email, "password": "bench", "role": rol, "nombre": f"Nombre{i}",
+                  "apellidos": f"Apellido{i}", "edad": rng.randint(20, 80), "userId": user_id,
+                  "fechaRegistro": ahora}
+        if es_doctor:
+            perfil.update({"especialidad": rng.choice(["Oncología", "Radiología", "General"]),
+                           "cedula": str(1000 + i)})
+            db.doctors.insert_one(perfil)
+            ids_doctores.append(str(user_id))
+        else:
+            perfil.update({"peso": 70.0, "altura": 1.65})
+            db.patients.insert_one(perfil)
+            ids_pacientes.append(str(user_id))
+
+    citas = []
+    total = citas_por_doctor * doctores if citas_por_doctor else citas_por_paciente * pacientes
+    # En punto: cada cita ocupa exactamente su horario de 30 minutos en la agenda
+    primera = ahora.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    for n in range(total):
+        medico = ids_doctores[n % doctores] if citas_por_doctor else rng.choice(ids_doctores)
+        paciente = rng.choice(ids_pacientes) if citas_por_doctor else ids_pacientes[n % pacientes]
+        inicio = primera + timedelta(minutes=30 * n)
+        cita = {"pacienteId": paciente, "medicoId": medico, "tipoCita": "Consulta",
+                "fechaHoraIso": inicio.isoformat(), "fecha": inicio.strftime("%Y-%m-%d"),
+                "hora": inicio.strftime("%H:%M:%S"), "estado": "pendiente", "fechaCreacion": ahora}
+        cita.update(Agenda.campos_agenda(inicio, 30, cita["estado"]))
+        if rng.random() >= legacy_sin_nombre:
+            cita.update({"nombrePaciente": "Snapshot", "apellidoPaciente": "Paciente", "edadPaciente": 40})
+        citas.append(cita)
+    if citas:
+        db.appointments.insert_many(citas)
+
+    return {"doctores": ids_doctores, "pacientes": ids_pacientes}
+
+
+def sembrar_predicciones(db, n, pacientes=None, semilla=0):
+    """Predicciones con image_url cifrada, como las guarda analyze_complete (lotes de 1000)"""
+    from BackEnd.Cifrado import cifrar_url_imagen
+    rng = random.Random(semilla)
+    ahora = datetime.now()
+    url = cifrar_url_imagen("https://res.cloudinary.com/virtualmed/image/upload/v1/mamografia.png")
+    lote = []
+    for i in range(n):
+        lote.append({"image_url": url, "patient_name": f"Paciente {i}", "patient_age": 50,
+                     "patient_id": rng.choice(pacientes) if pacientes else str(i),
+                     "breast_side": "izquierda", "clinical_notes": "",
+                     "classification": "benigno", "confidence": 0.9, "analysis_date": ahora.isoformat(),
+                     "created_at": ahora - timedelta(seconds=i)})
+        if len(lote) == 1000:
+            db.prediction.insert_many(lote)
+            lote = []
+    if lote:
+        db.prediction.insert_many(lote)
+
+
+class ModeloStub:
+    """Sustituto del modelo para /analyze: misma interfaz que Keras (predict(batch, verbose=0)),
+    resultado determinista por imagen y un costo fijo por lote en lugar de TensorFlow"""
+
+    def __init__(self, ms_por_lote=5.0):
+        self.segundos = ms_por_lote / 1000.0
+        self.size_bytes = 0
+
+    def predict(self, batch, verbose=0):
+        import numpy as np
+        if self.segundos:
+            time.sleep(self.segundos)
+        return batch.reshape(len(batch), -1).mean(axis=1, keepdims=True).astype(np.float32)
+
+
+def instalar_modelo_stub(ms_por_lote=5.0):
+    from BackEnd.ModelRegistry import model_registry
+    model_registry._model = ModeloStub(ms_por_lote)
+    model_registry.version = "stub"
+    model_registry._publicado = (model_registry._model, "stub")
+
+
+def imagenes_sinteticas(n, lado=64, semilla=0):
+    """PNG de ruido (distintos entre sí) para subir a /analyze"""
+    import io
+    import numpy as np
+    from PIL import Image
+    rng = np.random.default_rng(semilla)
+    imagenes = []
+    for _ in range(n):
+        buffer = io.BytesIO()
+        Image.fromarray(rng.integers(0, 256, (lado, lado, 3), dtype=np.uint8)).save(buffer, format="PNG")
+        imagenes.append(buffer.getvalue())
+    return imagenes
+
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
@@ -0,0 +1,8 @@
+"""App WSGI para bench_carga: la API real sobre mongomock con latencia simulada (un mongomock por worker)."""
+import os
+from Benchmarks._comun import base_local, sembrar
+
+db, _ = base_local(float(os.getenv("BENCH_RTT_MS", "5")))
+sembrar(db, doctores=20, pacientes=200, citas_por_paciente=3)
+
+from Directions import app  # noqa: E402
@@ -0,0 +1,109 @@
+"""
+Benchmark de la agenda: horarios disponibles y choques al agendar con miles de citas por doctor.
+
+Uso (desde la carpeta API):
+    python -m Benchmarks.bench_agenda --sizes 1000 5000 --rtt-ms 5
+    python -m Benchmarks.bench_agenda --mongo-uri mongodb://localhost:27017   # mongod local real
+
+"legacy" es lo que haría falta sin los campos normalizados: leer toda la agenda del doctor y parsear
+fecha/hora de cada cita. mongomock no aplica el índice único parcial sobre arreglos, así que el choque
+solo se detecta ahí cuando la cita nueva ocupa exactamente los mismos bloques; con --mongo-uri se
+prueba el índice real.
+"""
+import argparse
+import json
+import time
+from datetime import timedelta
+from Benchmarks._comun import base_local, sembrar
+from BackEnd.Indexes import ensure_indexes
+from BackEnd import Agenda
+import Directions
+import BackEnd.Functions as CallMethod
+
+
+def _legacy_disponibles(db, doctor_id, desde, hasta):
+    """Sin inicio/bloques: toda la agenda del doctor, parseando las cadenas de cada cita"""
+    ocupados = set()
+    for cita in db.appointments.find({"medicoId": doctor_id}, {"fecha": 1, "hora": 1, "fechaHoraIso": 1,
+                                                                "estado": 1}):
+        if not Agenda.ocupa_agenda(cita.get("estado")):
+            continue
+        try:
+            inicio = Agenda.leer_inicio(cita.get("fecha"), cita.get("hora"), cita.get("fechaHoraIso"))
+        except Agenda.FechaInvalida:
+            continue
+        ocupados.update(Agenda.bloques(inicio, inicio + timedelta(minutes=30)))
+    return Agenda.horarios_libres(ocupados, desde, hasta, Agenda.ahora_local())
+
+
+def _medir(contador, fn, repeticiones):
+    contador.reiniciar()
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        resultado = fn()
+    return {
+        "round_trips": contador.total / repeticiones,
+        "latency_ms": (time.perf_counter() - inicio) / repeticiones * 1000
+    }, resultado
+
+
+def _agendar(doctor, paciente, horario):
+    cuerpo = {"medicoId": doctor, "pacienteId": paciente, "tipoCita": "Consulta",
+              "fecha": horario.strftime("%Y-%m-%d"), "hora": horario.strftime("%H:%M:%S")}
+    with Directions.app.test_request_context("/citas", method="POST", json=cuerpo):
+        respuesta = CallMethod.createAppointment()
+    return respuesta[1] if isinstance(respuesta, tuple) else respuesta.status_code
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000],
+                        help="Citas por doctor")
+    parser.add_argument("--days", type=int, default=7, help="Días consultados en horarios disponibles")
+    parser.add_argument("--rtt-ms", type=float, default=5.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--mongo-uri")
+    args = parser.parse_args()
+
+    resultados = []
+    for n in args.sizes:
+        fila = {"appointments_per_doctor": n}
+        db, contador = base_local(args.rtt_ms, args.mongo_uri)
+        ensure_indexes(db)
+        ids = sembrar(db, doctores=2, pacientes=50, citas_por_doctor=n)
+        doctor, paciente = ids["doctores"][0], ids["pacientes"][0]
+        db_contada = CallMethod.get_db_connection()
+
+        desde = Agenda.ahora_local().date()
+        hasta = desde + timedelta(days=args.days - 1)
+        consulta = f"/citas/doctor/{doctor}/disponibles?desde={desde}&hasta={hasta}"
+        with Directions.app.test_request_context(consulta):
+            fila["free_slots_legacy"], legacy = _medir(
+                contador, lambda: _legacy_disponibles(db_contada, doctor, desde, hasta), args.repeat)
+            fila["free_slots_current"], respuesta = _medir(
+                contador, lambda: CallMethod.getHorariosDisponibles(doctor), args.repeat)
+        actuales = respuesta.get_json()["arrHorarios"]
+        fila["free_slots"] = len(actuales)
+        fila["same_result"] = actuales == [h.isoformat() for h in legacy]
+
+        # Agendar en el primer horario libre (200) y repetirlo (409: mismo horario, mismos bloques)
+        if actuales:
+            libre = Agenda.leer_inicio(fecha_hora_iso=actuales[0])
+            contador.reiniciar()
+            inicio = time.perf_counter()
+            estado_libre = _agendar(doctor, paciente, libre)
+            fila["book_free"] = {"status": estado_libre, "round_trips": contador.total,
+                                 "latency_ms": (time.perf_counter() - inicio) * 1000}
+            contador.reiniciar()
+            inicio = time.perf_counter()
+            estado_ocupado = _agendar(doctor, paciente, libre)
+            fila["book_taken"] = {"status": estado_ocupado, "round_trips": contador.total,
+                                  "latency_ms": (time.perf_counter() - inicio) * 1000}
+
+        resultados.append(fila)
+
+    print(json.dumps({"rtt_ms": args.rtt_ms, "days": args.days, "results": resultados}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark de login y registro: viajes a Mongo y latencia, antes y después de db.identities.
+
+Uso (desde la carpeta API):
+    python -m Benchmarks.bench_auth --rtt-ms 20 --repeat 50
+    python -m Benchmarks.bench_auth --mongo-uri mongodb://localhost:27017
+
+"legacy" replica los handlers anteriores (users + perfil en login; tres find_one + dos inserts en registro).
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+from Benchmarks._comun import base_local, sembrar, percentil
+import Directions
+import BackEnd.Functions as CallMethod
+from BackEnd import Identidades
+
+
+def _legacy_login(db, email, password):
+    user_basic = db["users"].find_one({"email": email})
+    if not user_basic or user_basic["password"] != password:
+        return
+    role = user_basic.get("role", "patient")
+    if role in ["medico", "doctor"]:
+        db["doctors"].find_one({"email": email})
+    elif role in ["paciente", "patient"]:
+        db["patients"].find_one({"email": email})
+
+
+def _legacy_registro(db, email):
+    if (db["users"].find_one({"email": email}) or db["doctors"].find_one({"email": email})
+            or db["patients"].find_one({"email": email})):
+        return
+    user_id = db["users"].insert_one({"email": email, "password": "bench", "role": "paciente",
+                                      "fechaRegistro": datetime.now()}).inserted_id
+    db["patients"].insert_one({"email": email, "password": "bench", "role": "paciente", "userId": user_id})
+
+
+def _medir(contador, fn, repeticiones):
+    latencias = []
+    contador.reiniciar()
+    for i in range(repeticiones):
+        inicio = time.perf_counter()
+        fn(i)
+        latencias.append(time.perf_counter() - inicio)
+    return {
+        "round_trips": contador.total / repeticiones,
+        "p50_ms": round(percentil(latencias, 50) * 1000, 2),
+        "p99_ms": round(percentil(latencias, 99) * 1000, 2)
+    }
+
+
+def _login_actual(email):
+    with Directions.app.test_request_context("/login", method="POST", json={"email": email, "password": "bench"}):
+        respuesta = CallMethod.loginUser()
+        assert respuesta.status_code == 200, respuesta.get_json()
+
+
+def _registro_actual(email):
+    with Directions.app.test_request_context("/user", method="POST",
+                                             json={"email": email, "password": "bench", "role": "paciente"}):
+        CallMethod.addUser()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rtt-ms", type=float, default=5.0)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--mongo-uri")
+    args = parser.parse_args()
+
+    db, contador = base_local(args.rtt_ms, args.mongo_uri)
+    ids = sembrar(db, doctores=20, pacientes=200, citas_por_paciente=0)
+    api = CallMethod.get_db_connection()
+    email = lambda i: f"pac{20 + i % len(ids['pacientes'])}@virtualmed.test"
+
+    resultados = {"rtt_ms": args.rtt_ms}
+    resultados["login_legacy"] = _medir(contador, lambda i: _legacy_login(api, email(i), "bench"), args.repeat)
+    resultados["register_legacy"] = _medir(contador, lambda i: _legacy_registro(api, f"legacy{i}@bench.test"),
+                                           args.repeat)
+
+    Identidades.migrar(db)
+    resultados["login_identities"] = _medir(contador, lambda i: _login_actual(email(i)), args.repeat)
+    resultados["register_identities"] = _medir(contador, lambda i: _registro_actual(f"nuevo{i}@bench.test"),
+                                               args.repeat)
+
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Prueba de carga del servidor de producción: req/s y latencia contra número de workers de gunicorn.
+
+Uso (desde la carpeta API):
+    python -m Benchmarks.bench_carga --workers 1 2 4 --threads 4 --duration 10
+    python -m Benchmarks.bench_carga --paths /health "/users?limit=20" --clients 32
+
+Cada corrida arranca gunicorn con gunicorn.conf.py (los mismos hooks post_fork/post_worker_init que en
+producción) sobre Benchmarks._servidor_mock, que usa mongomock con --rtt-ms de latencia por viaje.
+Con --app Directions:app se prueba contra la base configurada en el .env.
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from Benchmarks._comun import percentil
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _esperar(puerto, proceso, segundos=120):
+    limite = time.monotonic() + segundos
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError("gunicorn terminó antes de aceptar conexiones")
+        try:
+            conexion = http.client.HTTPConnection("127.0.0.1", puerto, timeout=2)
+            conexion.request("GET", "/health")
+            if conexion.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("gunicorn no respondió a tiempo")
+
+
+def _cliente(puerto, rutas, fin, latencias, errores, indice):
+    # Una conexión por petición: con keep-alive gunicorn reparte conexiones, no peticiones, y unos
+    # pocos clientes persistentes quedarían pegados a un solo worker
+    n = indice
+    while time.monotonic() < fin:
+        ruta = rutas[n % len(rutas)]
+        n += 1
+        inicio = time.perf_counter()
+        conexion = http.client.HTTPConnection("127.0.0.1", puerto, timeout=30)
+        try:
+            conexion.request("GET", ruta, headers={"Connection": "close"})
+            respuesta = conexion.getresponse()
+            respuesta.read()
+            if respuesta.status >= 500:
+                errores.append(respuesta.status)
+            latencias.append(time.perf_counter() - inicio)
+        except (OSError, http.client.HTTPException):
+            errores.append("conexion")
+        finally:
+            conexion.close()
+
+
+def _correr(args, workers):
+    puerto = _puerto_libre()
+    entorno = dict(os.environ, BENCH_RTT_MS=str(args.rtt_ms), ENSURE_INDEXES="0")
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--workers", str(workers),
+         "--threads", str(args.threads), "--bind", f"127.0.0.1:{puerto}", "--access-logfile", os.devnull,
+         args.app],
+        env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _esperar(puerto, proceso)
+        latencias, errores = [], []
+        fin = time.monotonic() + args.duration
+        hilos = [threading.Thread(target=_cliente, args=(puerto, args.paths, fin, latencias, errores, i))
+                 for i in range(args.clients)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        return {
+            "workers": workers,
+            "threads": args.threads,
+            "requests_per_second": round(len(latencias) / args.duration, 1),
+            "p50_ms": round(percentil(latencias, 50) * 1000, 2) if latencias else None,
+            "p99_ms": round(percentil(latencias, 99) * 1000, 2) if latencias else None,
+            "errors": len(errores)
+        }
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--rtt-ms", type=float, default=5.0)
+    parser.add_argument("--paths", nargs="+", default=["/users?limit=20", "/users/role/doctor?limit=20", "/health"])
+    parser.add_argument("--app", default="Benchmarks._servidor_mock:app")
+    args = parser.parse_args()
+
+    resultados = [_correr(args, w) for w in args.workers]
+    print(json.dumps({"paths": args.paths, "rtt_ms": args.rtt_ms, "clients": args.clients,
+                      "results": resultados}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
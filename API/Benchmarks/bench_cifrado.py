@@ -0,0 +1,70 @@
+"""
+Benchmark del descifrado de image_url: filas por segundo en serie contra el descifrado en lote con hilos.
+
+Uso (desde la carpeta API):
+    python -m Benchmarks.bench_cifrado --rows 5000 --workers 1 2 4 8
+
+"legacy" replica el descifrado anterior (heurística len > 200 y doble base64, una URL a la vez).
+"bulk_*" se mide con la caché de URLs vacía; "cached" es la lectura repetida (polling del dashboard).
+"""
+import argparse
+import base64
+import json
+import time
+import Benchmarks._comun  # noqa: F401  (clave temporal si no hay ENCRYPTION_KEYS)
+import BackEnd.GlobalInfo.Keys as Colabskey
+from BackEnd import Cifrado
+
+URL = "https://res.cloudinary.com/virtualmed/image/upload/v1712345678/mamografias/{}.png"
+
+
+def _legacy(valores):
+    resultado = []
+    for valor in valores:
+        if len(valor) > 200:
+            valor = Cifrado.fernet.decrypt(base64.urlsafe_b64decode(valor.encode())).decode()
+        resultado.append(valor)
+    return resultado
+
+
+def _filas_por_segundo(fn, valores, repeticiones, cache_fria=True):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        if cache_fria:
+            Cifrado._cache_urls.clear()
+        inicio = time.perf_counter()
+        fn(valores)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return round(len(valores) / mejor)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    tokens = [Cifrado.fernet.encrypt(URL.format(i).encode()) for i in range(args.rows)]
+    legacy = [base64.urlsafe_b64encode(t).decode() for t in tokens]
+    actuales = [Cifrado.MARCADOR + t.decode() for t in tokens]
+
+    resultados = {"rows": args.rows, "legacy_rows_per_second": _filas_por_segundo(_legacy, legacy, args.repeat)}
+    for workers in args.workers:
+        Colabskey.DECRYPT_WORKERS = workers
+        if Cifrado._pool:
+            Cifrado._pool.shutdown()
+            Cifrado._pool = None
+        resultados[f"bulk_{workers}_workers_rows_per_second"] = _filas_por_segundo(
+            Cifrado.descifrar_urls, actuales, args.repeat)
+
+    Cifrado.descifrar_urls(actuales)
+    resultados["cached_rows_per_second"] = _filas_por_segundo(
+        Cifrado.descifrar_urls, actuales, args.repeat, cache_fria=False)
+    resultados["decrypted_url_cache"] = Cifrado.estadisticas_cache()
+
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark de los endpoints de citas: viajes a Mongo y latencia contra número de citas.
+
+Uso (desde la carpeta API):
+    python -m Benchmarks.bench_citas --rtt-ms 20 --sizes 1 10 50 200
+    python -m Benchmarks.bench_citas --mongo-uri mongodb://localhost:27017   # mongod local real
+
+--rtt-ms simula la latencia de red hacia Atlas en cada viaje sobre mongomock.
+"""
+import argparse
+import json
+import time
+from bson import ObjectId
+from Benchmarks._comun import base_local, sembrar
+import Directions
+import BackEnd.Functions as CallMethod
+
+
+def _legacy_citas_usuario(db, user_id):
+    """Réplica del getCitasByUserId anterior: hasta 3 find_one por cita"""
+    for cita in list(db.appointments.find({"pacienteId": user_id})):
+        if "medicoId" in cita:
+            try:
+                doc = db.doctors.find_one({"id": cita["medicoId"]})
+                if not doc:
+                    doc = db.doctors.find_one({"userId": ObjectId(cita["medicoId"])})
+                if not doc:
+                    doc = db.doctors.find_one({"_id": ObjectId(cita["medicoId"])})
+            except Exception:
+                pass
+
+
+def _legacy_agenda_doctor(db, doctor_id):
+    """Réplica del getCitasByDoctorId anterior: users y luego patients por cada cita sin snapshot"""
+    for cita in list(db.appointments.find({"medicoId": doctor_id})):
+        nombre = f"{cita.get('nombrePaciente', '')} {cita.get('apellidoPaciente', '')}".strip()
+        if not nombre and "pacienteId" in cita:
+            try:
+                paciente = db.users.find_one({"_id": ObjectId(cita["pacienteId"])})
+                if not paciente:
+                    db.patients.find_one({"userId": ObjectId(cita["pacienteId"])})
+            except Exception:
+                pass
+
+
+def _medir(contador, fn, repeticiones):
+    contador.reiniciar()
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        fn()
+    return {
+        "round_trips": contador.total / repeticiones,
+        "latency_ms": (time.perf_counter() - inicio) / repeticiones * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 50, 200])
+    parser.add_argument("--rtt-ms", type=float, default=5.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--mongo-uri")
+    args = parser.parse_args()
+
+    resultados = []
+    for n in args.sizes:
+        fila = {"appointments": n}
+
+        # Paciente con n citas repartidas entre 10 doctores
+        db, contador = base_local(args.rtt_ms, args.mongo_uri)
+        paciente = sembrar(db, doctores=10, pacientes=1, citas_por_paciente=n)["pacientes"][0]
+        db_contada = CallMethod.get_db_connection()
+        with Directions.app.test_request_context():
+            fila["patient_legacy"] = _medir(contador, lambda: _legacy_citas_usuario(db_contada, paciente), args.repeat)
+            fila["patient_current"] = _medir(contador, lambda: CallMethod.getCitasByUserId(paciente), args.repeat)
+
+        # Doctor con n citas, 30% sin snapshot del paciente (citas antiguas)
+        db, contador = base_local(args.rtt_ms, args.mongo_uri)
+        doctor = sembrar(db, doctores=1, pacientes=50, citas_por_doctor=n)["doctores"][0]
+        db_contada = CallMethod.get_db_connection()
+        with Directions.app.test_request_context():
+            fila["doctor_legacy"] = _medir(contador, lambda: _legacy_agenda_doctor(db_contada, doctor), args.repeat)
+            fila["doctor_current"] = _medir(contador, lambda: CallMethod.getCitasByDoctorId(doctor), args.repeat)
+
+        resultados.append(fila)
+
+    print(json.dumps({"rtt_ms": args.rtt_ms, "results": resultados}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark de la exportación de predicciones: memoria pico del listado completo contra el streaming.
+
+Uso (desde la carpeta API):
+    python -m Benchmarks.bench_export --sizes 1000 10000 50000
+    python -m Benchmarks.bench_export --format ndjson --mongo-uri mongodb://localhost:27017
+
+La memoria se mide con tracemalloc (asignaciones de Python) mientras se consume la respuesta completa.
+mongomock materializa el resultado ordenado al abrir el cursor, así que "cursor_only" (solo recorrer
+el cursor) es el piso de esa base; el streaming debe quedar cerca de ese piso. Contra un mongod real
+el cursor solo guarda un lote y el pico del streaming se mantiene plano aunque crezca la colección.
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from flask import jsonify
+from Benchmarks._comun import base_local, sembrar_predicciones
+import Directions
+import BackEnd.Functions as CallMethod
+
+
+def _legacy_export(db):
+    """Réplica del getAllPredictions anterior: lista completa descifrada y luego jsonify"""
+    predictions = list(db.prediction.find().sort('created_at', -1))
+    for prediction in predictions:
+        prediction['_id'] = str(prediction['_id'])
+        prediction['image_url'] = CallMethod.descifrar_url_imagen(prediction['image_url'])
+    return jsonify(predictions)
+
+
+def _solo_cursor(db):
+    for _ in db.prediction.find({}, CallMethod.CAMPOS_PREDICCION).sort([('created_at', -1), ('_id', -1)]):
+        pass
+    return jsonify([])
+
+
+def _medir(fn):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    respuesta = fn()
+    total = sum(len(fragmento) for fragmento in respuesta.response)
+    segundos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"peak_mb": round(pico / 2**20, 2), "seconds": round(segundos, 3), "bytes": total}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--format", choices=["json", "ndjson"], default="json")
+    parser.add_argument("--mongo-uri")
+    args = parser.parse_args()
+
+    resultados = []
+    for n in args.sizes:
+        db, _ = base_local(uri=args.mongo_uri)
+        sembrar_predicciones(db, n)
+        db_api = CallMethod.get_db_connection()
+        fila = {"predictions": n}
+        with Directions.app.test_request_context(f"/predictions/export?format={args.format}"):
+            fila["cursor_only"] = _medir(lambda: _solo_cursor(db_api))
+            fila["legacy"] = _medir(lambda: _legacy_export(db_api))
+            fila["streaming"] = _medir(CallMethod.exportPredictions)
+        resultados.append(fila)
+
+    print(json.dumps({"format": args.format, "results": resultados}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark del preprocesamiento de imágenes: ruta anterior (float64) vs BackEnd.Preprocessing.
+
+Uso (desde la carpeta API):
+    python -m Benchmarks.bench_preprocessing --images 64 --width 2048 --height 1536
+
+Cada modo corre en su propio subproceso para que el pico de RSS no se contamine entre ellos.
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from PIL import Image
+
+
+def _imagenes_sinteticas(n, width, height):
+    """JPEGs con ruido + gradiente, parecidos en tamaño a una mamografía exportada"""
+    rng = np.random.default_rng(0)
+    gradiente = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    imagenes = []
+    for _ in range(n):
+        ruido = rng.normal(0, 20, (height, width, 1)).astype(np.float32)
+        pixeles = np.clip(gradiente + ruido, 0, 255).astype(np.uint8).repeat(3, axis=2)
+        buf = io.BytesIO()
+        Image.fromarray(pixeles).save(buf, "JPEG", quality=90)
+        imagenes.append(buf.getvalue())
+    return imagenes
+
+
+def _legacy(imagenes):
+    """Copia de la ruta original de analyze_complete(), una imagen a la vez"""
+    arrays = []
+    for datos in imagenes:
+        img = Image.open(io.BytesIO(datos)).convert("RGB")
+        img = img.resize((227, 227))
+        img_array = np.array(img) / 255.0
+        arrays.append(np.expand_dims(img_array, axis=0))
+    return np.concatenate(arrays)
+
+
+def _nuevo(imagenes):
+    from BackEnd.Preprocessing import preprocess_batch
+    return preprocess_batch(imagenes)
+
+
+def _pico_rss_bytes():
+    # VmHWM se reinicia con exec(); ru_maxrss en cambio hereda el pico del proceso padre
+    try:
+        with open("/proc/self/status") as f:
+            for linea in f:
+                if linea.startswith("VmHWM:"):
+                    return int(linea.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _correr_modo(modo, carpeta, repeticiones):
+    imagenes = []
+    for nombre in sorted(os.listdir(carpeta)):
+        with open(os.path.join(carpeta, nombre), "rb") as f:
+            imagenes.append(f.read())
+    n = len(imagenes)
+    fn = _legacy if modo == "legacy" else _nuevo
+    fn(imagenes[:1])  # Calentamiento (imports, tablas de libjpeg)
+
+    rss_base = _pico_rss_bytes()
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        batch = fn(imagenes)
+    segundos = time.perf_counter() - inicio
+
+    return {
+        "mode": modo,
+        "images_per_second": n * repeticiones / segundos,
+        "peak_rss_bytes": _pico_rss_bytes(),
+        "peak_rss_growth_bytes": _pico_rss_bytes() - rss_base,
+        "batch_dtype": str(batch.dtype),
+        "batch_bytes": int(batch.nbytes)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=32)
+    parser.add_argument("--width", type=int, default=2048)
+    parser.add_argument("--height", type=int, default=1536)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--mode", choices=["legacy", "nuevo"], help=argparse.SUPPRESS)
+    parser.add_argument("--dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(_correr_modo(args.mode, args.dir, args.repeat)))
+        return
+
+    # Las imágenes se generan aquí y se leen de disco en cada subproceso,
+    # así el pico de RSS medido corresponde solo al preprocesamiento
+    resultados = {}
+    with tempfile.TemporaryDirectory() as carpeta:
+        for i, datos in enumerate(_imagenes_sinteticas(args.images, args.width, args.height)):
+            with open(os.path.join(carpeta, f"{i:05d}.jpg"), "wb") as f:
+                f.write(datos)
+
+        for modo in ("legacy", "nuevo"):
+            salida = subprocess.run(
+                [sys.executable, "-m", "Benchmarks.bench_preprocessing", "--mode", modo,
+                 "--dir", carpeta, "--repeat", str(args.repeat)],
+                check=True, capture_output=True, text=True
+            ).stdout
+            resultados[modo] = json.loads(salida.strip().splitlines()[-1])
+
+    resultados["speedup"] = resultados["nuevo"]["images_per_second"] / resultados["legacy"]["images_per_second"]
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark de arranque: cuánto cuesta importar la API y qué módulos pesados arrastra.
+
+Uso (desde la carpeta API):
+    python -m Benchmarks.bench_startup
+    python -m Benchmarks.bench_startup --max-import-seconds 1.5   # falla si hay regresión
+
+Mide, en subprocesos limpios:
+  * importar Directions (lo que paga cada worker de /login, /users, /citas),
+  * importar BackEnd.Analysis (lo que paga la primera petición a /analyze),
+  * si tensorflow / numpy / PIL quedaron cargados después de cada paso,
+  * los módulos más caros según `python -X importtime`.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+PESADOS = ("tensorflow", "keras", "numpy", "PIL")
+
+# Los procesos hijos importan Directions: sin ENCRYPTION_KEYS basta una clave temporal
+os.environ.setdefault("ALLOW_TEMP_ENCRYPTION_KEY", "1")
+
+# Carpeta API (la de Directions.py) y el .env de la API
+RAIZ_API = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUTA_ENV = os.path.join(RAIZ_API, "BackEnd", ".env")
+
+# Con `python -c` no hay __main__.__file__ y load_dotenv() de Keys.py solo busca en el cwd:
+# el .env se carga explícitamente antes de importar (Keys no pisa variables ya definidas)
+_CARGAR_ENV = f"from dotenv import load_dotenv\nload_dotenv({RUTA_ENV!r})\n"
+
+_SONDA = r"""
+import json, sys, time
+def rss():
+    try:
+        with open("/proc/self/status") as f:
+            for linea in f:
+                if linea.startswith("VmRSS:"):
+                    return int(linea.split()[1]) * 1024
+    except OSError:
+        return None
+inicio = time.perf_counter()
+import Directions
+app_s = time.perf_counter() - inicio
+app_rss = rss()
+app_mods = {m: m in sys.modules for m in PESADOS}
+inicio = time.perf_counter()
+import BackEnd.Analysis
+analysis_s = time.perf_counter() - inicio
+print(json.dumps({
+    "import_app_seconds": app_s,
+    "import_app_rss_bytes": app_rss,
+    "heavy_modules_after_app": app_mods,
+    "import_analysis_seconds": analysis_s,
+    "import_analysis_rss_bytes": rss(),
+    "heavy_modules_after_analysis": {m: m in sys.modules for m in PESADOS},
+}))
+"""
+
+
+def _python(*args, check=False):
+    """Corre python en un directorio temporal vacío con la carpeta API en PYTHONPATH: no deja archivos
+    en el código fuente y no depende del cwd de quien lanza el benchmark"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [RAIZ_API, os.environ.get("PYTHONPATH")])))
+    with tempfile.TemporaryDirectory(prefix="bench_startup_") as carpeta:
+        return subprocess.run([sys.executable, *args], cwd=carpeta, env=env, check=check,
+                              capture_output=True, text=True)
+
+
+def _correr_sonda():
+    salida = _python("-c", f"{_CARGAR_ENV}PESADOS = {PESADOS!r}\n{_SONDA}", check=True).stdout
+    return json.loads(salida.strip().splitlines()[-1])
+
+
+def _importtime(top):
+    """Top de módulos por tiempo acumulado al importar Directions"""
+    proceso = _python("-X", "importtime", "-c", f"{_CARGAR_ENV}import Directions")
+    filas = []
+    for linea in proceso.stderr.splitlines():
+        m = re.match(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s+(.*)$", linea)
+        if m:
+            filas.append((int(m.group(2)), m.group(3).strip()))
+    filas.sort(reverse=True)
+    return [{"module": nombre, "cumulative_ms": us / 1000} for us, nombre in filas[:top]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--max-import-seconds", type=float,
+                        help="Falla con código 1 si importar Directions tarda más que esto (mediana)")
+    args = parser.parse_args()
+
+    corridas = [_correr_sonda() for _ in range(args.runs)]
+    corridas.sort(key=lambda c: c["import_app_seconds"])
+    mediana = corridas[len(corridas) // 2]
+
+    reporte = dict(mediana)
+    reporte["runs"] = args.runs
+    reporte["importtime_top"] = _importtime(args.top)
+    print(json.dumps(reporte, indent=2))
+
+    errores = []
+    if reporte["heavy_modules_after_app"].get("tensorflow"):
+        errores.append("tensorflow se importa al arrancar la API")
+    if args.max_import_seconds is not None and reporte["import_app_seconds"] > args.max_import_seconds:
+        errores.append(f"importar Directions tardó {reporte['import_app_seconds']:.2f}s "
+                       f"(> {args.max_import_seconds}s)")
+    if errores:
+        for error in errores:
+            print(f"❌ {error}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
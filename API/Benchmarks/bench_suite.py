@@ -0,0 +1,307 @@
+"""
+Suite de carga reproducible y sin red: la app de Directions.py sobre una base local con datos
+sintéticos y un modelo stub, con una línea base JSON que CI puede comparar.
+
+Uso (desde la carpeta API):
+    python -m Benchmarks.bench_suite --out Benchmarks/baseline.json
+    python -m Benchmarks.bench_suite --compare Benchmarks/baseline.json --tolerance 0.25
+    python -m Benchmarks.bench_suite --mix doctores --clients 16 --requests 5000 --scale 5
+    python -m Benchmarks.bench_suite --mix login=50,citas_doctor=50 --mongo-uri mongodb://localhost:27017
+
+Los clientes se comportan como la caché HTTP de la app: repiten cada GET con If-None-Match y el
+último ETag recibido (--no-conditional lo desactiva), así que los 304 cuentan en la latencia, los
+bytes y los viajes a Mongo de cada endpoint.
+
+La app corre en un servidor werkzeug con hilos dentro de este proceso y los clientes usan HTTP con
+keep-alive. La base es mongomock (o un mongod local con --mongo-uri) sembrada con --scale veces
+20 doctores, 200 pacientes, 5 citas por paciente y 1000 predicciones, con --rtt-ms de latencia por
+viaje. /analyze usa ModeloStub (--model-ms por lote) sobre --images PNG sintéticos distintos.
+
+El plan de peticiones sale de --seed, así que dos corridas hacen exactamente las mismas peticiones.
+Los viajes a Mongo por endpoint son deterministas y se comparan exactos con --compare; la latencia y
+el throughput se comparan con --tolerance (en runners ruidosos, --ignore-latency).
+"""
+import os
+
+# Todo en este proceso: sin pool de inferencia (cargaría el modelo real) ni caché de predicciones en Mongo
+os.environ["INFERENCE_WORKERS"] = "0"
+os.environ["PREDICTION_CACHE_MONGO"] = "0"
+
+import argparse
+import http.client
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from flask import request
+from werkzeug.serving import make_server
+from Benchmarks._comun import (base_local, sembrar, sembrar_predicciones, instalar_modelo_stub,
+                               imagenes_sinteticas, percentil)
+from BackEnd import Identidades
+import Directions
+
+MEZCLAS = {
+    "mixto": {"login": 30, "citas_usuario": 35, "citas_doctor": 25, "analyze": 10},
+    "pacientes": {"login": 40, "citas_usuario": 60},
+    "doctores": {"login": 15, "citas_doctor": 60, "analyze": 25},
+    "perfiles": {"perfil": 70, "citas_usuario": 30},
+    # La app consultando listados periódicamente mientras llegan análisis nuevos
+    "polling": {"citas_doctor": 40, "predicciones": 30, "lista_doctores": 25, "analyze": 5},
+}
+
+# Plantilla de ruta de Flask de cada endpoint (para contar viajes a Mongo por petición)
+REGLAS = {
+    "login": "/login",
+    "citas_usuario": "/users/<user_id>/citas",
+    "citas_doctor": "/citas/doctor/<doctor_id>",
+    "analyze": "/analyze",
+    "perfil": "/user/<user_id>",
+    "predicciones": "/predictions",
+    "lista_doctores": "/users/role/<role>",
+}
+
+
+def _leer_mezcla(texto):
+    if texto in MEZCLAS:
+        return MEZCLAS[texto]
+    mezcla = {}
+    for parte in texto.split(","):
+        nombre, _, peso = parte.partition("=")
+        if nombre not in REGLAS:
+            raise SystemExit(f"Endpoint desconocido en --mix: {nombre} (opciones: {', '.join(REGLAS)})")
+        mezcla[nombre] = float(peso or 1)
+    return mezcla
+
+
+def _multipart(campos, imagen):
+    frontera = uuid.uuid4().hex
+    partes = []
+    for nombre, valor in campos.items():
+        partes.append(f'--{frontera}\r\nContent-Disposition: form-data; name="{nombre}"\r\n\r\n{valor}\r\n'.encode())
+    partes.append(f'--{frontera}\r\nContent-Disposition: form-data; name="image"; filename="estudio.png"\r\n'
+                  f'Content-Type: image/png\r\n\r\n'.encode() + imagen + b"\r\n")
+    partes.append(f"--{frontera}--\r\n".encode())
+    return b"".join(partes), f"multipart/form-data; boundary={frontera}"
+
+
+def _peticion(nombre, rng, datos, imagenes):
+    """(método, ruta, cuerpo, headers) de una petición del endpoint"""
+    if nombre == "login":
+        email = rng.choice(datos["emails"])
+        cuerpo = json.dumps({"email": email, "password": "bench"}).encode()
+        return "POST", "/login", cuerpo, {"Content-Type": "application/json"}
+    if nombre == "citas_usuario":
+        return "GET", f"/users/{rng.choice(datos['pacientes'])}/citas", None, {}
+    if nombre == "citas_doctor":
+        return "GET", f"/citas/doctor/{rng.choice(datos['doctores'])}", None, {}
+    if nombre == "predicciones":
+        return "GET", "/predictions?limit=50", None, {}
+    if nombre == "lista_doctores":
+        return "GET", "/users/role/doctor?limit=50", None, {}
+    if nombre == "perfil":
+        return "GET", f"/user/{rng.choice(datos['pacientes'] + datos['doctores'])}", None, {}
+    paciente = rng.choice(datos["pacientes"])
+    cuerpo, tipo = _multipart({"image_url": "https://res.cloudinary.com/virtualmed/image/upload/v1/bench.png",
+                               "patient_name": "Paciente Bench", "patient_age": "50", "patient_id": paciente,
+                               "breast_side": rng.choice(["izquierda", "derecha"])},
+                              rng.choice(imagenes))
+    return "POST", "/analyze", cuerpo, {"Content-Type": tipo}
+
+
+def _plan(mezcla, n, semilla, datos, imagenes):
+    rng = random.Random(semilla)
+    nombres = list(mezcla)
+    pesos = [mezcla[nombre] for nombre in nombres]
+    return [(nombre, _peticion(nombre, rng, datos, imagenes))
+            for nombre in rng.choices(nombres, weights=pesos, k=n)]
+
+
+class _ViajesPorRuta:
+    """Hooks en la app: viajes a Mongo de cada petición (el servidor atiende cada una en un solo hilo)"""
+
+    def __init__(self, app, contador):
+        self.contador = contador
+        self.por_regla = {}
+        self._lock = threading.Lock()
+        app.before_request(self._inicio)
+        app.teardown_request(self._fin)
+
+    def _inicio(self):
+        self.contador.reinicio_hilo()
+
+    def _fin(self, error=None):
+        regla = request.url_rule.rule if request.url_rule is not None else None
+        with self._lock:
+            self.por_regla.setdefault(regla, []).append(self.contador.viajes_hilo())
+
+    def reiniciar(self):
+        with self._lock:
+            self.por_regla = {}
+
+
+def _cliente(puerto, peticiones, resultados, condicional):
+    conexion = http.client.HTTPConnection("127.0.0.1", puerto, timeout=60)
+    # Como la caché HTTP del navegador/Ionic: revalida cada GET con el último ETag recibido
+    etags = {}
+    try:
+        for nombre, (metodo, ruta, cuerpo, headers) in peticiones:
+            if condicional and metodo == "GET" and ruta in etags:
+                headers = dict(headers, **{"If-None-Match": etags[ruta]})
+            inicio = time.perf_counter()
+            recibidos = 0
+            try:
+                conexion.request(metodo, ruta, body=cuerpo, headers=headers)
+                respuesta = conexion.getresponse()
+                recibidos = len(respuesta.read())
+                estado = respuesta.status
+                if respuesta.getheader("ETag"):
+                    etags[ruta] = respuesta.getheader("ETag")
+            except (OSError, http.client.HTTPException):
+                conexion.close()
+                conexion = http.client.HTTPConnection("127.0.0.1", puerto, timeout=60)
+                estado = None
+            resultados.append((nombre, time.perf_counter() - inicio, estado, recibidos))
+    finally:
+        conexion.close()
+
+
+def _correr_plan(puerto, plan, clientes, condicional=True):
+    # Cada cliente recibe su parte fija del plan: qué GET revalida con ETag (y cuántos viajes a Mongo
+    # hace) no depende del orden en que el sistema operativo reparta los hilos
+    resultados = []
+    hilos = [threading.Thread(target=_cliente, args=(puerto, plan[i::clientes], resultados, condicional))
+             for i in range(clientes)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return resultados, time.perf_counter() - inicio
+
+
+def _ms(segundos):
+    return round(segundos * 1000, 2) if segundos is not None else None
+
+
+def _resumen(latencias):
+    return {"p50_ms": _ms(percentil(latencias, 50)), "p95_ms": _ms(percentil(latencias, 95)),
+            "p99_ms": _ms(percentil(latencias, 99))}
+
+
+def _reporte(args, mezcla, resultados, segundos, viajes):
+    endpoints = {}
+    for nombre in sorted(mezcla):
+        propios = [r for r in resultados if r[0] == nombre]
+        latencias = [r[1] for r in propios]
+        por_peticion = viajes.get(REGLAS[nombre], [])
+        endpoints[nombre] = dict(
+            requests=len(propios),
+            errors=sum(1 for r in propios if r[2] is None or r[2] >= 400),
+            not_modified=sum(1 for r in propios if r[2] == 304),
+            bytes_per_request=round(sum(r[3] for r in propios) / len(propios), 1) if propios else None,
+            **_resumen(latencias),
+            db_round_trips=round(sum(por_peticion) / len(por_peticion), 3) if por_peticion else None
+        )
+    return {
+        "config": {"mix": mezcla, "requests": args.requests, "clients": args.clients, "scale": args.scale,
+                   "rtt_ms": args.rtt_ms, "model_ms": args.model_ms, "images": args.images, "seed": args.seed,
+                   "conditional": not args.no_conditional,
+                   "backend": "mongod" if args.mongo_uri else "mongomock"},
+        "total": dict(requests=len(resultados),
+                      errors=sum(1 for r in resultados if r[2] is None or r[2] >= 400),
+                      seconds=round(segundos, 3),
+                      requests_per_second=round(len(resultados) / segundos, 1) if segundos else None,
+                      **_resumen([r[1] for r in resultados])),
+        "endpoints": endpoints
+    }
+
+
+def comparar(actual, base, tolerancia, ignorar_latencia=False):
+    """Lista de regresiones de actual contra base (vacía si no hay)"""
+    regresiones = []
+    for nombre, fila in actual["endpoints"].items():
+        anterior = base.get("endpoints", {}).get(nombre)
+        if not anterior:
+            continue
+        if (fila["db_round_trips"] is not None and anterior.get("db_round_trips") is not None
+                and fila["db_round_trips"] > anterior["db_round_trips"] + 1e-9):
+            regresiones.append(f"{nombre}: viajes a Mongo {anterior['db_round_trips']} -> {fila['db_round_trips']}")
+        if fila["errors"] > anterior.get("errors", 0):
+            regresiones.append(f"{nombre}: errores {anterior.get('errors', 0)} -> {fila['errors']}")
+        if not ignorar_latencia and anterior.get("p95_ms") and fila["p95_ms"] > anterior["p95_ms"] * (1 + tolerancia):
+            regresiones.append(f"{nombre}: p95 {anterior['p95_ms']} ms -> {fila['p95_ms']} ms")
+    rps, rps_base = actual["total"]["requests_per_second"], base.get("total", {}).get("requests_per_second")
+    if not ignorar_latencia and rps_base and rps < rps_base * (1 - tolerancia):
+        regresiones.append(f"throughput {rps_base} -> {rps} req/s")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mix", default="mixto",
+                        help=f"{', '.join(MEZCLAS)} o pesos por endpoint (login=40,citas_usuario=60; "
+                             f"endpoints: {', '.join(REGLAS)})")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--rtt-ms", type=float, default=2.0)
+    parser.add_argument("--model-ms", type=float, default=5.0)
+    parser.add_argument("--images", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mongo-uri")
+    parser.add_argument("--no-conditional", action="store_true",
+                        help="Los clientes no envían If-None-Match (sin caché HTTP)")
+    parser.add_argument("--out", help="Guarda el reporte JSON (línea base)")
+    parser.add_argument("--compare", help="Línea base contra la que comparar; código 1 si hay regresión")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--ignore-latency", action="store_true",
+                        help="Con --compare, solo viajes a Mongo y errores")
+    args = parser.parse_args()
+    mezcla = _leer_mezcla(args.mix)
+
+    db, contador = base_local(args.rtt_ms, args.mongo_uri)
+    ids = sembrar(db, doctores=max(1, int(20 * args.scale)), pacientes=max(1, int(200 * args.scale)),
+                  citas_por_paciente=5, semilla=args.seed)
+    sembrar_predicciones(db, int(1000 * args.scale), pacientes=ids["pacientes"], semilla=args.seed)
+    Identidades.migrar(db)
+    instalar_modelo_stub(args.model_ms)
+    datos = dict(ids, emails=[u["email"] for u in db.users.find({}, {"email": 1})])
+    imagenes = imagenes_sinteticas(args.images, semilla=args.seed)
+
+    viajes = _ViajesPorRuta(Directions.app, contador)
+    servidor = make_server("127.0.0.1", 0, Directions.app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    try:
+        # Calentamiento con otra semilla: conexiones, caches de proceso e imports perezosos (/analyze)
+        # (con sus propias imágenes, para no llenar la caché de predicciones de la corrida medida)
+        _correr_plan(servidor.server_port,
+                     _plan(mezcla, args.warmup, args.seed + 1, datos, imagenes_sinteticas(4, semilla=args.seed + 1)),
+                     args.clients, not args.no_conditional)
+        viajes.reiniciar()
+        resultados, segundos = _correr_plan(servidor.server_port,
+                                            _plan(mezcla, args.requests, args.seed, datos, imagenes),
+                                            args.clients, not args.no_conditional)
+    finally:
+        servidor.shutdown()
+
+    reporte = _reporte(args, mezcla, resultados, segundos, viajes.por_regla)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            base = json.load(f)
+        reporte["regressions"] = comparar(reporte, base, args.tolerance, args.ignore_latency)
+
+    print(json.dumps(reporte, indent=2, ensure_ascii=False))
+    if reporte.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
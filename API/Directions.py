@@ -1,14 +1,26 @@
+import os
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 import BackEnd.Functions as CallMethod
+import BackEnd.Health as Health
+import BackEnd.Metrics as Metrics
+import BackEnd.GlobalInfo.Keys as Colabskey
 
 app = Flask(__name__)
-CORS(app)
+# X-Next-Cursor: cursor de la siguiente página en /predictions; ETag/Last-Modified: GET condicionales
+CORS(app, expose_headers=["X-Next-Cursor", "ETag", "Last-Modified"])
+if Colabskey.METRICS_ENABLED:
+    Metrics.instrumentar_flask(app)
 
 @app.route('/users', methods=['GET'])
 def get_users():
     return CallMethod.getAllUsers()
 
+# Exportación completa en streaming (?format=json|ndjson)
+@app.route('/users/export', methods=['GET'])
+def export_users():
+    return CallMethod.exportUsers()
+
 @app.route('/user', methods=['POST'])
 def create_user():
     return CallMethod.addUser()
@@ -41,16 +53,66 @@ def delete_user(user_id):
 def health_check():
     return jsonify({"status": "healthy", "message": "Servidor funcionando correctamente"})
 
+# Liveness: el proceso responde (sin tocar Mongo ni el modelo)
+@app.route('/health/live', methods=['GET'])
+def health_live():
+    return Health.liveness()
+
+# Readiness: ping a Mongo y modelo cargado (resultado cacheado READY_CACHE_SECONDS); 503 si no está listo
+@app.route('/health/ready', methods=['GET'])
+def health_ready():
+    return Health.readiness()
+
+# Métricas Prometheus del proceso: latencia por ruta, Mongo por petición y fases de /analyze
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    if not Colabskey.METRICS_ENABLED:
+        return jsonify({"error": "Métricas deshabilitadas"}), 404
+    return Metrics.respuesta()
+
 # ENDPOINT PRINCIPAL - TODO EN UNO
 @app.route('/analyze', methods=['POST'])
 def analyze():
     return CallMethod.analyze_complete()
 
+# Estudio completo (varias vistas) en una sola petición
+@app.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    return CallMethod.analyze_batch()
+
+# Estado del modelo: tiempo de carga, memoria y recargas
+@app.route('/model/status', methods=['GET'])
+def model_status():
+    return CallMethod.getModelStatus()
+
+# Métricas de la caché de URLs descifradas
+@app.route('/crypto/status', methods=['GET'])
+def crypto_status():
+    return CallMethod.getCryptoStatus()
+
+# Re-cifrado de predicciones con la clave primaria (requiere X-Admin-Token)
+@app.route('/admin/reencrypt', methods=['POST'])
+def start_reencrypt():
+    return CallMethod.startReencryption()
+
+@app.route('/admin/reencrypt', methods=['GET'])
+def reencrypt_status():
+    return CallMethod.getReencryptionStatus()
+
+@app.route('/admin/reencrypt', methods=['DELETE'])
+def stop_reencrypt():
+    return CallMethod.stopReencryption()
+
 # Solo mantener para consultar el historial
 @app.route('/predictions', methods=['GET'])
 def get_predictions():
     return CallMethod.getAllPredictions()
 
+# Exportación completa para auditorías (?format=json|ndjson)
+@app.route('/predictions/export', methods=['GET'])
+def export_predictions():
+    return CallMethod.exportPredictions()
+
 @app.route('/predictions/<prediction_id>', methods=['GET'])
 def get_prediction(prediction_id):
     return CallMethod.getPredictionById(prediction_id)
@@ -72,6 +134,11 @@ def get_citas_by_user(user_id):
 def get_citas_doctor_route(doctor_id):
     return CallMethod.getCitasByDoctorId(doctor_id)
 
+# Horarios libres del doctor (?desde=YYYY-MM-DD&hasta=YYYY-MM-DD)
+@app.route('/citas/doctor/<doctor_id>/disponibles', methods=['GET'])
+def get_horarios_disponibles_route(doctor_id):
+    return CallMethod.getHorariosDisponibles(doctor_id)
+
 # Ruta para cambiar el estado (Confirmar/Rechazar)
 @app.route('/citas/<cita_id>/status', methods=['PUT'])
 def update_cita_status_route(cita_id):
@@ -81,4 +148,11 @@ def update_cita_status_route(cita_id):
 
 if __name__ == '__main__':
     print("Iniciando servidor Flask...")
-    app.run(port=3000, debug=True)
\ No newline at end of file
+    debug = True
+    # Con debug, el reloader de Werkzeug ejecuta este bloque dos veces: en el proceso vigilante (que no
+    # atiende peticiones) y en el hijo que sirve (WERKZEUG_RUN_MAIN=true). Solo el segundo carga el modelo
+    if (Colabskey.PRELOAD_MODEL or Colabskey.INFERENCE_WORKERS > 0) and (
+            not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true"):
+        from BackEnd import Analysis
+        Analysis.precargar()
+    app.run(port=3000, debug=debug)
\ No newline at end of file
@@ -0,0 +1,52 @@
+"""
+Rellena inicio/fin/bloques/activa de las citas existentes y crea los índices de la agenda.
+
+Uso (desde la carpeta API):
+    python -m Tools.agenda [--batch-size 500]
+    python -m Tools.agenda --recompute     # recalcula todas las citas (p. ej. si cambió BLOQUE_MINUTOS)
+
+Solo toca las citas sin bloques, así que se puede interrumpir y volver a correr. Si hay citas activas
+del mismo doctor que se traslapan, el índice único no se puede crear: se listan para cancelarlas o
+moverlas y se vuelve a correr el comando. Termina con código 1 mientras existan.
+"""
+import argparse
+import sys
+import BackEnd.GlobalInfo.Keys as Colabskey
+from BackEnd.Functions import get_db_connection
+from BackEnd.Indexes import ensure_indexes
+from BackEnd import Agenda
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--recompute", action="store_true", help="Recalcular también las citas que ya tienen bloques")
+    args = parser.parse_args()
+
+    Colabskey.ENSURE_INDEXES = False
+    db = get_db_connection()
+
+    resultado = Agenda.rellenar(
+        db, args.batch_size, recalcular=args.recompute,
+        progreso=lambda procesados, actualizados, invalidas: print(
+            f"🔁 citas={procesados} actualizadas={actualizados} sin fecha válida={invalidas}", flush=True))
+    print(f"✅ {resultado['processed']} citas revisadas, {resultado['updated']} actualizadas, "
+          f"{resultado['invalid']} sin fecha válida (no ocupan la agenda)")
+
+    fallo = False
+    for coleccion, indice, error in ensure_indexes(db):
+        if coleccion == "appointments" and error:
+            fallo = True
+            print(f"❌ {coleccion}.{indice}: {error}")
+
+    choques = Agenda.conflictos(db)
+    for medico_id, citas in choques:
+        print(f"⚠️ Citas traslapadas del médico {medico_id}: {', '.join(str(c) for c in citas)}")
+    if not fallo and not choques:
+        print("✅ Índices de la agenda listos: los choques de horario se rechazan al agendar")
+
+    sys.exit(1 if fallo or choques else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Crea db.identities (email -> usuario) a partir de users, doctors y patients.
+
+Uso (desde la carpeta API):
+    python -m Tools.identities [--batch-size 500]
+
+Es idempotente: las identidades existentes no se tocan, así que se puede repetir (o interrumpir y
+volver a correr). Al terminar marca la migración como completa en db.jobs y, desde ese momento, login
+y registro dejan de consultar las colecciones antiguas (cada proceso lo detecta en menos de un minuto).
+"""
+import argparse
+import BackEnd.GlobalInfo.Keys as Colabskey
+from BackEnd.Functions import get_db_connection
+from BackEnd.Indexes import ensure_indexes
+from BackEnd import Identidades
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    Colabskey.ENSURE_INDEXES = False
+    db = get_db_connection()
+    for coleccion, indice, error in ensure_indexes(db):
+        if coleccion == Identidades.COLECCION and error:
+            print(f"⚠️ {coleccion}.{indice}: {error}")
+
+    resultado = Identidades.migrar(
+        db, args.batch_size,
+        progreso=lambda procesados, creados: print(f"🔁 documentos={procesados} identidades nuevas={creados}", flush=True))
+    print(f"✅ Migración completa: {resultado['processed']} documentos, {resultado['created']} identidades creadas, "
+          f"{resultado['reserved']} emails reservados (solo en doctors/patients, sin login)")
+
+
+if __name__ == "__main__":
+    main()
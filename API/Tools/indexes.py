@@ -0,0 +1,45 @@
+"""
+Crea los índices declarados en BackEnd.Indexes y verifica que ninguna consulta registrada haga COLLSCAN.
+
+Uso (desde la carpeta API):
+    python -m Tools.indexes             # crea índices y verifica planes
+    python -m Tools.indexes --check     # solo verifica planes (para CI contra una base ya provisionada)
+
+Termina con código 1 si algún índice no se pudo crear o alguna consulta recorre la colección completa.
+"""
+import argparse
+import sys
+import BackEnd.GlobalInfo.Keys as Colabskey
+from BackEnd.Functions import get_db_connection
+from BackEnd.Indexes import ensure_indexes, verificar_planes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="No crear índices, solo revisar los planes")
+    args = parser.parse_args()
+
+    # La conexión no debe crear índices por su cuenta: este comando decide qué hacer
+    Colabskey.ENSURE_INDEXES = False
+    db = get_db_connection()
+    fallo = False
+
+    if not args.check:
+        for coleccion, indice, error in ensure_indexes(db):
+            if error:
+                fallo = True
+                print(f"❌ {coleccion}.{indice}: {error}")
+            else:
+                print(f"✅ {coleccion}.{indice}")
+
+    collscans = verificar_planes(db)
+    for coleccion, filtro, etapas in collscans:
+        print(f"❌ COLLSCAN en {coleccion} con filtro {filtro}: {' > '.join(etapas)}")
+    if not collscans:
+        print("✅ Ninguna consulta registrada hace COLLSCAN")
+
+    sys.exit(1 if fallo or collscans else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Re-cifra el image_url de todas las predicciones con la clave primaria (la primera de ENCRYPTION_KEYS).
+
+Rotación de clave:
+    1. ENCRYPTION_KEYS="nueva,anterior" y reiniciar la API (la nueva cifra, ambas descifran).
+    2. python -m Tools.reencrypt                     # desde la carpeta API
+    3. Cuando termine, ENCRYPTION_KEYS="nueva".
+
+Uso:
+    python -m Tools.reencrypt [--batch-size 500] [--max-docs-per-second 200] [--restart]
+
+El avance se guarda en db.jobs después de cada lote: si se interrumpe (Ctrl+C), volver a ejecutar
+el comando continúa donde quedó. --restart empieza de cero. No arranca si el trabajo ya se está
+ejecutando en segundo plano desde la API (el candado vive en db.jobs).
+"""
+import argparse
+import sys
+import BackEnd.GlobalInfo.Keys as Colabskey
+from BackEnd.Functions import get_db_connection
+from BackEnd.Recifrado import TrabajoRecifrado, TrabajoEnEjecucion
+
+
+def _imprimir(estado):
+    total = estado.get("total") or 0
+    porcentaje = f"{100 * estado['processed'] / total:5.1f}%" if total else "  ?  "
+    print(f"🔁 {porcentaje} procesados={estado['processed']} actualizados={estado['updated']} "
+          f"fallidos={estado['failed']}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=Colabskey.REENCRYPT_BATCH_SIZE)
+    parser.add_argument("--max-docs-per-second", type=float, default=Colabskey.REENCRYPT_MAX_DOCS_PER_SECOND)
+    parser.add_argument("--restart", action="store_true", help="Ignorar el checkpoint y empezar de cero")
+    args = parser.parse_args()
+
+    trabajo = TrabajoRecifrado(get_db_connection(), args.batch_size, args.max_docs_per_second)
+    try:
+        estado = trabajo.ejecutar(reiniciar=args.restart, progreso=_imprimir)
+    except TrabajoEnEjecucion:
+        print("❌ El re-cifrado ya está en ejecución (en la API u otra terminal); consulta GET /admin/reencrypt")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("⏸️ Interrumpido: el checkpoint quedó en el último lote completo; ejecuta de nuevo para reanudar")
+        sys.exit(130)
+
+    print(f"✅ {estado['status']}: {estado['updated']} actualizados, {estado['failed']} sin clave válida")
+    sys.exit(1 if estado["failed"] or estado["status"] == "lost" else 0)
+
+
+if __name__ == "__main__":
+    main()
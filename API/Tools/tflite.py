@@ -0,0 +1,134 @@
+"""
+Conversión del modelo a TFLite y verificación de paridad contra el modelo Keras original.
+
+Uso (desde la carpeta API):
+    python -m Tools.tflite convert --quantization float16
+    python -m Tools.tflite convert --quantization int8
+    python -m Tools.tflite parity --images ruta/holdout ../models/model_vgg16_final_float16.tflite ../models/model_vgg16_final_int8.tflite
+
+Para 'parity', si la carpeta de imágenes tiene subcarpetas benigno/ y maligno/ (o benign/ malignant/)
+también se reporta la exactitud de cada backend contra esas etiquetas.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+import BackEnd.GlobalInfo.Keys as Colabskey
+from BackEnd.InferenceBackends import convertir_a_tflite
+from BackEnd.ModelRegistry import ModelRegistry
+from BackEnd.Preprocessing import preprocess_batch
+
+EXTENSIONES = (".jpg", ".jpeg", ".png", ".bmp")
+ETIQUETAS = {"benigno": 0, "benign": 0, "maligno": 1, "malignant": 1}
+
+
+def _ruta_salida(quantization):
+    base = os.path.splitext(Colabskey.KERAS_MODEL_PATH)[0]
+    return f"{base}_{quantization}.tflite"
+
+
+def _cargar_holdout(carpeta):
+    """Lista de (bytes, etiqueta o None) leída de la carpeta y sus subcarpetas"""
+    imagenes = []
+    for raiz, _, archivos in os.walk(carpeta):
+        etiqueta = ETIQUETAS.get(os.path.basename(raiz).lower())
+        for nombre in sorted(archivos):
+            if nombre.lower().endswith(EXTENSIONES):
+                with open(os.path.join(raiz, nombre), "rb") as f:
+                    imagenes.append((f.read(), etiqueta))
+    return imagenes
+
+
+def _evaluar(model_path, imagenes, batch_size):
+    registro = ModelRegistry(model_path, Colabskey.MODEL_INPUT_SIZE)
+    model = registro.get_model()
+
+    probabilidades = []
+    latencias = []
+    for i in range(0, len(imagenes), batch_size):
+        batch = preprocess_batch([datos for datos, _ in imagenes[i:i + batch_size]])
+        inicio = time.perf_counter()
+        salida = model.predict(batch, verbose=0)
+        latencias.append((time.perf_counter() - inicio) / len(batch))
+        probabilidades.extend(float(p[0]) for p in salida)
+
+    stats = registro.stats()
+    return np.array(probabilidades), {
+        "model_path": model_path,
+        "backend": stats["backend"],
+        "load_seconds": stats["load_seconds"],
+        "rss_delta_bytes": stats["rss_delta_bytes"],
+        "model_bytes": stats["params_bytes"],
+        "ms_per_image": float(np.mean(latencias) * 1000)
+    }
+
+
+def comando_convert(args):
+    salida = args.output or _ruta_salida(args.quantization)
+    inicio = time.perf_counter()
+    tamano = convertir_a_tflite(args.keras, salida, args.quantization)
+    print(json.dumps({
+        "output": salida,
+        "quantization": args.quantization,
+        "bytes": tamano,
+        "keras_bytes": os.path.getsize(args.keras),
+        "seconds": time.perf_counter() - inicio
+    }, indent=2))
+
+
+def comando_parity(args):
+    imagenes = _cargar_holdout(args.images)
+    if not imagenes:
+        sys.exit(f"No se encontraron imágenes en {args.images}")
+    etiquetas = np.array([e if e is not None else -1 for _, e in imagenes])
+    con_etiqueta = etiquetas >= 0
+
+    referencia, reporte_ref = _evaluar(args.keras, imagenes, args.batch_size)
+    clases_ref = referencia > 0.5
+    reportes = [reporte_ref]
+
+    for candidato in args.candidates:
+        probabilidades, reporte = _evaluar(candidato, imagenes, args.batch_size)
+        reporte["threshold_agreement"] = float(np.mean((probabilidades > 0.5) == clases_ref))
+        reporte["max_abs_diff"] = float(np.max(np.abs(probabilidades - referencia)))
+        reporte["mean_abs_diff"] = float(np.mean(np.abs(probabilidades - referencia)))
+        if con_etiqueta.any():
+            reporte["accuracy"] = float(np.mean((probabilidades[con_etiqueta] > 0.5) == etiquetas[con_etiqueta]))
+        reportes.append(reporte)
+
+    if con_etiqueta.any():
+        reporte_ref["accuracy"] = float(np.mean(clases_ref[con_etiqueta] == etiquetas[con_etiqueta]))
+
+    print(json.dumps({"images": len(imagenes), "labeled": int(con_etiqueta.sum()), "backends": reportes}, indent=2))
+
+    # Falla (para CI) si algún candidato no alcanza la concordancia mínima en el umbral
+    if any(r.get("threshold_agreement", 1.0) < args.min_agreement for r in reportes):
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    convert = sub.add_parser("convert", help="Convierte el .keras a .tflite")
+    convert.add_argument("--keras", default=Colabskey.KERAS_MODEL_PATH)
+    convert.add_argument("--quantization", choices=["none", "float16", "int8"], default="float16")
+    convert.add_argument("--output")
+    convert.set_defaults(func=comando_convert)
+
+    parity = sub.add_parser("parity", help="Compara backends contra el modelo Keras")
+    parity.add_argument("--images", required=True)
+    parity.add_argument("--keras", default=Colabskey.KERAS_MODEL_PATH)
+    parity.add_argument("--batch-size", type=int, default=8)
+    parity.add_argument("--min-agreement", type=float, default=0.99)
+    parity.add_argument("candidates", nargs="+", help="Modelos .tflite a comparar")
+    parity.set_defaults(func=comando_parity)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
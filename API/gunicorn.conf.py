@@ -0,0 +1,57 @@
+"""
+Configuración de gunicorn para producción (desde la carpeta API):
+
+    gunicorn -c gunicorn.conf.py
+    WEB_WORKERS=4 WEB_THREADS=8 WARMUP_MODEL=1 gunicorn -c gunicorn.conf.py
+
+Cada worker crea su propio MongoClient después del fork (un cliente de pymongo no sobrevive a fork) y
+calienta la conexión, y opcionalmente el modelo, antes de aceptar tráfico. gunicorn no corre en Windows;
+ahí se sigue usando python Directions.py.
+"""
+import BackEnd.GlobalInfo.Keys as Colabskey
+
+wsgi_app = "Directions:app"
+bind = f"0.0.0.0:{Colabskey.PORT}"
+workers = Colabskey.WEB_WORKERS
+threads = Colabskey.WEB_THREADS
+worker_class = "gthread"
+# /analyze puede tardar varios segundos con la primera carga del modelo
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+# Reciclar workers de vez en cuando acota la fragmentación de memoria de TensorFlow
+max_requests = 2000
+max_requests_jitter = 200
+accesslog = "-"
+
+
+def post_fork(server, worker):
+    # Nunca reutilizar un cliente heredado del master (sockets y monitores no son seguros tras fork);
+    # get_db_connection también lo detecta por pid, esto solo lo hace explícito
+    Colabskey.dbconn = None
+    Colabskey.dbconn_pid = None
+    Colabskey.async_dbconn = None
+
+
+def post_worker_init(worker):
+    # Corre en el worker ya con la app cargada y antes de aceptar conexiones
+    from BackEnd.Functions import calentar_conexion
+    try:
+        calentar_conexion()
+        worker.log.info("✅ [DB] Conexión caliente en worker %s (maxPoolSize=%s)",
+                        worker.pid, Colabskey.MONGO_MAX_POOL_SIZE)
+    except Exception as e:
+        # Sin DB el worker igual arranca: /health responde y get_db_connection reintenta en la siguiente petición
+        Colabskey.dbconn = None
+        Colabskey.dbconn_pid = None
+        worker.log.warning("⚠️ [DB] No se pudo calentar la conexión en worker %s: %s", worker.pid, e)
+
+    if Colabskey.WARMUP_MODEL or Colabskey.PRELOAD_MODEL or Colabskey.INFERENCE_WORKERS > 0:
+        from BackEnd import Analysis
+        try:
+            Analysis.precargar()
+            worker.log.info("✅ Modelo cargado en worker %s", worker.pid)
+        except Exception as e:
+            # Un modelo ausente o roto no debe tumbar el worker (gunicorn lo reiniciaría en bucle):
+            # /health/ready responde 503 hasta que haya modelo y /analyze lo vuelve a intentar
+            worker.log.error("❌ No se pudo cargar el modelo en worker %s: %s", worker.pid, e)
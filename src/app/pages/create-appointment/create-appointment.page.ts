@@ -174,7 +174,10 @@ export class CreateAppointmentPage implements OnInit {
     if (this.fechahoraCita) {
       const fecha = new Date(this.fechahoraCita);
       
-      this.fechaSeleccionada = fecha.toISOString().split('T')[0];
+      // Fecha local (no toISOString, que es UTC y cambia de día por la noche), igual que la hora
+      const mes = String(fecha.getMonth() + 1).padStart(2, '0');
+      const dia = String(fecha.getDate()).padStart(2, '0');
+      this.fechaSeleccionada = `${fecha.getFullYear()}-${mes}-${dia}`;
       this.horaSeleccionada = fecha.toTimeString().split(' ')[0];
     }
   }
@@ -1,8 +1,8 @@
 // services/cancer-classifier.service.ts
 import { Injectable } from '@angular/core';
 import { HttpClient, HttpErrorResponse } from '@angular/common/http';
-import { Observable, throwError, of } from 'rxjs';
-import { catchError, map } from 'rxjs/operators';
+import { Observable, throwError, of, EMPTY } from 'rxjs';
+import { catchError, map, expand, reduce } from 'rxjs/operators';
 import { CloudinaryService } from './cloudinary.service';
 
 export interface PredictionRecord {
@@ -95,8 +95,18 @@ export class CancerClassifierService {
     );
   }
 
+  /**
+   * Historial completo: /predictions viene por páginas y el cursor de la siguiente va en X-Next-Cursor
+   */
   getPredictions(): Observable<PredictionRecord[]> {
-    return this.http.get<PredictionRecord[]>(`${this.baseUrl}/predictions`).pipe(
+    const pagina = (cursor?: string) => this.http.get<PredictionRecord[]>(
+      `${this.baseUrl}/predictions`, { observe: 'response', params: cursor ? { cursor } : {} });
+    return pagina().pipe(
+      expand(res => {
+        const cursor = res.headers.get('X-Next-Cursor');
+        return cursor ? pagina(cursor) : EMPTY;
+      }),
+      reduce((todas: PredictionRecord[], res) => todas.concat(res.body || []), []),
       catchError(this.handleError)
     );
   }
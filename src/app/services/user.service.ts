@@ -1,6 +1,6 @@
 import { Injectable, inject } from '@angular/core';
 import { Router } from '@angular/router';
-import { Observable, tap } from 'rxjs';
+import { EMPTY, Observable, expand, reduce, tap } from 'rxjs';
 // Importar directamente a api service
 import { ApiService } from './api.service';
 
@@ -63,7 +63,7 @@ uploadFile(file: File, tipo: 'avatar' | 'pdf'): Observable<any> {
 }
   getMedicosDisponibles(): Observable<any> {
     console.log('[UserService] Obteniendo médicos disponibles...');
-    return this.apiService.get('/users/role/doctor');
+    return this.getTodasLasPaginas('/users/role/doctor');
   }
   
   
@@ -249,10 +249,20 @@ uploadFile(file: File, tipo: 'avatar' | 'pdf'): Observable<any> {
 
   // ==================== MÉTODOS API (Proxies) ====================
 
+  // Las listas de usuarios vienen por páginas: se sigue `next` y se juntan los arrUsers
+  private getTodasLasPaginas(endpoint: string): Observable<any> {
+    const pagina = (cursor?: string) =>
+      this.apiService.get(cursor ? `${endpoint}?cursor=${encodeURIComponent(cursor)}` : endpoint);
+    return pagina().pipe(
+      expand((res: any) => res?.next ? pagina(res.next) : EMPTY),
+      reduce((acc: any, res: any) => ({ ...res, arrUsers: [...(acc.arrUsers || []), ...(res.arrUsers || [])] }))
+    );
+  }
+
   getCitas(): Observable<any> { return this.apiService.get('/citas'); }
   getCitasByUser(userId: string): Observable<any> { return this.apiService.get(`/users/${userId}/citas`); }
   createCita(citaData: any): Observable<any> {console.log('[UserService] Creando cita:', citaData);return this.apiService.post('/citas', citaData);}
-  getUsers(): Observable<any> { return this.apiService.get('/users'); }
+  getUsers(): Observable<any> { return this.getTodasLasPaginas('/users'); }
   getUserById(id: string): Observable<any> { return this.apiService.get(`/user/${id}`); }
   updateProfile(userData: any): Observable<any> { return this.apiService.put('/user/profile', userData); }
   getMedicos(): Observable<any> { return this.apiService.get('/medicos'); }